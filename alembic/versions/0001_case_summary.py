@@ -0,0 +1,53 @@
+"""Add case_summary table
+
+Revision ID: 0001_case_summary
+Revises: 
+Create Date: 2026-10-18 09:00:00
+
+Materialized per-account case view. After upgrading an existing database,
+backfill it with: python -m app.services.case_summary rebuild
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_case_summary'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'case_summary',
+        sa.Column('account_number', sa.String(), nullable=False),
+        sa.Column('tx_count', sa.Integer(), nullable=False),
+        sa.Column('total_amount', sa.Float(), nullable=False),
+        sa.Column('high_value_count', sa.Integer(), nullable=False),
+        sa.Column('first_tx_at', sa.DateTime(), nullable=True),
+        sa.Column('first_tx_id', sa.String(), nullable=True),
+        sa.Column('first_description', sa.String(), nullable=True),
+        sa.Column('receives_salary', sa.Boolean(), nullable=False),
+        sa.Column('sends_salary', sa.Boolean(), nullable=False),
+        sa.Column('salary_in_max', sa.Float(), nullable=False),
+        sa.Column('payroll_out_total', sa.Float(), nullable=False),
+        sa.Column('alert_count', sa.Integer(), nullable=False),
+        sa.Column('typology', sa.String(), nullable=True),
+        sa.Column('risk_rank', sa.Integer(), nullable=False),
+        sa.Column('risk_rating', sa.String(), nullable=False),
+        sa.Column('occupation', sa.String(), nullable=True),
+        sa.Column('expected_turnover', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('account_number'),
+    )
+    op.create_index(op.f('ix_case_summary_risk_rating'), 'case_summary', ['risk_rating'], unique=False)
+    op.create_index(op.f('ix_case_summary_typology'), 'case_summary', ['typology'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_case_summary_typology'), table_name='case_summary')
+    op.drop_index(op.f('ix_case_summary_risk_rating'), table_name='case_summary')
+    op.drop_table('case_summary')
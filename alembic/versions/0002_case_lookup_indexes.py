@@ -0,0 +1,50 @@
+"""Composite indexes for case lookup paths
+
+Revision ID: 0002_case_lookup_indexes
+Revises: 0001_case_summary
+Create Date: 2026-10-18 11:00:00
+
+Replaces the single-column sender/receiver/alert indexes with composites
+that also serve the ORDER BY / aggregate of each query in
+app/services/case_queries.py.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_case_lookup_indexes'
+down_revision: Union[str, None] = '0001_case_summary'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_transactions_sender_timestamp', 'transactions', ['sender_account', 'timestamp'], unique=False)
+    op.create_index('ix_transactions_receiver_timestamp', 'transactions', ['receiver_account', 'timestamp'], unique=False)
+    op.drop_index('ix_transactions_sender_account', table_name='transactions')
+    op.drop_index('ix_transactions_receiver_account', table_name='transactions')
+
+    op.create_index('ix_alerts_account_rule', 'alerts', ['account_number', 'rule_name'], unique=False)
+    op.drop_index('ix_alerts_account_number', table_name='alerts')
+
+    op.create_index('ix_sars_status_generated_at', 'sars', ['status', 'generated_at'], unique=False)
+
+    op.create_index('ix_case_summary_risk_rank', 'case_summary', ['risk_rank', 'account_number'], unique=False)
+    op.create_index('ix_case_summary_alert_count', 'case_summary', ['alert_count', 'account_number'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_case_summary_alert_count', table_name='case_summary')
+    op.drop_index('ix_case_summary_risk_rank', table_name='case_summary')
+
+    op.drop_index('ix_sars_status_generated_at', table_name='sars')
+
+    op.create_index('ix_alerts_account_number', 'alerts', ['account_number'], unique=False)
+    op.drop_index('ix_alerts_account_rule', table_name='alerts')
+
+    op.create_index('ix_transactions_receiver_account', 'transactions', ['receiver_account'], unique=False)
+    op.create_index('ix_transactions_sender_account', 'transactions', ['sender_account'], unique=False)
+    op.drop_index('ix_transactions_receiver_timestamp', table_name='transactions')
+    op.drop_index('ix_transactions_sender_timestamp', table_name='transactions')
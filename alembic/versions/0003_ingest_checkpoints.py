@@ -0,0 +1,39 @@
+"""Add ingest_checkpoints table
+
+Revision ID: 0003_ingest_checkpoints
+Revises: 0002_case_lookup_indexes
+Create Date: 2026-10-18 14:00:00
+
+Progress of resumable ingestion jobs (app/services/ingestion.py).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003_ingest_checkpoints'
+down_revision: Union[str, None] = '0002_case_lookup_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ingest_checkpoints',
+        sa.Column('job_id', sa.String(), nullable=False),
+        sa.Column('target', sa.String(), nullable=False),
+        sa.Column('batches_done', sa.Integer(), nullable=False),
+        sa.Column('rows_read', sa.Integer(), nullable=False),
+        sa.Column('rows_inserted', sa.Integer(), nullable=False),
+        sa.Column('rows_duplicate', sa.Integer(), nullable=False),
+        sa.Column('rows_rejected', sa.Integer(), nullable=False),
+        sa.Column('completed', sa.Boolean(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('job_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ingest_checkpoints')
@@ -1,13 +1,13 @@
-from fastapi import APIRouter
-from celery.result import AsyncResult
-from typing import List
-import uuid
+from fastapi import APIRouter, HTTPException
+import asyncio
 import json
+import uuid
 
 from app.schemas.requests import BatchRequest
 from app.schemas.responses import GenerateResponse, BatchStatusResponse
-from workers.tasks import generate_sar_task
-from app.core.redis_client import redis_client
+from workers.tasks import dispatch_batch_task
+from app.core.celery_app import PRIORITY_QUEUES
+from app.services.batch_progress import batch_progress
 from app.core.security import verify_api_key, rate_limit_standard
 from fastapi import Depends
 
@@ -17,65 +17,62 @@ router = APIRouter(dependencies=[verify_api_key, rate_limit_standard])
 async def submit_batch(request: BatchRequest):
     """
     Submit a batch of SAR generation requests.
+    Returns the batch handle as soon as the requests are stored and a single
+    dispatch message is queued; a worker fans it out to the queue matching
+    the batch priority.
     """
+    priority = request.priority.upper()
+    queue = PRIORITY_QUEUES.get(priority)
+    if queue is None:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {list(PRIORITY_QUEUES)}")
+
     batch_id = str(uuid.uuid4())
-    job_ids = []
-    
-    for req in request.requests:
-        # Pass the batch_id to the task if we want the task to update batch progress (advanced)
-        # For now, we just track job IDs here
-        task = generate_sar_task.delay(req.model_dump_json())
-        job_ids.append(task.id)
-    
-    # Store batch metadata in Redis
-    # Allow 24h expiry
-    redis_client.set(f"batch:{batch_id}:total", len(job_ids), ex=86400)
-    redis_client.rpush(f"batch:{batch_id}:jobs", *job_ids)
-    redis_client.expire(f"batch:{batch_id}:jobs", 86400)
+    job_ids = [str(uuid.uuid4()) for _ in request.requests]
+
+    # Serializing thousands of requests is CPU work; keep it off the event loop
+    requests_json = await asyncio.to_thread(
+        lambda: json.dumps([req.model_dump(mode="json") for req in request.requests])
+    )
+
+    # Counters (and the parked requests) must exist before anything is dispatched
+    await batch_progress.create(batch_id, job_ids, requests_json=requests_json)
+    dispatch_batch_task.apply_async(args=[batch_id, queue], queue=queue)
 
     return GenerateResponse(
         job_id=batch_id,
         status="SUBMITTED",
-        message=f"Batch of {len(job_ids)} jobs submitted."
+        message=f"Batch of {len(job_ids)} jobs submitted with {priority} priority."
     )
 
 @router.get("/status/{batch_id}", response_model=BatchStatusResponse)
-async def get_batch_status(batch_id: str):
+async def get_batch_status(batch_id: str, granular: bool = False):
     """
     Get aggregate status of a batch.
+    With `granular`, progress averages each job's reported progress
+    (running jobs count partially) instead of counting finished jobs.
     """
-    total_str = redis_client.get(f"batch:{batch_id}:total")
-    if not total_str:
+    counters = await batch_progress.get(batch_id)
+    if not counters:
         return {"status": "NOT_FOUND", "message": "Batch ID not found or expired"}
-        
-    total = int(total_str)
-    job_ids = redis_client.lrange(f"batch:{batch_id}:jobs", 0, -1)
-    
-    completed = 0
-    failed = 0
-    in_progress = 0
-    
-    for jid in job_ids:
-        res = AsyncResult(jid)
-        if res.state == 'SUCCESS':
-            completed += 1
-        elif res.state == 'FAILURE':
-            failed += 1
-        else:
-            in_progress += 1
-            
-    # Calculate overall percentage
-    # If tasks report granular progress, we could average it. 
-    # For now, simplistic: (completed + failed) / total
-    
-    percent = int(((completed + failed) / total) * 100) if total > 0 else 0
-    
+
+    total = counters["total"]
+    completed = counters["completed"]
+    failed = counters["failed"]
+    in_progress = max(total - completed - failed, 0)
+
+    if total == 0:
+        percent = 0
+    elif granular:
+        percent = int(counters["progress_sum"] / total)
+    else:
+        percent = int(((completed + failed) / total) * 100)
+
     status = "PROCESSING"
     if completed + failed == total:
         status = "COMPLETED"
         if failed == total:
              status = "FAILED"
-    
+
     return {
         "batch_id": batch_id,
         "status": status,
@@ -1,90 +1,138 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from typing import List
-from app.db.base import get_db
-from app.models.sql import Transaction, Alert, SAR
+from sqlalchemy import select
+from datetime import datetime
+from typing import List, Optional
+import base64
+import json
+import orjson
+from app.db.base import AsyncSessionLocal, get_db
+from app.core.config import settings
+from app.models.sql import SAR, CaseSummary, Transaction
+from app.services.case_queries import (
+    RISK_RANKS, CASE_SORT_FIELDS, case_listing_query,
+    account_transactions_query, account_transaction_rows_query, account_alerts_query, submitted_sars_query
+)
 from app.schemas.responses import Case, CaseList
+from app.services.case_profile import is_anomaly
+from app.services.transaction_frame import epoch_us, from_epoch_us
+from app.services.transaction_store import AccountView, case_analytics, get_transaction_store
 from app.core.security import verify_api_key
 
 router = APIRouter(dependencies=[verify_api_key])
 
+def _encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def _decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        assert isinstance(values, list) and len(values) == 2
+        return values
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Rows per chunk of the NDJSON transaction stream
+STREAM_CHUNK_ROWS = 1000
+TRANSACTION_FIELDS = tuple(c.key for c in Transaction.__table__.columns)
+
+def _utc(ts: Optional[datetime]) -> Optional[datetime]:
+    # Query-string timestamps may carry an offset; stored ones are naive UTC
+    return None if ts is None else from_epoch_us(epoch_us(ts))
+
+def _transaction_dict(t, avg_amount: float) -> dict:
+    # An ORM Transaction or a row of account_transaction_rows_query
+    d = {name: getattr(t, name) for name in TRANSACTION_FIELDS}
+    d['is_anomaly'] = bool(is_anomaly(t.amount, avg_amount))
+    return d
+
+def _store_window(view: AccountView, tx_offset: int, tx_limit: Optional[int],
+                  start: Optional[datetime], end: Optional[datetime]):
+    """Row positions [begin, stop) of a page of the view within the time window."""
+    lo, hi = view.time_range(
+        None if start is None else epoch_us(start),
+        None if end is None else epoch_us(end),
+    )
+    begin = min(lo + tx_offset, hi)
+    return begin, hi if tx_limit is None else min(hi, begin + tx_limit)
+
+def _store_view(account_number: str, summary: Optional[CaseSummary]) -> Optional[AccountView]:
+    """
+    The account's rows in the transaction store, when it is enabled and
+    holds every transaction case_summary counts for the account; None sends
+    the request down the database path.
+    """
+    store = get_transaction_store() if settings.TRANSACTION_STORE_ENABLED else None
+    view = store.account(account_number) if store is not None else None
+    if view is None or summary is None or len(view) != summary.tx_count:
+        return None
+    return view
+
+def _ndjson(records: List[dict]) -> bytes:
+    # orjson writes datetimes as ISO 8601 itself
+    return b"".join(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE) for record in records)
+
 @router.get("", response_model=CaseList)
-async def list_cases(db: AsyncSession = Depends(get_db)):
+async def list_cases(
+    risk: Optional[str] = Query(None, description="Comma-separated risk ratings, e.g. HIGH,MEDIUM"),
+    typology: Optional[str] = Query(None),
+    sort_by: str = Query("account_number", description="account_number | risk | alert_count"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_db)
+):
     """
     List unique accounts (starting with 'IN-') with their risk status.
-    Now includes cases with 0 alerts.
+    Includes cases with 0 alerts. Reads the incrementally maintained
+    case_summary table with keyset pagination: pass `next_cursor` back as
+    `cursor` for the next page.
     """
-    # 1. Get all unique accounts starting with 'IN-' from Transactions
-    # Union of senders and receivers
-    q1 = select(Transaction.sender_account).where(Transaction.sender_account.like("IN-%")).distinct()
-    q2 = select(Transaction.receiver_account).where(Transaction.receiver_account.like("IN-%")).distinct()
-    
-    r1 = await db.execute(q1)
-    r2 = await db.execute(q2)
-    
-    accounts = set(r1.scalars().all()) | set(r2.scalars().all())
-    
-    cases = []
-    for acc_num in accounts:
-        # 2. Count alerts for this account
-        alert_query = select(func.count(Alert.alert_id)).where(Alert.account_number == acc_num)
-        alert_res = await db.execute(alert_query)
-        count = alert_res.scalar_one_or_none() or 0
-        
-        # 3. Get customer info from a transaction
-        tx_query = select(Transaction).where(
-            (Transaction.sender_account == acc_num) | (Transaction.receiver_account == acc_num)
-        ).limit(1)
-        tx_result = await db.execute(tx_query)
-        tx = tx_result.scalar_one_or_none()
-        
-        # 4. Get Typology
-        typ_query = select(Alert.rule_name).where(Alert.account_number == acc_num).limit(1)
-        typ_result = await db.execute(typ_query)
-        typology = typ_result.scalar_one_or_none() or "General Banking"
-
-        # 5. Check for High Value Transactions (for Risk logic)
-        hv_query = select(Transaction).where(
-            ((Transaction.sender_account == acc_num) | (Transaction.receiver_account == acc_num)) & 
-            (Transaction.amount > 100000)
-        ).limit(1)
-        hv_res = await db.execute(hv_query)
-        has_hv = hv_res.scalar_one_or_none() is not None
-
-        # Risk Logic
-        risk_rating = "LOW"
-        if count > 0: risk_rating = "MEDIUM"
-        if count > 2 or has_hv: risk_rating = "HIGH"
-        # Overwrite if count is 0 and no HV -> LOW
-        
-        # Refined Logic matched to user request
-        if count == 0 and not has_hv:
-            risk_rating = "LOW"
-        elif count == 0 and has_hv:
-            risk_rating = "MEDIUM" # High value but clean?
-        elif count > 5:
-            risk_rating = "HIGH"
-
-        cases.append(Case(
-            account_number=acc_num,
-            customer_id=f"CUST-{acc_num.split('-')[-1]}",
-            customer_name="Customer Name (DB Placeholder)" if not tx else (tx.description or "Retail Customer"),
-            risk_rating=risk_rating,
-            alert_count=count,
-            typology=typology,
+    if sort_by not in CASE_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of {CASE_SORT_FIELDS}")
+
+    ratings = [r for r in (x.strip().upper() for x in risk.split(",")) if r in RISK_RANKS] if risk else None
+    query = case_listing_query(
+        risk_ratings=ratings,
+        typology=typology,
+        sort_by=sort_by,
+        descending=order == "desc",
+        after=_decode_cursor(cursor) if cursor else None,
+        limit=limit + 1,
+    )
+
+    rows = (await db.execute(query)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    cases = [
+        Case(
+            account_number=row.account_number,
+            customer_id=f"CUST-{row.account_number.split('-')[-1]}",
+            customer_name=row.first_description or "Retail Customer",
+            risk_rating=row.risk_rating,
+            alert_count=row.alert_count,
+            typology=row.typology,
             status="PENDING"
-        ))
-        
-    return CaseList(cases=cases)
+        )
+        for row in rows
+    ]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        sort_value = {"account_number": last.account_number, "risk": last.risk_rank, "alert_count": last.alert_count}[sort_by]
+        next_cursor = _encode_cursor([sort_value, last.account_number])
+
+    return CaseList(cases=cases, next_cursor=next_cursor)
 
 @router.get("/history/submitted")
 async def list_submitted_cases(db: AsyncSession = Depends(get_db)):
     """
     List all SARs that have been verified or finalized.
     """
-    query = select(SAR).where(SAR.status.in_(["VERIFIED", "FINALIZED"])).order_by(SAR.generated_at.desc())
-    result = await db.execute(query)
+    result = await db.execute(submitted_sars_query())
     sars = result.scalars().all()
     
     return [
@@ -114,42 +162,70 @@ async def get_submitted_report(sar_id: str, db: AsyncSession = Depends(get_db)):
         "status": sar.status
     }
 
+@router.get("/{account_number}/transactions")
+async def stream_case_transactions(
+    account_number: str,
+    tx_offset: int = Query(0, ge=0, description="First transaction to return (oldest first)"),
+    tx_limit: Optional[int] = Query(None, ge=1, description="Transactions to return; all when omitted"),
+    start: Optional[datetime] = Query(None, description="Only transactions at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only transactions before this time"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    The account's transactions as NDJSON, one object per line with its
+    is_anomaly flag, written in chunks of STREAM_CHUNK_ROWS: memory stays
+    flat however many transactions the account has.
+    """
+    start, end = _utc(start), _utc(end)
+    summary = await db.get(CaseSummary, account_number)
+    view = _store_view(account_number, summary)
+
+    if view is not None:
+        avg_amount = float(view.amount.mean()) if len(view) else 0.0
+        begin, stop = _store_window(view, tx_offset, tx_limit, start, end)
+
+        async def lines():
+            for lo in range(begin, stop, STREAM_CHUNK_ROWS):
+                hi = min(lo + STREAM_CHUNK_ROWS, stop)
+                records = view.records(lo, hi)
+                for d, flagged in zip(records, is_anomaly(view.amount[lo:hi], avg_amount).tolist()):
+                    d['is_anomaly'] = flagged
+                yield _ndjson(records)
+    else:
+        avg_amount = summary.total_amount / summary.tx_count if summary and summary.tx_count else 0
+        query = account_transaction_rows_query(account_number, start=start, end=end)
+        if tx_limit is not None or tx_offset:
+            query = query.offset(tx_offset).limit(tx_limit)
+
+        async def lines():
+            # The request's session is closed before the body is sent
+            async with AsyncSessionLocal() as session:
+                result = await session.stream(query.execution_options(yield_per=STREAM_CHUNK_ROWS))
+                async for chunk in result.partitions():
+                    yield _ndjson([_transaction_dict(row, avg_amount) for row in chunk])
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.get("/{account_number}")
-async def get_case_details(account_number: str, db: AsyncSession = Depends(get_db)):
+async def get_case_details(
+    account_number: str,
+    tx_offset: int = Query(0, ge=0, description="First transaction to return (oldest first)"),
+    tx_limit: Optional[int] = Query(None, ge=1, description="Transactions to return; all when omitted"),
+    start: Optional[datetime] = Query(None, description="Only transactions at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only transactions before this time"),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Get all transactions and alerts for a specific case with dynamic logic.
+    With TRANSACTION_STORE_ENABLED, accounts the columnar store is up to date
+    for are analyzed over its memory-mapped columns instead of ORM objects.
+    The response is encoded by orjson directly; large accounts should page
+    through /{account_number}/transactions instead.
     """
-    tx_query = select(Transaction).where(
-        (Transaction.sender_account == account_number) | (Transaction.receiver_account == account_number)
-    )
-    al_query = select(Alert).where(Alert.account_number == account_number)
-    
-    tx_result = await db.execute(tx_query)
+    start, end = _utc(start), _utc(end)
+    al_query = account_alerts_query(account_number)
     al_result = await db.execute(al_query)
-    
-    transactions = []
-    tx_objects = tx_result.scalars().all()
-    
-    # Anomaly Detection Logic
-    amounts = [t.amount for t in tx_objects]
-    if amounts:
-        avg_amt = sum(amounts) / len(amounts)
-        # Simplified Check: Is it > 2x Average OR > 100k?
-        # A real system would use Std Dev, but this is sufficient for demo 
-        # to show dynamic behavior vs hardcoded.
-    else:
-        avg_amt = 0
-
-    for t in tx_objects:
-        d = t.__dict__.copy()
-        d.pop('_sa_instance_state', None)
-        
-        # Dynamic Anomaly Flag
-        is_high_val = t.amount > 100000
-        is_spike = (avg_amt > 0) and (t.amount > (avg_amt * 2))
-        d['is_anomaly'] = is_high_val or is_spike
-        
-        transactions.append(d)
+    summary = await db.get(CaseSummary, account_number)
 
     alerts = []
     formatted_alerts = al_result.scalars().all()
@@ -158,53 +234,40 @@ async def get_case_details(account_number: str, db: AsyncSession = Depends(get_d
         d.pop('_sa_instance_state', None)
         alerts.append(d)
 
-    # Dynamic Risk Rating
-    risk_score = 0
-    if len(alerts) > 0:
-        risk_score += 1 # Has alerts
-    if len(alerts) > 2:
-        risk_score += 1 # Multiple alerts
-    if any(t['amount'] > 100000 for t in transactions):
-        risk_score += 1 # High value
-        
-    risk_rating = "LOW"
-    if risk_score == 1: risk_rating = "MEDIUM"
-    if risk_score >= 2: risk_rating = "HIGH"
-
-    # Deduce customer info
-    customer_name = "Unknown Customer"
-    occupation = "Self-Employed / Retail"
-    expected_turnover = 0.0
-    
-    if transactions:
-        customer_name = transactions[0].get("description") or "Unknown Customer"
-        
-        # Refined Classification Logic
-        is_receiving_salary = any(
-            t.get("receiver_account") == account_number and 
-            ("SALARY" in str(t.get("description", "")).upper() or "PAYROLL" in str(t.get("description", "")).upper())
-            for t in transactions
-        )
-        is_sending_salary = any(
-            t.get("sender_account") == account_number and 
-            ("SALARY" in str(t.get("description", "")).upper() or "PAYROLL" in str(t.get("description", "")).upper())
-            for t in transactions
+    view = _store_view(account_number, summary)
+    if view is not None:
+        # Averages, spike flags and salary classification over the account's column slices
+        analytics = case_analytics(
+            view,
+            alert_count=summary.alert_count,
+            typology=summary.typology,
         )
+        begin, stop = _store_window(view, tx_offset, tx_limit, start, end)
+        transactions = view.records(begin, stop)
+        for d, flagged in zip(transactions, analytics["is_anomaly"][begin:stop].tolist()):
+            d['is_anomaly'] = flagged
+        occupation = analytics["occupation"]
+        expected_turnover = analytics["expected_turnover"]
+        first_description = view.strings("description", 0, 1)[0]
+    else:
+        tx_query = account_transactions_query(account_number, start=start, end=end)
+        if tx_limit is not None or tx_offset:
+            tx_query = tx_query.offset(tx_offset).limit(tx_limit)
+        tx_result = await db.execute(tx_query)
 
-        if is_receiving_salary:
-            occupation = "Salaried Employee (Retail)"
-            salary_txs = [t['amount'] for t in transactions if t.get("receiver_account") == account_number and "SALARY" in str(t.get("description", "")).upper()]
-            expected_turnover = max(salary_txs) if salary_txs else 0.0
-        elif is_sending_salary:
-            occupation = "Corporate / Payroll Entity"
-            total_payroll = sum(t['amount'] for t in transactions if t.get("sender_account") == account_number and "SALARY" in str(t.get("description", "")).upper())
-            expected_turnover = total_payroll
-        
-        # If turnover still 0, estimate from activity
-        if expected_turnover == 0 and transactions:
-            expected_turnover = sum(t['amount'] for t in transactions) / len(transactions) * 2
+        # Anomaly flags: case_profile.is_anomaly (> 100k or > 2x the average)
+        avg_amt = summary.total_amount / summary.tx_count if summary and summary.tx_count else 0
+        transactions = [_transaction_dict(t, avg_amt) for t in tx_result.scalars()]
 
-    return {
+        # Occupation and turnover are maintained in case_summary
+        occupation = summary.occupation if summary and summary.tx_count else "Self-Employed / Retail"
+        expected_turnover = summary.expected_turnover if summary else 0.0
+        first_description = summary.first_description if summary else None
+
+    risk_rating = summary.risk_rating if summary else "LOW"
+    customer_name = first_description or "Unknown Customer"
+
+    return ORJSONResponse({
         "account_number": account_number,
         "customer": {
             "customer_id": f"CUST-{account_number}",
@@ -217,4 +280,4 @@ async def get_case_details(account_number: str, db: AsyncSession = Depends(get_d
         },
         "transactions": transactions,
         "alerts": alerts
-    }
+    })
@@ -1,13 +1,20 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from celery.result import AsyncResult
+from celery import states
 from app.schemas.requests import GenerateRequest
 from app.schemas.responses import GenerateResponse, JobStatusResponse, SARResponse
 from app.db.base import get_db
 from app.models.sql import SAR, Alert, AuditBlock
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import update, select
+import asyncio
 import uuid
+import json
 from workers.tasks import generate_sar_task
+from app.services.narrative_stream import iter_stream_events
+from app.services.narrative_cache import narrative_cache
+from app.core.redis_client import async_redis
 from app.core.security import verify_api_key, rate_limit_standard
 from fastapi import Depends
 from datetime import datetime
@@ -69,6 +76,35 @@ async def get_job_status(job_id: str):
         
     return response
 
+@router.get("/stream/{job_id}")
+async def stream_job(job_id: str):
+    """
+    Server-Sent Events feed of the narrative as it is generated.
+    Emits `token` events with stitched text, then a terminal `done` or `error`.
+    Submit the job with `stream: true`; fetch the final SAR from /status afterwards.
+    """
+    async def is_finished() -> bool:
+        # The result backend lookup is a blocking Redis call; keep it off the event loop
+        state = await asyncio.to_thread(lambda: AsyncResult(job_id).state)
+        return state in states.READY_STATES
+
+    async def event_source():
+        async for event in iter_stream_events(job_id, is_finished=is_finished):
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Hit/miss counters for the anonymized-prompt narrative cache.
+    """
+    return await narrative_cache.get_stats_async(async_redis.client)
+
 from pydantic import BaseModel
 
 class SaveDraftRequest(BaseModel):
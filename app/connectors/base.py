@@ -1,7 +1,54 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Any
+from typing import List, Any, AsyncIterator, Callable
+import numpy as np
 import pandas as pd
 
+from app.connectors.executor import ConnectorCancelled, connector_executor
+from app.core.config import settings
+
+# Rows per DataFrame yielded by stream_batches
+DEFAULT_BATCH_SIZE = 10_000
+# Rows parsed between cancellation checks when a whole CSV is loaded
+CSV_READ_CHUNK_ROWS = 100_000
+
+def read_csv_cancellable(source, cancel_event) -> pd.DataFrame:
+    """
+    pd.read_csv in chunks, giving up between chunks once `cancel_event`
+    is set. Meant to run in the connector executor.
+    """
+    chunks = []
+    with pd.read_csv(source, chunksize=CSV_READ_CHUNK_ROWS) as reader:
+        for chunk in reader:
+            if cancel_event.is_set():
+                raise ConnectorCancelled("CSV read cancelled")
+            chunks.append(chunk)
+    if not chunks:
+        return pd.DataFrame()
+    return _concat_chunks(chunks, cancel_event)
+
+def _concat_chunks(chunks: List[pd.DataFrame], cancel_event) -> pd.DataFrame:
+    # pd.concat copies each column in one call that holds the GIL for
+    # seconds on large object columns; filling preallocated columns chunk
+    # by chunk lets the event loop thread run in between
+    total = sum(len(chunk) for chunk in chunks)
+    columns = {}
+    for name in chunks[0].columns:
+        try:
+            dtype = np.result_type(*(chunk[name].dtype for chunk in chunks))
+        except TypeError:
+            dtype = np.dtype(object)
+        column = np.empty(total, dtype=dtype)
+        start = 0
+        for chunk in chunks:
+            if cancel_event.is_set():
+                raise ConnectorCancelled("CSV read cancelled")
+            column[start:start + len(chunk)] = chunk[name].to_numpy()
+            start += len(chunk)
+        columns[name] = column
+    # copy=False keeps the columns as separate blocks instead of consolidating
+    return pd.DataFrame(columns, copy=False)
+
 class BaseConnector(ABC):
     """
     Abstract base class for all data connectors.
@@ -9,6 +56,17 @@ class BaseConnector(ABC):
     
     def __init__(self, config: dict):
         self.config = config
+        # Blocking calls this connector may have in the shared executor at once
+        self.max_concurrency = config.get("max_concurrency", settings.CONNECTOR_MAX_CONCURRENCY)
+        self._limiter = asyncio.Semaphore(self.max_concurrency)
+
+    async def run_blocking(self, fn: Callable, *args, cancellable: bool = False, **kwargs) -> Any:
+        """
+        Run blocking I/O or parsing in the shared connector executor, within
+        this connector's concurrency limit. See ConnectorExecutor.run.
+        """
+        async with self._limiter:
+            return await connector_executor.run(fn, *args, cancellable=cancellable, **kwargs)
 
     @abstractmethod
     async def connect(self):
@@ -26,6 +84,17 @@ class BaseConnector(ABC):
         Fetch data from the source and return as a Pandas DataFrame.
         """
         pass
+
+    async def stream_batches(self, query: str = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                             params: dict = None) -> AsyncIterator[pd.DataFrame]:
+        """
+        Yield the result as DataFrames of at most `batch_size` rows, so large
+        sources can be processed in bounded memory. Connectors that can read
+        incrementally override this; the default slices fetch_data().
+        """
+        df = await self.fetch_data(query, params)
+        for start in range(0, len(df), batch_size):
+            yield df.iloc[start:start + batch_size]
     
     @abstractmethod
     async def get_schema(self) -> dict:
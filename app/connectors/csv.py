@@ -1,6 +1,7 @@
+from typing import AsyncIterator
+
 import pandas as pd
-import aiofiles
-from app.connectors.base import BaseConnector
+from app.connectors.base import BaseConnector, DEFAULT_BATCH_SIZE, read_csv_cancellable
 
 class CSVConnector(BaseConnector):
     """
@@ -19,14 +20,27 @@ class CSVConnector(BaseConnector):
 
     async def fetch_data(self, query: str = None, params: dict = None) -> pd.DataFrame:
         # 'query' here could be used for filtering, but for now we load the whole CSV
-        # Using run_in_executor for pandas io operations which are blocking
+        # Parsed in the connector executor: pandas io operations are blocking
         try:
-             df = pd.read_csv(self.file_path)
-             return df
+             return await self.run_blocking(read_csv_cancellable, self.file_path, cancellable=True)
         except Exception as e:
             print(f"Error reading CSV: {e}")
             raise e
 
+    async def stream_batches(self, query: str = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                             params: dict = None) -> AsyncIterator[pd.DataFrame]:
+        # Chunked reader: only one batch of rows is parsed and held at a time.
+        # Opening it reads the header, so that runs in the executor too
+        reader = await self.run_blocking(pd.read_csv, self.file_path, chunksize=batch_size)
+        try:
+            while True:
+                chunk = await self.run_blocking(next, reader, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            reader.close()
+
     async def get_schema(self) -> dict:
-        df = pd.read_csv(self.file_path, nrows=0)
+        df = await self.run_blocking(pd.read_csv, self.file_path, nrows=0)
         return {"columns": list(df.columns)}
@@ -0,0 +1,58 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+
+class ConnectorCancelled(Exception):
+    """Raised inside a worker thread that noticed its cancel event."""
+
+class ConnectorExecutor:
+    """
+    Shared, bounded thread pool for blocking connector work (file and S3
+    reads, CSV parsing), so it never runs on the event loop.
+
+    Cancelling the awaiting task cancels work that has not started yet;
+    work already running is asked to stop through its `cancel_event`,
+    which long-running functions check between chunks.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or settings.CONNECTOR_MAX_WORKERS
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="connector-io")
+            return self._pool
+
+    async def run(self, fn: Callable, *args, cancellable: bool = False, **kwargs) -> Any:
+        """
+        Run `fn(*args, **kwargs)` in the pool. With `cancellable`, `fn` also
+        receives a `cancel_event` keyword that is set if the caller is
+        cancelled while it runs.
+        """
+        cancel_event = None
+        if cancellable:
+            cancel_event = kwargs["cancel_event"] = threading.Event()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.pool, functools.partial(fn, *args, **kwargs))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if cancel_event is not None:
+                cancel_event.set()
+            raise
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+connector_executor = ConnectorExecutor()
@@ -1,6 +1,11 @@
+import asyncio
+from typing import AsyncIterator
+
 import pandas as pd
 import aiohttp
-from app.connectors.base import BaseConnector
+
+from app.connectors.base import BaseConnector, DEFAULT_BATCH_SIZE
+from app.core.config import settings
 
 class JSONConnector(BaseConnector):
     """
@@ -10,25 +15,94 @@ class JSONConnector(BaseConnector):
         super().__init__(config)
         self.url = config.get("url")
         self.headers = config.get("headers", {})
+        # Pagination used by stream_batches: page number and page size query params
+        self.page_param = config.get("page_param", "page")
+        self.page_size_param = config.get("page_size_param", "page_size")
+        self.first_page = config.get("first_page", 1)
+        self.max_pages = config.get("max_pages", settings.CONNECTOR_MAX_PAGES)
+        self.pool_size = config.get("pool_size", settings.CONNECTOR_POOL_SIZE)
+        self._session = None
+        self._loop = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # One keep-alive session per connector, bound to the loop that created it
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                headers=self.headers,
+            )
+            self._loop = loop
+        return self._session
 
     async def connect(self):
-        # Optional: check if API is reachable
-        pass
+        # Opens the pooled session; requests also open it lazily
+        self.session
 
     async def disconnect(self):
-        pass
+        # A session from another (closed) loop can't be awaited; drop it
+        if self._session is not None and self._loop is asyncio.get_running_loop():
+            await self._session.close()
+        self._session = None
+        self._loop = None
 
     async def fetch_data(self, query: str = None, params: dict = None) -> pd.DataFrame:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(self.url, headers=self.headers, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    # Assume data is a list of records or has a specific key 'data'
-                    if isinstance(data, dict) and "data" in data:
-                        data = data["data"]
-                    return pd.DataFrame(data)
-                else:
+        async with self.session.get(self.url, params=params) as response:
+            if response.status == 200:
+                data = await response.json()
+                # Assume data is a list of records or has a specific key 'data'
+                if isinstance(data, dict) and "data" in data:
+                    data = data["data"]
+                return pd.DataFrame(data)
+            else:
+                raise Exception(f"Failed to fetch data: {response.status}")
+
+    @staticmethod
+    def _page(data):
+        """
+        Records and next-page URL of one response: a list of records, or
+        {"data": [...], "next": url}.
+        """
+        if isinstance(data, dict):
+            return data.get("data", []), data.get("next")
+        return data, None
+
+    async def stream_batches(self, query: str = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                             params: dict = None) -> AsyncIterator[pd.DataFrame]:
+        # One page per batch; follows "next" links when the API returns them,
+        # otherwise increments the page number until a short or empty page.
+        # An API that ignores the page params repeats the same page, so a
+        # repeated page (or max_pages numbered pages) also ends the stream.
+        page = self.first_page
+        url = self.url
+        query_params = {**(params or {}), self.page_param: page, self.page_size_param: batch_size}
+        session = self.session
+        previous = None
+        while url:
+            async with session.get(url, params=query_params) as response:
+                if response.status != 200:
                     raise Exception(f"Failed to fetch data: {response.status}")
+                records, next_url = self._page(await response.json())
+            if not records:
+                break
+            if query_params is not None and records == previous:
+                print(f"JSON stream {self.url}: page {page} repeats page {page - 1}, "
+                      f"'{self.page_param}' looks ignored; stopping", flush=True)
+                break
+            yield pd.DataFrame(records)
+            if next_url:
+                url, query_params = next_url, None
+            elif query_params is None or len(records) < batch_size:
+                # Link-paginated APIs end when "next" is missing
+                break
+            elif page - self.first_page + 1 >= self.max_pages:
+                print(f"JSON stream {self.url}: stopped after max_pages={self.max_pages} pages", flush=True)
+                break
+            else:
+                previous = records
+                page += 1
+                query_params[self.page_param] = page
 
     async def get_schema(self) -> dict:
         # Schema inference from first record
@@ -0,0 +1,109 @@
+"""
+Cache of connected connectors, keyed by connector type and normalized config.
+
+ConnectorFactory builds a fresh connector (and with it a SQL engine, HTTP
+session or S3 client) on every call. Repeated pulls from the same source
+should go through connector_registry instead, which hands back the same
+connected instance until it has been idle for CONNECTOR_IDLE_SECONDS.
+"""
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Tuple
+
+from app.connectors.base import BaseConnector
+from app.connectors.factory import ConnectorFactory
+from app.core.config import settings
+
+def config_key(connector_type: str, config: dict) -> Tuple[str, str]:
+    # Key order and unset (None) options don't make two sources different
+    normalized = {k: v for k, v in config.items() if v is not None}
+    return connector_type, json.dumps(normalized, sort_keys=True, default=str)
+
+@dataclass
+class _Entry:
+    connector: BaseConnector
+    last_used: float = field(default_factory=time.monotonic)
+    leases: int = 0
+
+class ConnectorRegistry:
+    """
+    Connected connectors shared across requests.
+
+    Like AsyncRedis, cached engines and sessions belong to the event loop
+    that opened them; on another loop (scripts, tests) the cache starts over.
+    Entries idle for longer than idle_seconds are closed on the next access,
+    unless a caller is still holding them through acquire().
+    """
+
+    def __init__(self, idle_seconds: float = None):
+        self.idle_seconds = idle_seconds if idle_seconds is not None else settings.CONNECTOR_IDLE_SECONDS
+        self._entries: Dict[Tuple[str, str], _Entry] = {}
+        self._lock = None
+        self._loop = None
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Connections opened on another loop can't be reused or awaited here
+            self._entries = {}
+            self._lock = asyncio.Lock()
+            self._loop = loop
+
+    async def _close(self, entries):
+        for entry in entries:
+            try:
+                await entry.connector.disconnect()
+            except Exception as e:
+                print(f"Connector disconnect failed: {e}", flush=True)
+
+    async def evict_idle(self) -> int:
+        """Close idle, unleased connectors. Returns how many were closed."""
+        self._bind_loop()
+        cutoff = time.monotonic() - self.idle_seconds
+        async with self._lock:
+            stale = [key for key, entry in self._entries.items() if not entry.leases and entry.last_used < cutoff]
+            evicted = [self._entries.pop(key) for key in stale]
+        await self._close(evicted)
+        return len(evicted)
+
+    async def get(self, connector_type: str, config: dict) -> BaseConnector:
+        """Cached, connected connector for this source (built on first use)."""
+        await self.evict_idle()
+        key = config_key(connector_type, config)
+        async with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                connector = ConnectorFactory.get_connector(connector_type, config)
+                await connector.connect()
+                entry = self._entries[key] = _Entry(connector)
+            entry.last_used = time.monotonic()
+        return entry.connector
+
+    @asynccontextmanager
+    async def acquire(self, connector_type: str, config: dict) -> AsyncIterator[BaseConnector]:
+        """Like get(), but the connector is not evicted while the block runs."""
+        connector = await self.get(connector_type, config)
+        entry = self._entries[config_key(connector_type, config)]
+        entry.leases += 1
+        try:
+            yield connector
+        finally:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "connectors": len(self._entries),
+            "leased": sum(1 for entry in self._entries.values() if entry.leases),
+        }
+
+    async def shutdown(self):
+        if self._loop is asyncio.get_running_loop():
+            await self._close(list(self._entries.values()))
+        self._entries = {}
+        self._loop = None
+
+connector_registry = ConnectorRegistry()
@@ -1,9 +1,28 @@
+from functools import lru_cache
+from typing import AsyncIterator, Optional
+
 import pandas as pd
 import boto3
-import io
-from app.connectors.base import BaseConnector
+from botocore.config import Config
+from app.connectors.base import BaseConnector, DEFAULT_BATCH_SIZE, read_csv_cancellable
 from app.core.config import settings
 
+@lru_cache(maxsize=None)
+def s3_client(region: str, access_key_id: Optional[str], secret_access_key: Optional[str],
+              endpoint_url: Optional[str] = None):
+    """
+    boto3 client shared by every connector with the same credentials. Clients
+    are thread-safe; the pool is sized for the connector executor's threads.
+    """
+    return boto3.client(
+        "s3",
+        aws_access_key_id=access_key_id,
+        aws_secret_access_key=secret_access_key,
+        region_name=region,
+        endpoint_url=endpoint_url,
+        config=Config(max_pool_connections=settings.CONNECTOR_MAX_WORKERS),
+    )
+
 class S3Connector(BaseConnector):
     """
     Connector for AWS S3.
@@ -12,11 +31,11 @@ class S3Connector(BaseConnector):
         super().__init__(config)
         self.bucket = config.get("bucket", settings.S3_BUCKET_NAME)
         self.key = config.get("key")
-        self.s3_client = boto3.client(
-            "s3",
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_REGION
+        self.s3_client = s3_client(
+            config.get("region", settings.AWS_REGION),
+            settings.AWS_ACCESS_KEY_ID,
+            settings.AWS_SECRET_ACCESS_KEY,
+            config.get("endpoint_url"),
         )
 
     async def connect(self):
@@ -26,11 +45,42 @@ class S3Connector(BaseConnector):
     async def disconnect(self):
         pass
 
+    def _read(self, cancel_event) -> pd.DataFrame:
+        # Parsed straight off the response stream; the object is never held whole
+        body = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)["Body"]
+        try:
+            return read_csv_cancellable(body, cancel_event)
+        finally:
+            body.close()
+
+    def _open_reader(self, batch_size: int):
+        # Opening the reader already fetches and parses the header
+        body = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)["Body"]
+        try:
+            return body, pd.read_csv(body, chunksize=batch_size)
+        except Exception:
+            body.close()
+            raise
+
     async def fetch_data(self, query: str = None, params: dict = None) -> pd.DataFrame:
         # 'query' could be S3 Select in future
-        response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)
-        content = response["Body"].read()
-        return pd.read_csv(io.BytesIO(content))
+        # Download and parse run in the connector executor, not on the event loop
+        return await self.run_blocking(self._read, cancellable=True)
+
+    async def stream_batches(self, query: str = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                             params: dict = None) -> AsyncIterator[pd.DataFrame]:
+        # The response body is read as a stream, one CSV chunk at a time,
+        # instead of pulling the whole object into memory
+        body, reader = await self.run_blocking(self._open_reader, batch_size)
+        try:
+            while True:
+                chunk = await self.run_blocking(next, reader, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            reader.close()
+            body.close()
 
     async def get_schema(self) -> dict:
         return {"source": "s3", "bucket": self.bucket, "key": self.key}
@@ -1,7 +1,12 @@
+from typing import AsyncIterator
+
 import pandas as pd
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy import text
-from app.connectors.base import BaseConnector
+from app.connectors.base import BaseConnector, DEFAULT_BATCH_SIZE
+from app.core.config import settings
+from app.db.instrumentation import instrument_engine
 
 class SQLConnector(BaseConnector):
     """
@@ -13,9 +18,21 @@ class SQLConnector(BaseConnector):
         self.connection_string = config.get("connection_string")
         self.engine = None
 
+    def _engine_options(self) -> dict:
+        # Statement logging is opt-in; it floods the logs on repeated pulls
+        options = {"echo": self.config.get("echo", False), "pool_pre_ping": True}
+        # SQLite engines use a single-file pool that takes no sizing arguments
+        if make_url(self.connection_string).get_backend_name() != "sqlite":
+            options.update(
+                pool_size=self.config.get("pool_size", settings.CONNECTOR_POOL_SIZE),
+                max_overflow=self.config.get("max_overflow", settings.CONNECTOR_MAX_OVERFLOW),
+                pool_recycle=self.config.get("pool_recycle", 1800),
+            )
+        return options
+
     async def connect(self):
         if not self.engine:
-            self.engine = create_async_engine(self.connection_string, echo=True)
+            self.engine = instrument_engine(create_async_engine(self.connection_string, **self._engine_options()))
 
     async def disconnect(self):
         if self.engine:
@@ -36,6 +53,18 @@ class SQLConnector(BaseConnector):
             df = pd.DataFrame(rows, columns=columns)
             return df
 
+    async def stream_batches(self, query: str = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                             params: dict = None) -> AsyncIterator[pd.DataFrame]:
+        if not self.engine:
+            await self.connect()
+
+        async with self.engine.connect() as conn:
+            # Server-side cursor: rows arrive from the database one batch at a time
+            result = await conn.stream(text(query), params or {})
+            columns = list(result.keys())
+            async for rows in result.partitions(batch_size):
+                yield pd.DataFrame(rows, columns=columns)
+
     async def get_schema(self) -> dict:
         # Simplified schema retrieval
         return {"type": "sql", "dialect": self.engine.dialect.name if self.engine else "unknown"}
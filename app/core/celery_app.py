@@ -1,6 +1,11 @@
 from celery import Celery
+from kombu import Queue
 from app.core.config import settings
 
+# BatchRequest.priority -> queue. NORMAL stays on Celery's default queue so
+# single-job submissions and existing workers are unaffected.
+PRIORITY_QUEUES = {"HIGH": "sar_high", "NORMAL": "celery", "LOW": "sar_low"}
+
 celery_app = Celery(
     "worker",
     broker=settings.CELERY_BROKER_URL,
@@ -15,4 +20,9 @@ celery_app.conf.update(
     timezone="UTC",
     enable_utc=True,
     task_track_started=True,
+    # Workers consume every queue by default; with the priority strategy the
+    # Redis transport drains them in this order instead of round-robin.
+    task_queues=[Queue(name) for name in ("sar_high", "celery", "sar_low")],
+    task_default_queue="celery",
+    broker_transport_options={"queue_order_strategy": "priority"},
 )
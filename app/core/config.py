@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import List, Optional, Union
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import AnyHttpUrl, validator
 
@@ -10,16 +10,63 @@ class Settings(BaseSettings):
     
     # DATABASE
     DATABASE_URL: str
+    SQL_ECHO: bool = False # Print every statement and its parameters (local debugging only: exposes PII)
+    DB_SLOW_QUERY_MS: float = 250.0 # Statements slower than this are logged, without parameters
+    DB_QUERY_SAMPLE_RATE: float = 1.0 # Fraction of statements recorded in the per-statement histograms
+    DB_MAX_TRACKED_STATEMENTS: int = 500 # Distinct statements with their own histogram; the rest share one
+    DB_QUERIES_PER_REQUEST_WARN: int = 50 # Requests running more statements than this are logged (N+1)
     
     # REDIS / CELERY
     REDIS_HOST: str
     REDIS_PORT: int
+    REDIS_MAX_CONNECTIONS: int = 50 # Shared async pool used by the API
+    REDIS_POOL_TIMEOUT: float = 5.0 # Seconds to wait for a free pooled connection
     CELERY_BROKER_URL: str
     CELERY_RESULT_BACKEND: str
+    WORKER_PERSISTENT_LOOP: bool = True # One long-lived event loop per worker process
 
     # OLLAMA
     OLLAMA_BASE_URL: str
+    OLLAMA_MAX_CONNECTIONS: int = 10
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS: int = 5
+    OLLAMA_KEEPALIVE_EXPIRY: float = 60.0
+    OLLAMA_CONNECT_TIMEOUT: float = 10.0
+    OLLAMA_READ_TIMEOUT: float = 600.0
+    OLLAMA_WRITE_TIMEOUT: float = 30.0
+    OLLAMA_POOL_TIMEOUT: float = 60.0
+
+    # NARRATIVE CACHE
+    NARRATIVE_CACHE_ENABLED: bool = True
+    NARRATIVE_CACHE_TTL_SECONDS: int = 86400
+    NARRATIVE_CACHE_LOCAL_SIZE: int = 256
     API_KEY: str = "barclays-hackathon-secret-key"
+
+    # PROMPT
+    PROMPT_TRANSACTION_TABLE: bool = False # List cited and context rows in the prompt (opt-in, grows it up to the budget)
+    PROMPT_TOKEN_BUDGET: int = 400 # Estimated tokens for the whole user prompt, with the table on
+    PROMPT_CONTEXT_ROWS: int = 5 # Unflagged transactions listed besides those cited by rules
+
+    # ACCOUNT GRAPH
+    ACCOUNT_GRAPH_PATH: str = "data/account_graph" # Snapshot directory, memory-mapped by workers
+
+    # TRANSACTION STORE
+    TRANSACTION_STORE_ENABLED: bool = False # Serve case details from the columnar store when it has the account
+    TRANSACTION_STORE_PATH: str = "data/transaction_store"
+    TRANSACTION_STORE_PARTITIONS: int = 64
+
+    # CONNECTORS
+    CONNECTOR_MAX_WORKERS: int = 8 # Threads shared by all connectors for blocking I/O and parsing
+    CONNECTOR_MAX_CONCURRENCY: int = 2 # Blocking calls in flight per connector instance
+    CONNECTOR_POOL_SIZE: int = 5 # SQL engine / HTTP connections kept per cached connector
+    CONNECTOR_MAX_OVERFLOW: int = 5
+    CONNECTOR_IDLE_SECONDS: float = 300.0 # Cached connectors unused this long are closed
+    CONNECTOR_MAX_PAGES: int = 10000 # Page-number requests per JSON stream before it gives up
+
+    # S3
+    S3_BUCKET_NAME: Optional[str] = None
+    AWS_ACCESS_KEY_ID: Optional[str] = None
+    AWS_SECRET_ACCESS_KEY: Optional[str] = None
+    AWS_REGION: str = "us-east-1"
     
     # CORS
     ALLOWED_ORIGINS: List[AnyHttpUrl] = []
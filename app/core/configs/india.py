@@ -8,7 +8,9 @@ india_config = RegionConfig(
     report_name="Suspicious Transaction Report (STR)",
     thresholds={
         "structuring": 1000000.0, # 10 Lakhs
-        "rapid_movement": 500000.0 # 5 Lakhs
+        "rapid_movement": 500000.0, # 5 Lakhs
+        "aggregate_structuring": 200000.0, # 2 Lakhs (Sec 269ST cash limit)
+        "velocity_amount": 500000.0 # 5 Lakhs
     }
 )
 
@@ -1,3 +1,8 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
 import httpx
 from app.core.config import settings
 import json
@@ -6,13 +11,151 @@ class LLMEngine:
     def __init__(self):
         self.base_url = settings.OLLAMA_BASE_URL
         self.model = "llama3:latest" # Use specific tag
+        self.max_connections = settings.OLLAMA_MAX_CONNECTIONS
+        # Ollama sampling options (temperature, num_ctx, ...). Part of the narrative cache key.
+        self.options: dict = {}
+
+        # Long-lived pooled client. Created lazily (or in startup()) and bound
+        # to the event loop it was created on.
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Pool utilization counters (see pool_stats())
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._requests_total = 0
+        self._queued_total = 0
+        self._connections_opened = 0
+        self._errors_total = 0
+        self._pool_wait_seconds = 0.0
+        self._request_seconds = 0.0
+
+    def _build_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OLLAMA_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(
+            connect=settings.OLLAMA_CONNECT_TIMEOUT,
+            read=settings.OLLAMA_READ_TIMEOUT,
+            write=settings.OLLAMA_WRITE_TIMEOUT,
+            pool=settings.OLLAMA_POOL_TIMEOUT,
+        )
+        return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            # httpx connections belong to the loop that opened them, so a caller
+            # on a different loop (e.g. a fresh asyncio.run) gets its own client.
+            self._client = self._build_client()
+            self._client_loop = loop
+        return self._client
+
+    async def startup(self):
+        """Create the pooled client on the current event loop."""
+        self._get_client()
+
+    async def shutdown(self):
+        """Close the pooled client and release its keep-alive connections."""
+        client = self._client
+        self._client = None
+        if client is not None and not client.is_closed:
+            try:
+                if self._client_loop is asyncio.get_running_loop():
+                    await client.aclose()
+            except RuntimeError:
+                pass
+        self._client_loop = None
+
+    def reset(self):
+        """
+        Forget the current client without closing it.
+        Used after a fork: the child must not share the parent's sockets.
+        """
+        self._client = None
+        self._client_loop = None
+
+    def pool_stats(self) -> dict:
+        completed = self._requests_total - self._in_flight
+        return {
+            "max_connections": self.max_connections,
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "queued_now": max(0, self._in_flight - self.max_connections),
+            "requests_total": self._requests_total,
+            "queued_total": self._queued_total,
+            "connections_opened": self._connections_opened,
+            "errors_total": self._errors_total,
+            "avg_pool_wait_ms": round(self._pool_wait_seconds / completed * 1000, 2) if completed else 0.0,
+            "avg_request_ms": round(self._request_seconds / completed * 1000, 2) if completed else 0.0,
+        }
+
+    @asynccontextmanager
+    async def _tracked(self):
+        """
+        Bookkeeping for one pooled request. Yields the httpx `trace` callback.
+        """
+        if self._in_flight >= self.max_connections:
+            self._queued_total += 1
+        self._in_flight += 1
+        self._requests_total += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+        started = time.perf_counter()
+        first_event = None
+
+        async def trace(event_name, info):
+            # The first transport event fires once a pooled connection has been
+            # assigned, so the gap before it is time spent waiting on the pool.
+            nonlocal first_event
+            if first_event is None:
+                first_event = time.perf_counter()
+            if event_name == "connection.connect_tcp.complete":
+                self._connections_opened += 1
+
+        try:
+            yield trace
+        except Exception:
+            self._errors_total += 1
+            raise
+        finally:
+            finished = time.perf_counter()
+            self._in_flight -= 1
+            self._pool_wait_seconds += (first_event or finished) - started
+            self._request_seconds += finished - started
+
+    async def _post(self, url: str, payload: dict) -> dict:
+        client = self._get_client()
+        async with self._tracked() as trace:
+            response = await client.post(url, json=payload, extensions={"trace": trace})
+            response.raise_for_status()
+            return response.json()
+
+    async def _stream(self, url: str, payload: dict) -> AsyncIterator[str]:
+        client = self._get_client()
+        async with self._tracked() as trace:
+            async with client.stream("POST", url, json=payload, extensions={"trace": trace}) as response:
+                response.raise_for_status()
+                # Ollama streams NDJSON: one {"response": "...", "done": bool} object per line
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise Exception(chunk["error"])
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
 
     async def generate(self, prompt: str, system_prompt: str = None) -> str:
         """
         Generate text using Ollama asynchronously.
         """
         url = f"{self.base_url}/api/generate"
-        
+
         # Standard Ollama JSON payload
         payload = {
             "model": self.model,
@@ -21,34 +164,69 @@ class LLMEngine:
         }
         if system_prompt:
             payload["system"] = system_prompt
+        if self.options:
+            payload["options"] = self.options
 
         try:
-            # Use 127.0.0.1 for stability and longer timeout
+            # Use 127.0.0.1 for stability
             # On Windows, localhost can sometimes be flaky with httpx
             target_url = url.replace("localhost", "127.0.0.1")
-            
-            async with httpx.AsyncClient(timeout=600.0) as client:
-                print(f"Ollama Request: {self.model} at {target_url}", flush=True)
-                response = await client.post(target_url, json=payload)
-                response.raise_for_status()
-                result = response.json()
-                text = result.get("response", "")
-                print(f"Ollama Response (Proof Check): {text[:100]}...", flush=True)
-                return text
-                
+
+            print(f"Ollama Request: {self.model} at {target_url}", flush=True)
+            result = await self._post(target_url, payload)
+            text = result.get("response", "")
+            print(f"Ollama Response (Proof Check): {text[:100]}...", flush=True)
+            return text
+
         except Exception as e:
             print(f"Ollama connection error (127.0.0.1): {e}", flush=True)
             # Fallback to original base_url (localhost) as a second attempt
             try:
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    print(f"Ollama Retry: {self.model} at {url}", flush=True)
-                    response = await client.post(url, json=payload)
-                    response.raise_for_status()
-                    result = response.json()
-                    return result.get("response", "")
+                print(f"Ollama Retry: {self.model} at {url}", flush=True)
+                result = await self._post(url, payload)
+                return result.get("response", "")
             except Exception as e2:
                 print(f"LLM Generation failed entirely: {e2}", flush=True)
                 # DO NOT RETURN MOCK DATA. The system should show error or stall.
                 raise Exception(f"AI Generation Failed: {str(e2)}. Ensure Ollama is running.")
 
+    async def stream(self, prompt: str, system_prompt: str = None) -> AsyncIterator[str]:
+        """
+        Generate text using Ollama, yielding tokens as they are produced.
+        """
+        url = f"{self.base_url}/api/generate"
+
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True
+        }
+        if system_prompt:
+            payload["system"] = system_prompt
+        if self.options:
+            payload["options"] = self.options
+
+        target_url = url.replace("localhost", "127.0.0.1")
+        received = False
+        try:
+            print(f"Ollama Stream Request: {self.model} at {target_url}", flush=True)
+            async for token in self._stream(target_url, payload):
+                received = True
+                yield token
+            return
+        except Exception as e:
+            # Tokens already handed to the caller cannot be taken back, so only
+            # fall back when the first attempt produced nothing.
+            if received:
+                raise Exception(f"AI Generation Failed mid-stream: {str(e)}")
+            print(f"Ollama connection error (127.0.0.1): {e}", flush=True)
+
+        try:
+            print(f"Ollama Stream Retry: {self.model} at {url}", flush=True)
+            async for token in self._stream(url, payload):
+                yield token
+        except Exception as e2:
+            print(f"LLM Generation failed entirely: {e2}", flush=True)
+            raise Exception(f"AI Generation Failed: {str(e2)}. Ensure Ollama is running.")
+
 llm_engine = LLMEngine()
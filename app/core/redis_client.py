@@ -1,4 +1,7 @@
+import asyncio
+
 import redis
+import redis.asyncio as aioredis
 from app.core.config import settings
 
 # Output a simple synchronous client for API usage
@@ -8,3 +11,50 @@ redis_client = redis.Redis(
     db=1, # Use DB 1 for batch metadata (0 is often default involved with Celery)
     decode_responses=True
 )
+
+class AsyncRedis:
+    """
+    Shared asyncio Redis client for code running on the API event loop.
+
+    The connection pool is created in the app lifespan and reused by every
+    request. Like LLMEngine's client it is bound to the loop that created it,
+    so callers on another loop (scripts, tests) get a fresh one lazily.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._loop = None
+
+    def _build_client(self) -> aioredis.Redis:
+        pool = aioredis.BlockingConnectionPool(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=1,
+            decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+        )
+        return aioredis.Redis(connection_pool=pool)
+
+    @property
+    def client(self) -> aioredis.Redis:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = self._build_client()
+            self._loop = loop
+        return self._client
+
+    async def startup(self):
+        try:
+            await self.client.ping()
+        except redis.RedisError as e:
+            # Connections are retried per request; don't block startup on Redis
+            print(f"Async Redis warm-up failed: {e}", flush=True)
+
+    async def shutdown(self):
+        if self._client is not None:
+            await self._client.aclose(close_connection_pool=True)
+            self._client = None
+            self._loop = None
+
+async_redis = AsyncRedis()
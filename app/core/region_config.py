@@ -7,7 +7,7 @@ class RegionConfig(BaseModel):
     date_format: str
     regulator_name: str
     report_name: str
-    thresholds: Dict[str, float]
+    thresholds: Dict[str, float] # Read by the rules in app/services/analysis_rules.py
     
     # Formatting functions (optional, but Pydantic keeps data)
     
@@ -31,7 +31,9 @@ us_config = RegionConfig(
     report_name="Suspicious Activity Report",
     thresholds={
         "structuring": 10000.0,
-        "rapid_movement": 5000.0
+        "rapid_movement": 5000.0,
+        "aggregate_structuring": 10000.0, # CTR aggregates multiple cash transactions
+        "velocity_amount": 50000.0
     }
 )
 
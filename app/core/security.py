@@ -1,7 +1,7 @@
 from fastapi import Security, HTTPException, status, Depends
 from fastapi.security.api_key import APIKeyHeader
 from app.core.config import settings
-from app.core.redis_client import redis_client
+from app.core.redis_client import async_redis
 import time
 
 # API Key Dependency
@@ -26,11 +26,13 @@ class RateLimiter:
         # Rate limit key per API key
         key = f"rate_limit:{api_key}"
         
-        # Redis logic (Token Bucket / Sliding Window simplified)
-        current = redis_client.incr(key)
-        if current == 1:
-            redis_client.expire(key, self.seconds)
-            
+        # Fixed window: SET NX starts the window with its TTL, INCR counts;
+        # one pipelined round trip, and the key can never be left without a TTL
+        pipe = async_redis.client.pipeline(transaction=True)
+        pipe.set(key, 0, ex=self.seconds, nx=True)
+        pipe.incr(key)
+        _, current = await pipe.execute()
+
         if current > self.times:
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
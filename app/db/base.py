@@ -1,9 +1,10 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from app.core.config import settings
+from app.db.instrumentation import instrument_engine
 
-# Create Async Engine
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
+# Create Async Engine; statements are timed by instrumentation, not echoed
+engine = instrument_engine(create_async_engine(settings.DATABASE_URL, echo=settings.SQL_ECHO))
 
 # Create Session Factory
 AsyncSessionLocal = async_sessionmaker(
@@ -0,0 +1,254 @@
+"""
+Statement timing and per-endpoint query counts, from SQLAlchemy events.
+
+Replaces engine echo: nothing is printed per statement, parameters are
+never recorded, and statements are keyed by their normalised SQL text
+(bind placeholders only, IN lists collapsed), so the metrics hold no PII.
+
+- every statement is timed; those over DB_SLOW_QUERY_MS are logged as one
+  JSON line with the endpoint that ran them
+- DB_QUERY_SAMPLE_RATE of statements go into per-statement histograms
+- QueryCountMiddleware counts statements per request and keeps a
+  queries-per-request histogram per endpoint, which is where an N+1
+  regression shows up; requests over DB_QUERIES_PER_REQUEST_WARN are logged
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms / statements); the last bucket is open-ended
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+OTHER_STATEMENTS = "<other>"
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER = r"(?:\?|\$\d+|%s|%\(\w+\)s|:\w+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)")
+# Multi-row VALUES: "VALUES (?, ?), (?, ?), ..." -> one row
+_VALUES_LIST = re.compile(r"(VALUES\s*\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.IGNORECASE)
+
+def normalize_statement(statement: str) -> str:
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _PLACEHOLDER_LIST.sub("(...)", statement)
+    return _VALUES_LIST.sub(r"\1, ...", statement)
+
+def _bucket(value: float, bounds: tuple) -> str:
+    for bound in bounds:
+        if value <= bound:
+            return f"le_{bound}"
+    return f"gt_{bounds[-1]}"
+
+class _RequestQueries:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+_current_request: ContextVar[Optional[_RequestQueries]] = ContextVar("db_request_queries", default=None)
+# The request's ASGI scope; routing fills in the route once it has matched
+_current_scope: ContextVar[Optional[dict]] = ContextVar("db_request_scope", default=None)
+
+_route_paths: Dict[object, str] = {}
+
+def endpoint_name(scope: Optional[dict]) -> Optional[str]:
+    """Method and route template, e.g. "GET /api/v1/cases/{account_number}"; never the raw path."""
+    if scope is None:
+        return None
+    endpoint = scope.get("endpoint")
+    path = getattr(scope.get("route"), "path", None)
+    if path is None and endpoint is not None:
+        # Starlette only records the matched endpoint; find its route once
+        if endpoint not in _route_paths:
+            routes = getattr(scope.get("app"), "routes", ())
+            _route_paths[endpoint] = next(
+                (route.path for route in routes if getattr(route, "endpoint", None) is endpoint),
+                getattr(endpoint, "__name__", "<unknown>"),
+            )
+        path = _route_paths[endpoint]
+    return f"{scope.get('method')} {path or '<unmatched>'}"
+
+class QueryStats:
+    """Process-wide statement and endpoint metrics."""
+
+    def __init__(self, slow_query_ms: float = None, sample_rate: float = None,
+                 max_statements: int = None, queries_per_request_warn: int = None):
+        self.slow_query_ms = settings.DB_SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms
+        self.sample_rate = settings.DB_QUERY_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.max_statements = max_statements or settings.DB_MAX_TRACKED_STATEMENTS
+        self.queries_per_request_warn = queries_per_request_warn or settings.DB_QUERIES_PER_REQUEST_WARN
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.statements_total = 0
+            self.slow_total = 0
+            self.errors_total = 0
+            self.seconds_total = 0.0
+            self._statements: Dict[str, dict] = {}
+            self._endpoints: Dict[str, dict] = {}
+
+    def record_statement(self, statement: str, seconds: float):
+        request = _current_request.get()
+        if request is not None:
+            request.count += 1
+            request.seconds += seconds
+        ms = seconds * 1000
+        slow = ms >= self.slow_query_ms
+        sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        key = normalize_statement(statement) if sampled or slow else None
+        with self._lock:
+            self.statements_total += 1
+            self.seconds_total += seconds
+            if slow:
+                self.slow_total += 1
+            if sampled:
+                if key not in self._statements and len(self._statements) >= self.max_statements:
+                    key = OTHER_STATEMENTS
+                entry = self._statements.get(key)
+                if entry is None:
+                    entry = self._statements[key] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "histogram": {}}
+                entry["count"] += 1
+                entry["total_ms"] += ms
+                entry["max_ms"] = max(entry["max_ms"], ms)
+                bucket = _bucket(ms, LATENCY_BUCKETS_MS)
+                entry["histogram"][bucket] = entry["histogram"].get(bucket, 0) + 1
+        if slow:
+            logger.warning(json.dumps({
+                "event": "slow_query",
+                "ms": round(ms, 2),
+                "endpoint": endpoint_name(_current_scope.get()),
+                "statement": key,
+            }))
+
+    def record_error(self):
+        with self._lock:
+            self.errors_total += 1
+
+    def record_request(self, endpoint: str, request: _RequestQueries):
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = self._endpoints[endpoint] = {"requests": 0, "queries": 0, "max_queries": 0,
+                                                     "db_ms": 0.0, "histogram": {}}
+            entry["requests"] += 1
+            entry["queries"] += request.count
+            entry["max_queries"] = max(entry["max_queries"], request.count)
+            entry["db_ms"] += request.seconds * 1000
+            bucket = _bucket(request.count, QUERY_COUNT_BUCKETS)
+            entry["histogram"][bucket] = entry["histogram"].get(bucket, 0) + 1
+        if request.count > self.queries_per_request_warn:
+            logger.warning(json.dumps({
+                "event": "query_count",
+                "endpoint": endpoint,
+                "queries": request.count,
+                "db_ms": round(request.seconds * 1000, 2),
+            }))
+
+    def snapshot(self, top: int = 20) -> dict:
+        """Totals, per-endpoint query counts and the `top` statements by total time."""
+        with self._lock:
+            statements = sorted(self._statements.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+            return {
+                "statements_total": self.statements_total,
+                "slow_total": self.slow_total,
+                "errors_total": self.errors_total,
+                "total_ms": round(self.seconds_total * 1000, 2),
+                "sample_rate": self.sample_rate,
+                "slow_query_ms": self.slow_query_ms,
+                "endpoints": {
+                    name: {
+                        **entry,
+                        "db_ms": round(entry["db_ms"], 2),
+                        "avg_queries": round(entry["queries"] / entry["requests"], 2),
+                        "histogram": dict(entry["histogram"]),
+                    }
+                    for name, entry in sorted(self._endpoints.items())
+                },
+                "statements": [
+                    {
+                        "statement": key,
+                        "count": entry["count"],
+                        "total_ms": round(entry["total_ms"], 2),
+                        "avg_ms": round(entry["total_ms"] / entry["count"], 3),
+                        "max_ms": round(entry["max_ms"], 2),
+                        "histogram": dict(entry["histogram"]),
+                    }
+                    for key, entry in statements[:top]
+                ],
+            }
+
+query_stats = QueryStats()
+
+def instrument_engine(engine, stats: QueryStats = None):
+    """Time every statement of a sync or async engine into `stats` (default query_stats)."""
+    stats = stats or query_stats
+    sync_engine: Engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        stats.record_statement(statement, time.perf_counter() - conn.info["query_start"].pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+        stats.record_error()
+
+    return engine
+
+class QueryCountMiddleware:
+    """
+    ASGI middleware counting the statements each request runs, including
+    those issued while a streaming body is sent. Requests are grouped by
+    route template (e.g. "GET /api/v1/cases/{account_number}").
+    """
+
+    def __init__(self, app, stats: QueryStats = None):
+        self.app = app
+        self.stats = stats or query_stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request = _RequestQueries()
+        request_token = _current_request.set(request)
+        scope_token = _current_scope.set(scope)
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            if not recorded:
+                recorded = True
+                self.stats.record_request(endpoint_name(scope), request)
+
+        async def send_and_count(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_and_count)
+        finally:
+            record()
+            _current_request.reset(request_token)
+            _current_scope.reset(scope_token)
@@ -3,6 +3,11 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.endpoints import generation, batch, cases, auth
+from app.core.llm import llm_engine
+from app.core.redis_client import async_redis
+from app.connectors.executor import connector_executor
+from app.connectors.registry import connector_registry
+from app.db.instrumentation import QueryCountMiddleware, query_stats
 # Ensure configs are loaded
 import app.core.configs.india 
 
@@ -12,10 +17,19 @@ async def lifespan(app: FastAPI):
     # Startup:
     print("Starting up SAR Generation System...")
     # Initialize DB connection (TODO)
-    # Initialize ML models (TODO)
+    # Warm up the pooled LLM client
+    await llm_engine.startup()
+    # Shared async Redis pool (rate limiting, batch status, streams)
+    await async_redis.startup()
     yield
     # Shutdown:
     print("Shutting down SAR Generation System...")
+    await llm_engine.shutdown()
+    await async_redis.shutdown()
+    # Dispose cached SQL engines and HTTP sessions
+    await connector_registry.shutdown()
+    # Drop queued connector reads; running ones finish in the background
+    connector_executor.shutdown()
     # Close DB connection (TODO)
 
 app = FastAPI(
@@ -33,6 +47,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Statements per request and per endpoint, for /health/db
+app.add_middleware(QueryCountMiddleware)
+
 app.include_router(generation.router, prefix="/api/v1/generation", tags=["Generation"])
 app.include_router(batch.router, prefix="/api/v1/batch", tags=["Batch Processing"])
 app.include_router(cases.router, prefix="/api/v1/cases", tags=["Case Management"])
@@ -53,9 +70,15 @@ async def health_check():
     return {
         "status": "ok", 
         "project": settings.PROJECT_NAME,
-        "database": db_status
+        "database": db_status,
+        "llm_pool": llm_engine.pool_stats()
     }
 
+@app.get("/health/db")
+async def db_metrics():
+    """Statement timings, slow-query count and per-endpoint query counts."""
+    return query_stats.snapshot()
+
 @app.get("/")
 def root():
     return {"message": "Welcome to SAR Generation AI System API"}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.base import Base
@@ -14,11 +14,17 @@ class Transaction(Base):
     amount = Column(Float, nullable=False)
     currency = Column(String, default="USD")
     timestamp = Column(DateTime, default=datetime.utcnow)
-    sender_account = Column(String, index=True)
-    receiver_account = Column(String, index=True)
+    sender_account = Column(String)
+    receiver_account = Column(String)
     description = Column(String, nullable=True)
     transaction_type = Column(String, default="WIRE")
 
+    __table_args__ = (
+        # Per-account history is a UNION of these two range scans (see case_queries)
+        Index("ix_transactions_sender_timestamp", "sender_account", "timestamp"),
+        Index("ix_transactions_receiver_timestamp", "receiver_account", "timestamp"),
+    )
+
 class Alert(Base):
     __tablename__ = "alerts"
     
@@ -28,7 +34,12 @@ class Alert(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
     details = Column(JSON)
     sar_id = Column(String, ForeignKey("sars.sar_id"), nullable=True)
-    account_number = Column(String, index=True) # Link alert to a specific account/case
+    account_number = Column(String) # Link alert to a specific account/case
+
+    __table_args__ = (
+        # Covers count + min(rule_name) per account
+        Index("ix_alerts_account_rule", "account_number", "rule_name"),
+    )
 
 class SAR(Base):
     __tablename__ = "sars"
@@ -48,6 +59,67 @@ class SAR(Base):
     
     alerts = relationship("Alert", backref="sar")
 
+    __table_args__ = (
+        # status IN (...) ORDER BY generated_at
+        Index("ix_sars_status_generated_at", "status", "generated_at"),
+    )
+
+class CaseSummary(Base):
+    """
+    Materialized per-account case view, maintained incrementally as
+    transactions and alerts are inserted (see app/services/case_summary.py).
+    """
+    __tablename__ = "case_summary"
+
+    account_number = Column(String, primary_key=True)
+
+    # Counters folded in from transactions
+    tx_count = Column(Integer, default=0, nullable=False)
+    total_amount = Column(Float, default=0.0, nullable=False)
+    high_value_count = Column(Integer, default=0, nullable=False)
+    first_tx_at = Column(DateTime, nullable=True)
+    first_tx_id = Column(String, nullable=True)
+    first_description = Column(String, nullable=True)
+    receives_salary = Column(Boolean, default=False, nullable=False)
+    sends_salary = Column(Boolean, default=False, nullable=False)
+    salary_in_max = Column(Float, default=0.0, nullable=False)
+    payroll_out_total = Column(Float, default=0.0, nullable=False)
+
+    # Counters folded in from alerts
+    alert_count = Column(Integer, default=0, nullable=False)
+    typology = Column(String, nullable=True, index=True)
+
+    # Derived from the counters above
+    risk_rank = Column(Integer, default=1, nullable=False) # 1=LOW, 2=MEDIUM, 3=HIGH
+    risk_rating = Column(String, default="LOW", nullable=False, index=True)
+    occupation = Column(String, nullable=True)
+    expected_turnover = Column(Float, default=0.0, nullable=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Keyset pagination orders by (sort column, account_number)
+        Index("ix_case_summary_risk_rank", "risk_rank", "account_number"),
+        Index("ix_case_summary_alert_count", "alert_count", "account_number"),
+    )
+
+class IngestCheckpoint(Base):
+    """
+    Progress of a resumable ingestion job, committed together with each
+    batch it loads (see app/services/ingestion.py).
+    """
+    __tablename__ = "ingest_checkpoints"
+
+    job_id = Column(String, primary_key=True)
+    target = Column(String, nullable=False) # transactions | alerts
+    batches_done = Column(Integer, default=0, nullable=False)
+    rows_read = Column(Integer, default=0, nullable=False) # Source rows consumed; a resume skips these
+    rows_inserted = Column(Integer, default=0, nullable=False)
+    rows_duplicate = Column(Integer, default=0, nullable=False)
+    rows_rejected = Column(Integer, default=0, nullable=False)
+    completed = Column(Boolean, default=False, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -65,3 +137,6 @@ class AuditBlock(Base):
     action = Column(String)
     user_id = Column(String)
     data_hash = Column(String)
+
+# Keep case_summary in step with Transaction/Alert inserts (registers ORM events)
+import app.services.case_summary  # noqa: E402,F401
@@ -8,6 +8,8 @@ class GenerateRequest(BaseModel):
     alerts: List[Alert]
     region: str = "US"
     typology: Optional[str] = None
+    stream: bool = False # Publish narrative tokens for /generation/stream/{job_id}
+    bypass_cache: bool = False # Force a fresh LLM call instead of reusing a cached narrative
 
 class ExplainRequest(BaseModel):
     text_segment: str
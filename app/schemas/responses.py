@@ -38,3 +38,4 @@ class Case(BaseModel):
 
 class CaseList(BaseModel):
     cases: List[Case]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,416 @@
+"""
+Account-to-account transfer graph in compressed sparse row (CSR) form.
+
+Transactions are aggregated into one edge per (sender, receiver) pair
+holding the transfer count, total amount and first/last timestamps. Edges
+are stored twice, sorted by sender (out_*) and by receiver (in_*), so the
+counterparties of an account in either direction are one contiguous slice.
+Account ids are a sorted fixed-width byte array, looked up by binary
+search. Every array is plain numpy, so a snapshot is a directory of .npy
+files that worker processes memory-map instead of rebuilding the graph.
+
+The graph also keeps each account's transaction count, counted the way
+case_summary counts it. case_summary is updated in the same database
+transaction as every insert, so a refresh reloads exactly the accounts
+whose count differs, whatever their rows' timestamps.
+
+Usage:
+    python -m app.services.account_graph build             # full build, writes the snapshot
+    python -m app.services.account_graph refresh           # reload accounts with new transactions
+    python -m app.services.account_graph show <account>    # queries for one account
+"""
+import asyncio
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.models.sql import Transaction
+from app.services.case_summary import CHUNK_SIZE, drifted_accounts
+
+EDGE_FIELDS = ("src", "dst", "count", "amount", "first_us", "last_us")
+ARRAYS = (
+    "accounts", "out_indptr", "out_dst", "out_count", "out_amount", "out_first_us", "out_last_us",
+    "in_indptr", "in_src", "in_edge", "tx_count",
+)
+STREAM_CHUNK_ROWS = 100_000
+# Transactions buffered by build() before they are folded into the CSR arrays
+BUILD_MERGE_ROWS = 1_000_000
+
+Encoded = Tuple[np.ndarray, Dict[str, np.ndarray], np.ndarray]
+
+def encode_transactions(frame: pd.DataFrame) -> Encoded:
+    """
+    Sorted account ids (UTF-8 bytes), one edge entry per transaction row
+    (sender_account, receiver_account, amount, timestamp) with integer
+    account codes into them, and each account's transaction count. Rows
+    missing an account count for the other one but make no edge; a
+    self-transfer counts once, as in case_summary.
+    """
+    n = len(frame)
+    sides = [frame[column].to_numpy(dtype=object) for column in ("sender_account", "receiver_account")]
+    # Empty account strings are no account, as in case_summary
+    codes, names = pd.factorize(np.concatenate([np.where(side == "", None, side) for side in sides]))
+    # Fixed-width bytes, unlike object arrays, can be saved and memory-mapped
+    names = np.char.encode(np.asarray(names, dtype=str), "utf-8")
+    order = np.argsort(names, kind="stable")
+    rank = np.empty(len(names), dtype=np.int64)
+    rank[order] = np.arange(len(names))
+    codes = np.where(codes >= 0, rank[codes], -1)
+    src, dst = codes[:n], codes[n:]
+    tx_count = (np.bincount(src[src >= 0], minlength=len(names))
+                + np.bincount(dst[(dst >= 0) & (dst != src)], minlength=len(names)))
+    edge = (src >= 0) & (dst >= 0)
+    ts_us = pd.to_datetime(frame["timestamp"]).to_numpy(dtype="datetime64[us]").astype(np.int64)[edge]
+    return names[order], {
+        "src": src[edge], "dst": dst[edge], "count": np.ones(int(edge.sum()), dtype=np.int64),
+        "amount": frame["amount"].to_numpy(dtype=np.float64)[edge], "first_us": ts_us, "last_us": ts_us,
+    }, tx_count.astype(np.int64)
+
+def _reduce_edges(n_accounts: int, edges: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    # Sort by (src, dst) and fold repeated pairs into one edge
+    key = edges["src"].astype(np.int64) * n_accounts + edges["dst"]
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    if not len(key):
+        return {name: edges[name][:0].astype(np.int64 if name != "amount" else np.float64) for name in EDGE_FIELDS}
+    starts = np.flatnonzero(np.concatenate([[True], key[1:] != key[:-1]]))
+    return {
+        "src": key[starts] // n_accounts,
+        "dst": key[starts] % n_accounts,
+        "count": np.add.reduceat(edges["count"][order], starts),
+        "amount": np.add.reduceat(edges["amount"][order], starts),
+        "first_us": np.minimum.reduceat(edges["first_us"][order], starts),
+        "last_us": np.maximum.reduceat(edges["last_us"][order], starts),
+    }
+
+def _gather(indptr: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    # Positions of every CSR entry of `nodes`, concatenated, without a Python loop
+    starts, ends = indptr[nodes], indptr[nodes + 1]
+    lengths = ends - starts
+    if not lengths.sum():
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+class AccountGraph:
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.out_dst)
+
+    # --- Construction -------------------------------------------------------
+
+    @classmethod
+    def from_edges(cls, accounts: np.ndarray, edges: Dict[str, np.ndarray], tx_count: np.ndarray) -> "AccountGraph":
+        """
+        Graph over sorted `accounts` from edge entries (repeated pairs are
+        summed) and the accounts' transaction counts.
+        """
+        n = len(accounts)
+        edges = _reduce_edges(n, edges)
+        src, dst = edges["src"], edges["dst"]
+        in_order = np.lexsort((src, dst))
+        arrays = {
+            "accounts": accounts,
+            "out_indptr": np.concatenate([[0], np.cumsum(np.bincount(src, minlength=n))]).astype(np.int64),
+            "out_dst": dst.astype(np.int32),
+            "out_count": edges["count"],
+            "out_amount": edges["amount"],
+            "out_first_us": edges["first_us"],
+            "out_last_us": edges["last_us"],
+            "in_indptr": np.concatenate([[0], np.cumsum(np.bincount(dst, minlength=n))]).astype(np.int64),
+            "in_src": src[in_order].astype(np.int32),
+            # Incoming edges point back at their slot in the out_* arrays
+            "in_edge": in_order.astype(np.int64),
+            "tx_count": tx_count,
+        }
+        return cls(arrays)
+
+    @classmethod
+    def empty(cls) -> "AccountGraph":
+        edges = {name: np.empty(0, dtype=np.float64 if name == "amount" else np.int64) for name in EDGE_FIELDS}
+        return cls.from_edges(np.empty(0, dtype="S1"), edges, np.empty(0, dtype=np.int64))
+
+    def _edge_list(self) -> Dict[str, np.ndarray]:
+        return {
+            "src": np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.out_indptr)),
+            "dst": self.out_dst.astype(np.int64), "count": self.out_count, "amount": self.out_amount,
+            "first_us": self.out_first_us, "last_us": self.out_last_us,
+        }
+
+    def _merge_encoded(self, parts: List[Encoded]) -> "AccountGraph":
+        # Union the account ids, remap every part's codes onto it, then re-sort once
+        parts = [part for part in parts if len(part[0])]
+        if not parts:
+            return self
+        accounts = self.accounts
+        for names, _, _ in parts:
+            accounts = np.union1d(accounts, names)
+        merged, tx_count = [], np.zeros(len(accounts), dtype=np.int64)
+        for names, edges, counts in [(self.accounts, self._edge_list(), self.tx_count)] + parts:
+            remap = np.searchsorted(accounts, names)
+            merged.append({**edges, "src": remap[edges["src"]], "dst": remap[edges["dst"]]})
+            tx_count[remap] += counts
+        edges = {name: np.concatenate([part[name] for part in merged]) for name in EDGE_FIELDS}
+        return AccountGraph.from_edges(accounts, edges, tx_count)
+
+    def merge(self, transactions: pd.DataFrame) -> "AccountGraph":
+        """New graph with the given transaction rows folded in."""
+        if transactions.empty:
+            return self
+        return self._merge_encoded([encode_transactions(transactions)])
+
+    def without(self, accounts: List[str]) -> "AccountGraph":
+        """New graph with every edge touching `accounts` removed and their counts cleared."""
+        keys = np.char.encode(np.asarray(accounts, dtype=str), "utf-8")
+        dropped = np.isin(self.accounts, keys)
+        edges = self._edge_list()
+        kept = ~(dropped[edges["src"]] | dropped[edges["dst"]])
+        return AccountGraph.from_edges(self.accounts, {name: edges[name][kept] for name in EDGE_FIELDS},
+                                       np.where(dropped, 0, self.tx_count))
+
+    def account_counts(self) -> Dict[str, int]:
+        """Transactions per account, as case_summary counts them."""
+        nonzero = np.flatnonzero(self.tx_count)
+        return dict(zip((self._name(i) for i in nonzero.tolist()), self.tx_count[nonzero].tolist()))
+
+    @staticmethod
+    async def _stream_transactions(conn: AsyncConnection, accounts: Optional[List[str]] = None):
+        """Every transaction, or each one touching `accounts` once."""
+        t = Transaction.__table__.c
+        query = select(t.sender_account, t.receiver_account, t.amount, t.timestamp)
+        wanted = None if accounts is None else pd.Index(accounts)
+        for chunk in ([None] if accounts is None else
+                      (accounts[i:i + CHUNK_SIZE] for i in range(0, len(accounts), CHUNK_SIZE))):
+            chunk_query = query if chunk is None else query.where(
+                or_(t.sender_account.in_(chunk), t.receiver_account.in_(chunk))
+            )
+            result = await conn.stream(chunk_query)
+            async for rows in result.partitions(STREAM_CHUNK_ROWS):
+                frame = pd.DataFrame(rows, columns=["sender_account", "receiver_account", "amount", "timestamp"])
+                if chunk is not None:
+                    # A row between two chunks' accounts is kept by its sender's chunk
+                    sender = frame["sender_account"]
+                    frame = frame[sender.isin(chunk) | ~sender.isin(wanted)]
+                yield frame
+
+    async def _fold_stream(self, conn: AsyncConnection, accounts: Optional[List[str]] = None) -> "AccountGraph":
+        graph, pending, pending_rows = self, [], 0
+        keys = None if accounts is None else np.char.encode(np.asarray(accounts, dtype=str), "utf-8")
+        async for chunk in self._stream_transactions(conn, accounts):
+            names, edges, tx_count = encode_transactions(chunk)
+            if keys is not None:
+                # Counterparties outside `accounts` already count these rows
+                tx_count = np.where(np.isin(names, keys), tx_count, 0)
+            pending.append((names, edges, tx_count))
+            pending_rows += len(chunk)
+            if pending_rows >= BUILD_MERGE_ROWS:
+                graph, pending, pending_rows = graph._merge_encoded(pending), [], 0
+        return graph._merge_encoded(pending)
+
+    @classmethod
+    async def build(cls, conn: AsyncConnection) -> "AccountGraph":
+        """Full build from the transactions table, read in chunks."""
+        return await cls.empty()._fold_stream(conn)
+
+    async def refresh(self, conn: AsyncConnection) -> "AccountGraph":
+        """
+        New graph with the accounts whose transaction count differs from
+        case_summary reloaded: their edges are dropped and rebuilt from
+        every transaction touching them.
+        """
+        stale = await conn.run_sync(drifted_accounts, self.account_counts())
+        if not stale:
+            return self
+        return await self.without(stale)._fold_stream(conn, stale)
+
+    # --- Snapshots ----------------------------------------------------------
+
+    def save(self, path: str):
+        """
+        Write the snapshot directory. The new files are written aside and
+        swapped in, so processes that mapped the old snapshot keep reading it.
+        """
+        tmp, old = f"{path}.tmp", f"{path}.old"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name in ARRAYS:
+            np.save(os.path.join(tmp, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"accounts": len(self), "edges": self.edge_count,
+                       "saved_at": datetime.utcnow().isoformat()}, f)
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, old)
+        os.rename(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "AccountGraph":
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+            for name in ARRAYS
+        }
+        return cls(arrays)
+
+    # --- Queries ------------------------------------------------------------
+
+    def index(self, account: str) -> Optional[int]:
+        key = account.encode("utf-8")
+        i = int(np.searchsorted(self.accounts, key))
+        if i < len(self) and self.accounts[i] == key:
+            return i
+        return None
+
+    def _name(self, i: int) -> str:
+        return self.accounts[i].decode("utf-8")
+
+    def _neighbours(self, nodes: np.ndarray, direction: str) -> np.ndarray:
+        parts = []
+        if direction in ("out", "both"):
+            parts.append(self.out_dst[_gather(self.out_indptr, nodes)])
+        if direction in ("in", "both"):
+            parts.append(self.in_src[_gather(self.in_indptr, nodes)])
+        return np.unique(np.concatenate(parts))
+
+    def _hop_distances(self, start: int, hops: int, direction: str) -> Dict[int, int]:
+        distances = {start: 0}
+        visited = np.array([start], dtype=np.int32)
+        frontier = visited
+        for hop in range(1, hops + 1):
+            frontier = np.setdiff1d(self._neighbours(frontier, direction), visited, assume_unique=True)
+            if not len(frontier):
+                break
+            distances.update(dict.fromkeys(frontier.tolist(), hop))
+            visited = np.union1d(visited, frontier)
+        return distances
+
+    def neighbourhood(self, account: str, hops: int = 2, direction: str = "both") -> Dict[str, int]:
+        """Accounts within `hops` transfers of `account` ("out", "in" or "both"), with their distance."""
+        start = self.index(account)
+        if start is None:
+            return {}
+        return {self._name(i): d for i, d in self._hop_distances(start, hops, direction).items() if i != start}
+
+    def cycles(self, account: str, max_length: int = 4, limit: int = 50) -> List[dict]:
+        """
+        Simple transfer cycles through `account` of at most `max_length`
+        edges (round-tripping), with the smallest edge amount on each.
+        """
+        start = self.index(account)
+        if start is None:
+            return []
+        # Only accounts that can pay back into `account` in time are worth walking into
+        back = self._hop_distances(start, max_length - 1, "in")
+        back_nodes = np.fromiter(back, dtype=np.int64, count=len(back))
+        back_order = np.argsort(back_nodes)
+        back_nodes = back_nodes[back_order]
+        back_dist = np.fromiter(back.values(), dtype=np.int64, count=len(back))[back_order]
+
+        found = []
+        path, amounts = [start], []
+
+        def walk(node: int):
+            lo, hi = self.out_indptr[node], self.out_indptr[node + 1]
+            targets = self.out_dst[lo:hi]
+            pos = np.minimum(np.searchsorted(back_nodes, targets), len(back_nodes) - 1)
+            reachable = (back_nodes[pos] == targets) & (back_dist[pos] <= max_length - len(path))
+            for offset in np.flatnonzero(reachable).tolist():
+                if len(found) >= limit:
+                    return
+                target, amount = int(targets[offset]), float(self.out_amount[lo + offset])
+                if target == start:
+                    if len(path) > 1:
+                        found.append({"accounts": [self._name(i) for i in path] + [account],
+                                      "amount": min(amounts + [amount])})
+                elif target not in path and len(path) < max_length:
+                    path.append(target)
+                    amounts.append(amount)
+                    walk(target)
+                    path.pop()
+                    amounts.pop()
+
+        walk(start)
+        return found
+
+    def flow_through(self, account: str) -> dict:
+        """
+        Money in vs money out of `account`. The ratio is min/max of the two
+        totals: near 1.0 means funds pass straight through.
+        """
+        i = self.index(account)
+        if i is None:
+            return {"account": account, "inflow": 0.0, "outflow": 0.0, "ratio": 0.0, "senders": 0, "receivers": 0}
+        out_edges = np.arange(self.out_indptr[i], self.out_indptr[i + 1])
+        in_edges = self.in_edge[self.in_indptr[i]:self.in_indptr[i + 1]]
+        inflow, outflow = float(self.out_amount[in_edges].sum()), float(self.out_amount[out_edges].sum())
+        larger = max(inflow, outflow)
+        return {
+            "account": account,
+            "inflow": inflow,
+            "outflow": outflow,
+            "ratio": min(inflow, outflow) / larger if larger else 0.0,
+            "senders": len(in_edges),
+            "receivers": len(out_edges),
+        }
+
+_cached = {"mtime": None, "graph": None}
+
+def get_account_graph(path: Optional[str] = None) -> Optional[AccountGraph]:
+    """
+    Memory-mapped graph from the snapshot at ACCOUNT_GRAPH_PATH, reloaded
+    when a newer snapshot is saved. None when no snapshot exists yet.
+    """
+    path = path or settings.ACCOUNT_GRAPH_PATH
+    try:
+        mtime = os.stat(os.path.join(path, "meta.json")).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _cached["mtime"] != mtime:
+        _cached["graph"], _cached["mtime"] = AccountGraph.load(path), mtime
+    return _cached["graph"]
+
+async def _main(command: str, account: Optional[str] = None):
+    from app.db.base import engine
+
+    path = settings.ACCOUNT_GRAPH_PATH
+    if command == "show":
+        graph = get_account_graph(path)
+        if graph is None:
+            print(f"No account graph snapshot at {path}; run build first")
+            return
+        print(json.dumps({
+            "flow_through": graph.flow_through(account),
+            "cycles": graph.cycles(account),
+            "neighbourhood": graph.neighbourhood(account),
+        }, indent=2))
+        return
+
+    async with engine.connect() as conn:
+        current = get_account_graph(path) if command == "refresh" else None
+        graph = await current.refresh(conn) if current is not None else await AccountGraph.build(conn)
+    await engine.dispose()
+    graph.save(path)
+    print(f"Account graph saved to {path}: {len(graph)} accounts, {graph.edge_count} edges")
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command not in ("build", "refresh", "show") or (command == "show" and len(sys.argv) < 3):
+        print("Usage: python -m app.services.account_graph [build|refresh|show <account>]")
+        sys.exit(1)
+    asyncio.run(_main(command, sys.argv[2] if command == "show" else None))
@@ -1,56 +1,98 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union
+
+import numpy as np
+
+from app.core.region_config import RegionFactory
 from app.schemas.models import Transaction, Alert
-from datetime import timedelta
+from app.services.analysis_rules import AnalysisContext, RuleRegistry
+from app.services.transaction_frame import TransactionFrame, from_epoch_us
 
 class AnalysisEngine:
     """
     Rule-based engine to detect suspicious patterns before AI generation.
+    Runs every rule in RuleRegistry (vectorized NumPy over a TransactionFrame)
+    with the thresholds of the request's region. Transaction lists are
+    converted to a frame on the way in.
     """
-    
-    def detect_structuring(self, transactions: List[Transaction]) -> List[Dict]:
+
+    @staticmethod
+    def _as_frame(transactions: Union[List[Transaction], TransactionFrame]) -> TransactionFrame:
+        if isinstance(transactions, TransactionFrame):
+            return transactions
+        return TransactionFrame.from_transactions(transactions)
+
+    def run_rule(self, name: str, transactions: Union[List[Transaction], TransactionFrame],
+                 region: str = "US", account_number: Optional[str] = None) -> List[Dict]:
+        region_config = RegionFactory.get(region)
+        rule = RuleRegistry.get(name)
+        ctx = AnalysisContext(self._as_frame(transactions), region_config, account_number)
+        return rule.detect(ctx, rule.params(region_config))
+
+    def detect_structuring(self, transactions: Union[List[Transaction], TransactionFrame], region: str = "US") -> List[Dict]:
         """
         Detect transactions just below reporting thresholds (e.g., $10,000).
         """
-        suspicious = []
-        for txn in transactions:
-            if 9000 <= txn.amount < 10000:
-                suspicious.append({
-                    "type": "Structuring",
-                    "transaction_id": txn.transaction_id,
-                    "reason": f"Amount ${txn.amount} is just below $10,000 threshold."
-                })
-        return suspicious
-
-    def detect_rapid_movement(self, transactions: List[Transaction]) -> List[Dict]:
-        """
-        Detect rapid in/out movement (mock logic for now).
-        """
-        # Complex logic would go here (sorting by time, checking balance)
-        # For prototype, we check if multiple large transactions occur same day
-        if len(transactions) < 2:
-            return []
-            
-        sorted_txns = sorted(transactions, key=lambda x: x.timestamp)
-        suspicious = []
-        
-        for i in range(len(sorted_txns) - 1):
-            t1 = sorted_txns[i]
-            t2 = sorted_txns[i+1]
-            
-            if (t2.timestamp - t1.timestamp) < timedelta(hours=24) and t1.amount > 5000 and t2.amount > 5000:
-                 suspicious.append({
-                    "type": "Rapid Movement",
-                    "ids": [t1.transaction_id, t2.transaction_id],
-                    "reason": "Large transactions within 24 hours."
-                })
-        return suspicious
-
-    def analyze(self, transactions: List[Transaction]) -> Dict[str, Any]:
-        return {
-            "structuring": self.detect_structuring(transactions),
-            "rapid_movement": self.detect_rapid_movement(transactions),
-            "total_volume": sum(t.amount for t in transactions),
-            "txn_count": len(transactions)
+        return self.run_rule("structuring", transactions, region)
+
+    def detect_rapid_movement(self, transactions: Union[List[Transaction], TransactionFrame], region: str = "US") -> List[Dict]:
+        """
+        Detect consecutive large transactions (by time) less than 24h apart.
+        """
+        return self.run_rule("rapid_movement", transactions, region)
+
+    def analyze(self, transactions: Union[List[Transaction], TransactionFrame], region: str = "US",
+                account_number: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Findings of every registered rule, keyed by rule name, plus totals.
+        With `account_number`, account-level rules (windows, fan-in/out,
+        round-tripping) only look at that account, not its counterparties.
+        """
+        frame = self._as_frame(transactions)
+        region_config = RegionFactory.get(region)
+        ctx = AnalysisContext(frame, region_config, account_number)
+
+        result: Dict[str, Any] = {rule.name: rule.detect(ctx, rule.params(region_config)) for rule in RuleRegistry.all()}
+        result["total_volume"] = float(frame.amount.sum())
+        result["txn_count"] = len(frame)
+        return result
+
+    def summarize(self, transactions: Union[List[Transaction], TransactionFrame],
+                  account_number: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Statistical summary of the full transaction set: amount distribution,
+        period covered and, with `account_number`, money in and out of that
+        account and its number of distinct counterparties.
+        """
+        frame = self._as_frame(transactions)
+        if len(frame) == 0:
+            return {"txn_count": 0}
+
+        amount = frame.amount
+        low, median, p95, high = np.percentile(amount, [0, 50, 95, 100]).tolist()
+        summary: Dict[str, Any] = {
+            "txn_count": len(frame),
+            "total_volume": round(float(amount.sum()), 2),
+            "first": from_epoch_us(frame.ts_us.min()).date().isoformat(),
+            "last": from_epoch_us(frame.ts_us.max()).date().isoformat(),
+            "amount_min": round(low, 2),
+            "amount_median": round(median, 2),
+            "amount_p95": round(p95, 2),
+            "amount_max": round(high, 2),
         }
 
+        matches = np.flatnonzero(frame.accounts == account_number) if account_number is not None else []
+        if len(matches):
+            subject = matches[0]
+            incoming = (frame.receiver == subject) & (frame.sender != subject)
+            outgoing = frame.sender == subject
+            summary.update({
+                "in_count": int(incoming.sum()),
+                "in_total": round(float(amount[incoming].sum()), 2),
+                "out_count": int(outgoing.sum()),
+                "out_total": round(float(amount[outgoing].sum()), 2),
+                "senders": len(np.unique(frame.sender[incoming])),
+                "receivers": len(np.unique(frame.receiver[outgoing])),
+            })
+        return summary
+
 analysis_engine = AnalysisEngine()
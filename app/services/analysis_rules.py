@@ -0,0 +1,479 @@
+"""
+Pluggable, region-aware detection rules for AnalysisEngine.
+
+A rule declares the RegionConfig.thresholds keys it reads (with defaults
+for regions that don't set them) and returns a list of finding dicts.
+Register new typologies with @RuleRegistry.register; AnalysisEngine runs
+every registered rule and reports its findings under the rule's name.
+
+Windowed rules work on per-account event arrays sorted by (account, time)
+and find window boundaries with searchsorted, so each rule is O(n log n)
+in the number of transactions rather than a pairwise scan.
+"""
+from functools import cached_property
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.region_config import RegionConfig
+from app.services.transaction_frame import TransactionFrame, from_epoch_us, HOUR_US
+
+# Findings list at most this many transaction ids per window
+MAX_IDS_PER_FINDING = 20
+
+def _sorted_searchsorted(values: np.ndarray, queries: np.ndarray, side: str) -> np.ndarray:
+    # Searching in query order keeps memory access sequential on large inputs
+    order = np.argsort(queries, kind="stable")
+    result = np.empty(len(queries), dtype=np.int64)
+    result[order] = np.searchsorted(values, queries[order], side=side)
+    return result
+
+def group_searchsorted(group: np.ndarray, ts: np.ndarray, query_group: np.ndarray,
+                       query_ts: np.ndarray, side: str = "left") -> np.ndarray:
+    """
+    np.searchsorted over arrays sorted by (group, ts), with each query
+    confined to its own group: the result indexes the first element of
+    `query_group` whose ts is >= (side="left") or > (side="right") query_ts.
+    """
+    if len(ts) == 0:
+        return np.zeros(len(query_ts), dtype=np.int64)
+    # Dense time ranks keep the composite (group, rank) key within int64
+    times = np.unique(ts)
+    width = len(times) + 1
+    keys = group.astype(np.int64) * width + _sorted_searchsorted(times, ts, "left")
+    targets = query_group.astype(np.int64) * width + _sorted_searchsorted(times, query_ts, side)
+    return np.searchsorted(keys, targets, side="left")
+
+def best_per_group(group: np.ndarray, score: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """
+    Index of the highest-scoring candidate in each group (one per group).
+    """
+    idx = np.flatnonzero(candidates)
+    if len(idx) == 0:
+        return idx
+    idx = idx[np.lexsort((-score[idx], group[idx]))]
+    _, first = np.unique(group[idx], return_index=True)
+    return idx[first]
+
+class AccountEvents:
+    """
+    Each transaction seen from both ends: an "in" event for the receiver and
+    an "out" event for the sender, sorted by (account, direction, time).
+    `group` = account * 2 + direction identifies one account's inflows or
+    outflows; `tx` points back into the TransactionFrame.
+    """
+    IN, OUT = 0, 1
+
+    def __init__(self, frame: TransactionFrame, subject: Optional[int] = None):
+        n = len(frame)
+        account = np.concatenate([frame.receiver, frame.sender]).astype(np.int64)
+        counterparty = np.concatenate([frame.sender, frame.receiver]).astype(np.int64)
+        direction = np.repeat(np.array([self.IN, self.OUT], dtype=np.int64), n)
+        tx = np.concatenate([np.arange(n), np.arange(n)])
+
+        keep = np.ones(2 * n, dtype=bool) if subject is None else account == subject
+        ts = frame.ts_us[tx]
+        order = np.flatnonzero(keep)
+        order = order[np.lexsort((ts[order], direction[order], account[order]))]
+
+        self.account = account[order]
+        self.counterparty = counterparty[order]
+        self.direction = direction[order]
+        self.tx = tx[order]
+        self.ts = ts[order]
+        self.amount = frame.amount[self.tx]
+        self.group = self.account * 2 + self.direction
+        # Account codes are below this, so group * width + code is a unique key
+        self.width = len(frame.accounts) + 1
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def _take(self, index: np.ndarray) -> "AccountEvents":
+        subset = object.__new__(AccountEvents)
+        for name in ("account", "counterparty", "direction", "tx", "ts", "amount", "group"):
+            setattr(subset, name, getattr(self, name)[index])
+        subset.width = self.width
+        return subset
+
+    def select(self, mask: np.ndarray) -> "AccountEvents":
+        # Boolean selection keeps the (account, direction, time) order
+        return self._take(mask)
+
+    def by_counterparty(self) -> "AccountEvents":
+        """
+        Regrouped per (account, direction, counterparty), still time-ordered.
+        """
+        # A stable sort on (group, counterparty) keeps the existing time order
+        regrouped = self._take(np.argsort(self.group * self.width + self.counterparty, kind="stable"))
+        boundary = np.ones(len(regrouped), dtype=bool)
+        boundary[1:] = (regrouped.group[1:] != regrouped.group[:-1]) | (regrouped.counterparty[1:] != regrouped.counterparty[:-1])
+        regrouped.group = np.cumsum(boundary)
+        return regrouped
+
+    def trailing_windows(self, window_us: int):
+        """
+        For every event, the window (t - window, t] of its own group:
+        returns (start index, event count, amount total).
+        """
+        start = group_searchsorted(self.group, self.ts, self.group, self.ts - window_us, side="right")
+        position = np.arange(len(self.ts))
+        totals = np.concatenate([[0.0], np.cumsum(self.amount)])
+        return start, position - start + 1, totals[position + 1] - totals[start]
+
+class AnalysisContext:
+    """
+    Inputs shared by all rules in one analysis; derived arrays are built once.
+    `subject` limits account-level rules to one account when it is known.
+    """
+
+    def __init__(self, frame: TransactionFrame, region: RegionConfig, account_number: Optional[str] = None):
+        self.frame = frame
+        self.region = region
+        self.account_number = account_number
+        self.subject = None
+        if account_number is not None:
+            matches = np.flatnonzero(frame.accounts == account_number)
+            self.subject = int(matches[0]) if len(matches) else -1
+
+    @cached_property
+    def events(self) -> AccountEvents:
+        return AccountEvents(self.frame, self.subject)
+
+    def money(self, amount: float) -> str:
+        return f"{self.region.currency_symbol}{amount:,.2f}"
+
+    def account(self, code: int) -> str:
+        return self.frame.accounts[code]
+
+    def ids(self, tx_indices: np.ndarray) -> List[str]:
+        return self.frame.transaction_ids[tx_indices[:MAX_IDS_PER_FINDING]].tolist()
+
+class AnalysisRule:
+    """
+    Base class for detectors. `thresholds` maps RegionConfig.thresholds keys
+    to the value used when a region does not define them.
+    """
+    name: str = ""
+    thresholds: Dict[str, float] = {}
+
+    def params(self, region: RegionConfig) -> Dict[str, float]:
+        return {key: region.thresholds.get(key, default) for key, default in self.thresholds.items()}
+
+    def detect(self, ctx: AnalysisContext, params: Dict[str, float]) -> List[Dict]:
+        raise NotImplementedError
+
+class RuleRegistry:
+    _rules: Dict[str, AnalysisRule] = {}
+
+    @classmethod
+    def register(cls, rule_cls):
+        cls._rules[rule_cls.name] = rule_cls()
+        return rule_cls
+
+    @classmethod
+    def get(cls, name: str) -> AnalysisRule:
+        return cls._rules[name]
+
+    @classmethod
+    def all(cls) -> List[AnalysisRule]:
+        return list(cls._rules.values())
+
+@RuleRegistry.register
+class StructuringRule(AnalysisRule):
+    """
+    Single transactions just below the reporting threshold.
+    """
+    name = "structuring"
+    thresholds = {"structuring": 10000.0, "structuring_margin": 0.1}
+
+    def detect(self, ctx, params):
+        frame, limit = ctx.frame, params["structuring"]
+        hits = np.flatnonzero((frame.amount >= limit * (1 - params["structuring_margin"])) & (frame.amount < limit))
+        symbol = ctx.region.currency_symbol
+        return [
+            {
+                "type": "Structuring",
+                "transaction_id": txn_id,
+                "reason": f"Amount {symbol}{amount} is just below {symbol}{limit:,.0f} threshold."
+            }
+            for txn_id, amount in zip(frame.transaction_ids[hits].tolist(), frame.amount[hits].tolist())
+        ]
+
+@RuleRegistry.register
+class RapidMovementRule(AnalysisRule):
+    """
+    Consecutive large transactions (by time) less than a window apart.
+    """
+    name = "rapid_movement"
+    thresholds = {"rapid_movement": 5000.0, "rapid_movement_window_hours": 24.0}
+
+    def detect(self, ctx, params):
+        frame = ctx.frame
+        if len(frame) < 2:
+            return []
+
+        order = np.argsort(frame.ts_us, kind="stable")
+        large = frame.amount[order] > params["rapid_movement"]
+        close = np.diff(frame.ts_us[order]) < params["rapid_movement_window_hours"] * HOUR_US
+        hits = np.flatnonzero(close & large[:-1] & large[1:])
+
+        ids = frame.transaction_ids[order]
+        hours = params["rapid_movement_window_hours"]
+        return [
+            {
+                "type": "Rapid Movement",
+                "ids": [first, second],
+                "reason": f"Large transactions within {hours:g} hours."
+            }
+            for first, second in zip(ids[hits].tolist(), ids[hits + 1].tolist())
+        ]
+
+class _WindowTotalsRule(AnalysisRule):
+    """
+    Flags, per event group (account and direction, optionally counterparty),
+    the trailing window with the largest total among windows that pass
+    `flagged`; one finding per group.
+    """
+    finding_type = ""
+    per_counterparty = False
+
+    def events(self, ctx, params) -> AccountEvents:
+        return ctx.events
+
+    def flagged(self, counts, totals, params) -> np.ndarray:
+        raise NotImplementedError
+
+    def reason(self, ctx, params, count, total, direction) -> str:
+        raise NotImplementedError
+
+    def window_hours(self, params) -> float:
+        raise NotImplementedError
+
+    def detect(self, ctx, params):
+        events = self.events(ctx, params)
+        if len(events) == 0:
+            return []
+        hours = self.window_hours(params)
+        start, counts, totals = events.trailing_windows(int(hours * HOUR_US))
+        best = best_per_group(events.group, totals, self.flagged(counts, totals, params))
+
+        findings = []
+        for i in best.tolist():
+            direction = "in" if events.direction[i] == AccountEvents.IN else "out"
+            finding = {
+                "type": self.finding_type,
+                "account": ctx.account(events.account[i]),
+                "direction": direction,
+                "count": int(counts[i]),
+                "total": round(float(totals[i]), 2),
+                "window_start": from_epoch_us(events.ts[start[i]]).isoformat(),
+                "window_end": from_epoch_us(events.ts[i]).isoformat(),
+                "transaction_ids": ctx.ids(events.tx[start[i]:i + 1]),
+                "reason": self.reason(ctx, params, int(counts[i]), float(totals[i]), direction),
+            }
+            if self.per_counterparty:
+                finding["counterparty"] = ctx.account(events.counterparty[i])
+            findings.append(finding)
+        return findings
+
+@RuleRegistry.register
+class RollingStructuringRule(_WindowTotalsRule):
+    """
+    Several sub-threshold transactions with the same counterparty (e.g. CASH)
+    whose rolling total crosses the aggregate threshold within the window.
+    Many distinct counterparties are fan-in/fan-out's concern instead.
+    """
+    name = "rolling_structuring"
+    finding_type = "Rolling Structuring"
+    per_counterparty = True
+    thresholds = {"aggregate_structuring": 10000.0, "structuring_window_hours": 72.0, "structuring_min_count": 2}
+
+    def events(self, ctx, params):
+        return ctx.events.select(ctx.events.amount < params["aggregate_structuring"]).by_counterparty()
+
+    def window_hours(self, params):
+        return params["structuring_window_hours"]
+
+    def flagged(self, counts, totals, params):
+        return (counts >= params["structuring_min_count"]) & (totals >= params["aggregate_structuring"])
+
+    def reason(self, ctx, params, count, total, direction):
+        kind = "credits" if direction == "in" else "debits"
+        return (f"{count} {kind} each below {ctx.money(params['aggregate_structuring'])} "
+                f"totalling {ctx.money(total)} within {self.window_hours(params):g} hours.")
+
+@RuleRegistry.register
+class VelocityRule(_WindowTotalsRule):
+    """
+    Many transactions moving a large total through one account quickly.
+    """
+    name = "velocity"
+    finding_type = "High Velocity"
+    thresholds = {"velocity_amount": 50000.0, "velocity_count": 5, "velocity_window_hours": 1.0}
+
+    def window_hours(self, params):
+        return params["velocity_window_hours"]
+
+    def flagged(self, counts, totals, params):
+        return (counts >= params["velocity_count"]) & (totals >= params["velocity_amount"])
+
+    def reason(self, ctx, params, count, total, direction):
+        kind = "incoming" if direction == "in" else "outgoing"
+        return f"{count} {kind} transactions totalling {ctx.money(total)} within {self.window_hours(params):g} hours."
+
+class _FanRule(AnalysisRule):
+    """
+    Peak number of distinct counterparties within any window of the given
+    length, per account. Each (account, counterparty) pair is "active" for
+    one window after each transaction; overlapping activity is merged per
+    pair, then a sweep over start/end points counts active pairs.
+    """
+    direction = AccountEvents.IN
+    finding_type = ""
+    count_key = ""
+    label = ""
+    thresholds = {"fan_window_hours": 72.0}
+
+    def detect(self, ctx, params):
+        events = ctx.events.select(ctx.events.direction == self.direction)
+        if len(events) == 0:
+            return []
+        window = int(params["fan_window_hours"] * HOUR_US)
+
+        order = np.argsort(events.account * events.width + events.counterparty, kind="stable")
+        account, counterparty, ts = events.account[order], events.counterparty[order], events.ts[order]
+        new_pair = np.ones(len(ts), dtype=bool)
+        new_pair[1:] = (account[1:] != account[:-1]) | (counterparty[1:] != counterparty[:-1])
+        run_start = new_pair.copy()
+        run_start[1:] |= (ts[1:] - ts[:-1]) >= window
+        starts = np.flatnonzero(run_start)
+        ends = np.append(starts[1:], len(ts)) - 1
+
+        # Active intervals [first, last + window); ends sort before starts at equal times
+        point_account = np.concatenate([account[starts], account[starts]])
+        point_time = np.concatenate([ts[starts], ts[ends] + window])
+        delta = np.concatenate([np.ones(len(starts), dtype=np.int64), -np.ones(len(starts), dtype=np.int64)])
+        sweep = np.lexsort((delta, point_time, point_account))
+        active = np.cumsum(delta[sweep])
+        point_account, point_time = point_account[sweep], point_time[sweep]
+
+        best = best_per_group(point_account, active, active >= params[self.count_key])
+        hours = params["fan_window_hours"]
+        return [
+            {
+                "type": self.finding_type,
+                "account": ctx.account(point_account[i]),
+                "counterparties": int(active[i]),
+                "window_end": from_epoch_us(point_time[i]).isoformat(),
+                "reason": f"{int(active[i])} distinct {self.label} within {hours:g} hours.",
+            }
+            for i in best.tolist()
+        ]
+
+@RuleRegistry.register
+class FanInRule(_FanRule):
+    """
+    Many distinct senders into one account (mule / collection accounts).
+    """
+    name = "fan_in"
+    direction = AccountEvents.IN
+    finding_type = "Fan-In"
+    count_key = "fan_in_count"
+    label = "senders"
+    thresholds = {"fan_in_count": 10, "fan_window_hours": 72.0}
+
+@RuleRegistry.register
+class FanOutRule(_FanRule):
+    """
+    One account paying many distinct receivers (dispersal / layering).
+    """
+    name = "fan_out"
+    direction = AccountEvents.OUT
+    finding_type = "Fan-Out"
+    count_key = "fan_out_count"
+    label = "receivers"
+    thresholds = {"fan_out_count": 10, "fan_window_hours": 72.0}
+
+@RuleRegistry.register
+class RoundTripRule(AnalysisRule):
+    """
+    A large outflow that comes back: within the window, the account receives
+    most of it from the outflow's counterparty or from an account the
+    counterparty paid on, along a time-ordered path of at most
+    `round_trip_max_length` transfers including the outflow itself.
+    Unrelated inflows (salary alongside rent) never count.
+    """
+    name = "round_tripping"
+    thresholds = {"rapid_movement": 5000.0, "round_trip_ratio": 0.9, "round_trip_window_hours": 720.0,
+                  "round_trip_max_length": 4}
+
+    @staticmethod
+    def _returns(sender, receiver, ts, account: int, counterparty: int, start: int, hops: int) -> np.ndarray:
+        """
+        Mask of the transfers into `account` paid by an account the funds can
+        have reached: `counterparty` from `start`, then onward transfers
+        (never through `account`) each no earlier than the funds arrived.
+        """
+        nodes, codes = np.unique(np.concatenate([sender, receiver]), return_inverse=True)
+        src, dst = codes[:len(sender)], codes[len(sender):]
+        never = np.iinfo(np.int64).max
+        arrival = np.full(len(nodes), never, dtype=np.int64)
+        home = np.searchsorted(nodes, account)
+        home = home if home < len(nodes) and nodes[home] == account else -1
+        arrival[np.searchsorted(nodes, counterparty)] = start
+        for _ in range(hops - 1):
+            onward = (arrival[src] <= ts) & (dst != home)
+            reached = arrival.copy()
+            np.minimum.at(reached, dst[onward], ts[onward])
+            if np.array_equal(reached, arrival):
+                break
+            arrival = reached
+        return (dst == home) & (src != home) & (arrival[src] <= ts)
+
+    def detect(self, ctx, params):
+        events = ctx.events
+        inflow = events.select(events.direction == AccountEvents.IN)
+        # A self-transfer moves nothing out of the account
+        outflow = events.select((events.direction == AccountEvents.OUT) & (events.amount >= params["rapid_movement"])
+                                & (events.counterparty != events.account))
+        if len(inflow) == 0 or len(outflow) == 0:
+            return []
+
+        window = int(params["round_trip_window_hours"] * HOUR_US)
+        lo = group_searchsorted(inflow.account, inflow.ts, outflow.account, outflow.ts, side="left")
+        hi = group_searchsorted(inflow.account, inflow.ts, outflow.account, outflow.ts + window, side="right")
+        totals = np.concatenate([[0.0], np.cumsum(inflow.amount)])
+        # All inflows in the window bound what can have come back; only those
+        # outflows are traced through the transfers
+        candidates = np.flatnonzero(totals[hi] - totals[lo] >= params["round_trip_ratio"] * outflow.amount)
+        if len(candidates) == 0:
+            return []
+
+        frame = ctx.frame
+        order = np.argsort(frame.ts_us, kind="stable")
+        ts, sender, receiver = frame.ts_us[order], frame.sender[order], frame.receiver[order]
+        hops = int(params["round_trip_max_length"]) - 1
+        hours = params["round_trip_window_hours"]
+        findings = []
+        for i in candidates.tolist():
+            start = outflow.ts[i]
+            first, last = np.searchsorted(ts, start, side="left"), np.searchsorted(ts, start + window, side="right")
+            returns = self._returns(sender[first:last], receiver[first:last], ts[first:last],
+                                    outflow.account[i], outflow.counterparty[i], start, hops)
+            tx = order[first:last][returns]
+            returned = float(frame.amount[tx].sum())
+            if returned < params["round_trip_ratio"] * outflow.amount[i]:
+                continue
+            findings.append({
+                "type": "Round Tripping",
+                "account": ctx.account(outflow.account[i]),
+                "counterparty": ctx.account(outflow.counterparty[i]),
+                "transaction_id": frame.transaction_ids[outflow.tx[i]],
+                "amount_out": round(float(outflow.amount[i]), 2),
+                "amount_returned": round(returned, 2),
+                "returned_via": ctx.ids(tx),
+                "reason": (f"{ctx.money(outflow.amount[i])} sent out and {ctx.money(returned)} returned "
+                           f"by the recipient or accounts it paid within {hours:g} hours."),
+            })
+        return findings
@@ -0,0 +1,117 @@
+import json
+from typing import List, Optional, Tuple
+
+import redis
+
+from app.core.redis_client import redis_client, async_redis
+
+# Batch metadata lives as long as the old batch:* keys did
+BATCH_TTL_SECONDS = 86400
+
+COUNTER_FIELDS = ("total", "completed", "failed", "progress_sum")
+
+# Both scripts refuse to touch expired/unknown batches (no TTL-less keys) and
+# keep progress_sum equal to the sum of per-job progress, finished jobs at 100.
+_REPORT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return -1 end
+if redis.call('HEXISTS', KEYS[1], 'done:' .. ARGV[1]) == 1 then return 0 end
+local field = 'job:' .. ARGV[1]
+local old = tonumber(redis.call('HGET', KEYS[1], field) or '0')
+local new = tonumber(ARGV[2])
+if new <= old then return 0 end
+redis.call('HSET', KEYS[1], field, new)
+redis.call('HINCRBY', KEYS[1], 'progress_sum', new - old)
+return 1
+"""
+
+# HSETNX on done:<job> makes a redelivered (acks_late) task count only once
+_FINISH_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return -1 end
+if redis.call('HSETNX', KEYS[1], 'done:' .. ARGV[1], ARGV[2]) == 0 then return 0 end
+local field = 'job:' .. ARGV[1]
+local old = tonumber(redis.call('HGET', KEYS[1], field) or '0')
+redis.call('HDEL', KEYS[1], field)
+redis.call('HINCRBY', KEYS[1], 'progress_sum', 100 - old)
+redis.call('HINCRBY', KEYS[1], ARGV[2], 1)
+return 1
+"""
+
+def batch_key(batch_id: str) -> str:
+    return f"batch:{batch_id}"
+
+def batch_jobs_key(batch_id: str) -> str:
+    return f"batch:{batch_id}:jobs"
+
+def batch_requests_key(batch_id: str) -> str:
+    return f"batch:{batch_id}:requests"
+
+class BatchProgress:
+    """
+    Batch progress as counters in one Redis hash per batch.
+
+    Workers update the counters atomically (Lua) as jobs report progress and
+    finish, so reading a batch's status is a single HMGET regardless of its
+    size instead of one result-backend lookup per job.
+    """
+
+    def __init__(self, client=redis_client, ttl_seconds: int = BATCH_TTL_SECONDS):
+        # Workers use the sync client; create/get run on the API loop via async_redis
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self._report = client.register_script(_REPORT_SCRIPT)
+        self._finish = client.register_script(_FINISH_SCRIPT)
+
+    async def create(self, batch_id: str, job_ids: List[str], requests_json: str = None):
+        """
+        Called before the jobs are dispatched, so no worker update is lost.
+        `requests_json` (the serialized request list) is parked next to the
+        counters for the dispatcher, keeping it out of the broker message.
+        """
+        key, jobs_key = batch_key(batch_id), batch_jobs_key(batch_id)
+        pipe = async_redis.client.pipeline(transaction=True)
+        pipe.hset(key, mapping={"total": len(job_ids), "completed": 0, "failed": 0, "progress_sum": 0})
+        pipe.expire(key, self.ttl_seconds)
+        if job_ids:
+            pipe.rpush(jobs_key, *job_ids)
+            pipe.expire(jobs_key, self.ttl_seconds)
+        if requests_json is not None:
+            pipe.set(batch_requests_key(batch_id), requests_json, ex=self.ttl_seconds)
+        await pipe.execute()
+
+    def get_requests(self, batch_id: str) -> Tuple[List[str], Optional[list]]:
+        """
+        Dispatcher side: job ids and the parked request list. The list stays
+        parked until discard_requests, so a dispatcher that dies before its
+        jobs are published leaves it for the redelivered dispatch.
+        """
+        pipe = self.client.pipeline(transaction=True)
+        pipe.lrange(batch_jobs_key(batch_id), 0, -1)
+        pipe.get(batch_requests_key(batch_id))
+        job_ids, requests_json = pipe.execute()
+        return job_ids, json.loads(requests_json) if requests_json else None
+
+    def discard_requests(self, batch_id: str):
+        """Dispatcher side: drop the parked request list once its jobs are published."""
+        self.client.delete(batch_requests_key(batch_id))
+
+    def report(self, batch_id: str, job_id: str, progress: int):
+        try:
+            self._report(keys=[batch_key(batch_id)], args=[job_id, int(progress)])
+        except redis.RedisError as e:
+            # Progress is advisory; never fail the job over it
+            print(f"Batch progress update failed for {batch_id}: {e}", flush=True)
+
+    def finish(self, batch_id: str, job_id: str, succeeded: bool):
+        outcome = "completed" if succeeded else "failed"
+        try:
+            self._finish(keys=[batch_key(batch_id)], args=[job_id, outcome])
+        except redis.RedisError as e:
+            print(f"Batch counter update failed for {batch_id}: {e}", flush=True)
+
+    async def get(self, batch_id: str) -> Optional[dict]:
+        values = await async_redis.client.hmget(batch_key(batch_id), COUNTER_FIELDS)
+        if values[0] is None:
+            return None
+        return {field: int(value or 0) for field, value in zip(COUNTER_FIELDS, values)}
+
+batch_progress = BatchProgress()
@@ -0,0 +1,137 @@
+"""
+Case profiling rules, shared by case_summary (and through it the case list),
+the case-detail endpoint, the transaction store and the generation service.
+
+Transactions are folded one at a time into counters: volume, high-value
+count, first transaction, salary/payroll activity. Salary keywords are
+matched with one precompiled case-insensitive pattern per description. The
+ratings (risk, occupation class, expected turnover) and the anomaly flags
+are derived from the counters afterwards, so a profile takes a single pass.
+"""
+import re
+from datetime import datetime
+from typing import Optional
+
+HIGH_VALUE_THRESHOLD = 100000
+# A transaction above this multiple of the account's average is a spike
+SPIKE_MULTIPLIER = 2
+RISK_RATINGS = {1: "LOW", 2: "MEDIUM", 3: "HIGH"}
+
+SALARY_KEYWORD = "SALARY"
+PAYROLL_KEYWORD = "PAYROLL"
+# description_flags bits; a salary payment is also payroll
+SALARY, PAYROLL = 1, 2
+_KEYWORDS = re.compile(f"{SALARY_KEYWORD}|{PAYROLL_KEYWORD}", re.IGNORECASE)
+
+def description_flags(description) -> int:
+    flags = 0
+    if not description:
+        return flags
+    for match in _KEYWORDS.finditer(str(description)):
+        if len(match.group()) == len(SALARY_KEYWORD):
+            return SALARY | PAYROLL
+        flags = PAYROLL
+    return flags
+
+def is_anomaly(amount, avg_amount):
+    """High value, or a spike over the average. Works on scalars and numpy arrays."""
+    return (amount > HIGH_VALUE_THRESHOLD) | ((avg_amount > 0) & (amount > avg_amount * SPIKE_MULTIPLIER))
+
+def empty_counters() -> dict:
+    return {
+        "tx_count": 0, "total_amount": 0.0, "high_value_count": 0,
+        "first_tx_at": None, "first_tx_id": None, "first_description": None,
+        "receives_salary": False, "sends_salary": False,
+        "salary_in_max": 0.0, "payroll_out_total": 0.0,
+        "alert_count": 0, "typology": None,
+    }
+
+def _first_key(at, tx_id):
+    # Undated transactions sort after dated ones (NULLS LAST), like the
+    # case_summary upsert and its recomputation from scratch
+    return (at is None, at or datetime.min, tx_id or "")
+
+def fold_transaction(c: dict, amount: Optional[float], description: Optional[str], incoming: bool, outgoing: bool,
+                     timestamp: Optional[datetime] = None, transaction_id: Optional[str] = None):
+    amount = amount or 0.0
+    flags = description_flags(description)
+
+    c["tx_count"] += 1
+    c["total_amount"] += amount
+    if amount > HIGH_VALUE_THRESHOLD:
+        c["high_value_count"] += 1
+    if c["first_tx_id"] is None or _first_key(timestamp, transaction_id) < _first_key(c["first_tx_at"], c["first_tx_id"]):
+        c["first_tx_at"] = timestamp
+        c["first_tx_id"] = transaction_id
+        c["first_description"] = description
+    if incoming and flags & PAYROLL:
+        c["receives_salary"] = True
+    if incoming and flags & SALARY:
+        c["salary_in_max"] = max(c["salary_in_max"], amount)
+    if outgoing and flags & PAYROLL:
+        c["sends_salary"] = True
+    if outgoing and flags & SALARY:
+        c["payroll_out_total"] += amount
+
+def fold_alert(c: dict, rule_name: Optional[str]):
+    c["alert_count"] += 1
+    if rule_name is not None and (c["typology"] is None or rule_name < c["typology"]):
+        c["typology"] = rule_name
+
+def derive(counters: dict) -> dict:
+    """
+    Case-level ratings from the counters.
+    Risk: no alerts -> LOW (MEDIUM with a txn > 100k); 1-2 alerts -> MEDIUM
+    (HIGH with a txn > 100k); more than 2 alerts -> HIGH.
+    """
+    alerts = counters["alert_count"]
+    has_hv = counters["high_value_count"] > 0
+    if alerts > 2 or (alerts > 0 and has_hv):
+        risk_rank = 3
+    elif alerts > 0 or has_hv:
+        risk_rank = 2
+    else:
+        risk_rank = 1
+
+    occupation = "Self-Employed / Retail"
+    expected_turnover = 0.0
+    if counters["receives_salary"]:
+        occupation = "Salaried Employee (Retail)"
+        expected_turnover = counters["salary_in_max"]
+    elif counters["sends_salary"]:
+        occupation = "Corporate / Payroll Entity"
+        expected_turnover = counters["payroll_out_total"]
+    # If turnover still 0, estimate from activity
+    if expected_turnover == 0 and counters["tx_count"]:
+        expected_turnover = counters["total_amount"] / counters["tx_count"] * 2
+
+    return {
+        "risk_rank": risk_rank,
+        "risk_rating": RISK_RATINGS[risk_rank],
+        "occupation": occupation,
+        "expected_turnover": expected_turnover,
+    }
+
+class CaseProfile:
+    """Counters of one account, folded in a single pass over its activity."""
+
+    def __init__(self, account: Optional[str] = None):
+        self.account = account
+        self.counters = empty_counters()
+
+    def add_transaction(self, amount: float, description: Optional[str], sender: Optional[str],
+                        receiver: Optional[str], timestamp: Optional[datetime] = None,
+                        transaction_id: Optional[str] = None):
+        # A self-transfer is both incoming and outgoing
+        fold_transaction(self.counters, amount, description, incoming=receiver == self.account,
+                         outgoing=sender == self.account, timestamp=timestamp, transaction_id=transaction_id)
+
+    def add_alert(self, rule_name: Optional[str]):
+        fold_alert(self.counters, rule_name)
+
+    @property
+    def avg_amount(self) -> float:
+        return self.counters["total_amount"] / self.counters["tx_count"] if self.counters["tx_count"] else 0.0
+
+    def ratings(self) -> dict:
+        return derive(self.counters)
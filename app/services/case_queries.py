@@ -0,0 +1,102 @@
+"""
+Index-friendly queries behind the case endpoints.
+
+Each query is shaped to hit one of the composite indexes declared in
+app/models/sql.py; tests/test_query_plans.py EXPLAINs them to keep it so.
+"""
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+from sqlalchemy import Select, and_, func, or_, select, union_all
+from sqlalchemy.orm import aliased
+
+from app.models.sql import SAR, Alert, CaseSummary, Transaction
+
+# Risk ranks used for sorting/filtering (see CaseSummary.risk_rank)
+RISK_RANKS = {"LOW": 1, "MEDIUM": 2, "HIGH": 3}
+CASE_SORT_FIELDS = ("account_number", "risk", "alert_count")
+SUBMITTED_STATUSES = ("VERIFIED", "FINALIZED")
+
+def case_listing_query(
+    risk_ratings: Optional[List[str]] = None,
+    typology: Optional[str] = None,
+    sort_by: str = "account_number",
+    descending: bool = False,
+    after: Optional[Sequence] = None,
+    limit: int = 100,
+) -> Select:
+    """
+    One page of 'IN-' cases from case_summary. `after` is the keyset
+    (sort value, account_number) of the last row of the previous page.
+    """
+    cs = CaseSummary.__table__.c
+    typology_col = func.coalesce(cs.typology, "General Banking")
+    sort_col = {"account_number": cs.account_number, "risk": cs.risk_rank, "alert_count": cs.alert_count}[sort_by]
+
+    query = select(
+        cs.account_number, cs.first_description, cs.alert_count,
+        typology_col.label("typology"), cs.risk_rank, cs.risk_rating,
+    ).where(
+        # Range form of LIKE 'IN-%' so the primary key index can be used
+        cs.account_number >= "IN-", cs.account_number < "IN.", cs.tx_count > 0
+    )
+    if risk_ratings:
+        query = query.where(cs.risk_rating.in_(risk_ratings))
+    if typology:
+        query = query.where(typology_col == typology)
+
+    # Keyset: (sort value, account_number) strictly after the cursor row
+    if after:
+        last_value, last_account = after
+        later = (lambda col, v: col < v) if descending else (lambda col, v: col > v)
+        if sort_col is cs.account_number:
+            query = query.where(later(cs.account_number, last_account))
+        else:
+            query = query.where(or_(
+                later(sort_col, last_value),
+                and_(sort_col == last_value, later(cs.account_number, last_account)),
+            ))
+
+    if descending:
+        query = query.order_by(sort_col.desc(), cs.account_number.desc())
+    else:
+        query = query.order_by(sort_col.asc(), cs.account_number.asc())
+    return query.limit(limit)
+
+def _account_history(account_number: str, start: Optional[datetime], end: Optional[datetime]):
+    window = []
+    if start is not None:
+        window.append(Transaction.timestamp >= start)
+    if end is not None:
+        window.append(Transaction.timestamp < end)
+    sent = select(Transaction).where(Transaction.sender_account == account_number, *window)
+    received = select(Transaction).where(
+        Transaction.receiver_account == account_number,
+        or_(Transaction.sender_account.is_(None), Transaction.sender_account != account_number),
+        *window,
+    )
+    return aliased(Transaction, union_all(sent, received).subquery("account_history"))
+
+def account_transactions_query(account_number: str, start: Optional[datetime] = None,
+                               end: Optional[datetime] = None) -> Select:
+    """
+    All transactions touching an account, oldest first, optionally limited
+    to start <= timestamp < end.
+    `sender = x OR receiver = x` defeats per-column indexes, so this is a
+    UNION ALL of two index range scans (self-transfers only in the first).
+    """
+    history = _account_history(account_number, start, end)
+    return select(history).order_by(history.timestamp, history.transaction_id)
+
+def account_transaction_rows_query(account_number: str, start: Optional[datetime] = None,
+                                   end: Optional[datetime] = None) -> Select:
+    """account_transactions_query as plain column rows, for streaming without ORM objects."""
+    history = _account_history(account_number, start, end)
+    columns = [getattr(history, c.key) for c in Transaction.__table__.columns]
+    return select(*columns).order_by(history.timestamp, history.transaction_id)
+
+def account_alerts_query(account_number: str) -> Select:
+    return select(Alert).where(Alert.account_number == account_number)
+
+def submitted_sars_query() -> Select:
+    return select(SAR).where(SAR.status.in_(SUBMITTED_STATUSES)).order_by(SAR.generated_at.desc())
@@ -0,0 +1,344 @@
+"""
+Incremental maintenance of the `case_summary` table.
+
+Every ORM flush that inserts Transaction or Alert rows folds them into
+per-account counters with one atomic upsert, then refreshes the derived
+columns (risk, occupation, expected turnover) for the touched accounts.
+Bulk loaders that bypass the ORM call `apply_transactions`/`apply_alerts`.
+
+Usage:
+    python -m app.services.case_summary rebuild   # full backfill
+    python -m app.services.case_summary check     # compare with a recomputation
+"""
+import asyncio
+import math
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, bindparam, case, delete, event, func, insert, literal, or_, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.sql import Alert, CaseSummary, Transaction
+from app.services.case_profile import (
+    HIGH_VALUE_THRESHOLD, PAYROLL_KEYWORD, SALARY_KEYWORD, derive, empty_counters, fold_alert, fold_transaction,
+)
+
+CHUNK_SIZE = 500
+
+COUNTER_FIELDS = (
+    "tx_count", "total_amount", "high_value_count", "first_tx_at", "first_tx_id",
+    "first_description", "receives_salary", "sends_salary", "salary_in_max",
+    "payroll_out_total", "alert_count", "typology",
+)
+DERIVED_FIELDS = ("risk_rank", "risk_rating", "occupation", "expected_turnover")
+
+summary = CaseSummary.__table__.c
+
+# --- Deltas -----------------------------------------------------------------
+
+def transaction_deltas(rows: Iterable[dict], deltas: Dict[str, dict] = None) -> Dict[str, dict]:
+    """
+    Per-account counter deltas for new transactions (dicts with the
+    Transaction column names). A self-transfer counts once for its account.
+    """
+    deltas = {} if deltas is None else deltas
+    for tx in rows:
+        sender, receiver = tx.get("sender_account"), tx.get("receiver_account")
+        args = (tx["amount"], tx.get("description"))
+        kwargs = {"timestamp": tx["timestamp"], "transaction_id": tx["transaction_id"]}
+        if sender:
+            fold_transaction(deltas.setdefault(sender, empty_counters()), *args,
+                             incoming=(receiver == sender), outgoing=True, **kwargs)
+        if receiver and receiver != sender:
+            fold_transaction(deltas.setdefault(receiver, empty_counters()), *args,
+                             incoming=True, outgoing=False, **kwargs)
+    return deltas
+
+def alert_deltas(rows: Iterable[dict], deltas: Dict[str, dict] = None) -> Dict[str, dict]:
+    deltas = {} if deltas is None else deltas
+    for alert in rows:
+        account = alert.get("account_number")
+        if not account:
+            continue
+        fold_alert(deltas.setdefault(account, empty_counters()), alert.get("rule_name"))
+    return deltas
+
+# --- Applying deltas ----------------------------------------------------------
+
+def _upsert_statement(dialect: str):
+    ins = (pg_insert if dialect == "postgresql" else sqlite_insert)(CaseSummary)
+    ex = ins.excluded
+    # Same order as case_profile._first_key: timestamp with NULLs last, then id
+    takes_first = and_(
+        ex.first_tx_id.isnot(None),
+        or_(
+            summary.first_tx_id.is_(None),
+            and_(ex.first_tx_at.isnot(None), summary.first_tx_at.is_(None)),
+            ex.first_tx_at < summary.first_tx_at,
+            and_(ex.first_tx_at.is_not_distinct_from(summary.first_tx_at), ex.first_tx_id < summary.first_tx_id),
+        ),
+    )
+    takes_typology = and_(
+        ex.typology.isnot(None),
+        or_(summary.typology.is_(None), ex.typology < summary.typology),
+    )
+    return ins.on_conflict_do_update(
+        index_elements=[summary.account_number],
+        set_={
+            "tx_count": summary.tx_count + ex.tx_count,
+            "total_amount": summary.total_amount + ex.total_amount,
+            "high_value_count": summary.high_value_count + ex.high_value_count,
+            "first_tx_at": case((takes_first, ex.first_tx_at), else_=summary.first_tx_at),
+            "first_tx_id": case((takes_first, ex.first_tx_id), else_=summary.first_tx_id),
+            "first_description": case((takes_first, ex.first_description), else_=summary.first_description),
+            "receives_salary": or_(summary.receives_salary, ex.receives_salary),
+            "sends_salary": or_(summary.sends_salary, ex.sends_salary),
+            "salary_in_max": case((ex.salary_in_max > summary.salary_in_max, ex.salary_in_max), else_=summary.salary_in_max),
+            "payroll_out_total": summary.payroll_out_total + ex.payroll_out_total,
+            "alert_count": summary.alert_count + ex.alert_count,
+            "typology": case((takes_typology, ex.typology), else_=summary.typology),
+            "updated_at": ex.updated_at,
+        },
+    )
+
+def _chunks(items: List, size: int = CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def refresh_derived(conn: Connection, accounts: List[str]):
+    """
+    Recompute the derived columns of the given accounts from their counters.
+    """
+    stmt = update(CaseSummary).where(summary.account_number == bindparam("b_account")).values(
+        **{field: bindparam(f"b_{field}") for field in DERIVED_FIELDS}
+    )
+    for chunk in _chunks(accounts):
+        rows = conn.execute(select(CaseSummary.__table__).where(summary.account_number.in_(chunk))).mappings()
+        params = [
+            {"b_account": row["account_number"], **{f"b_{k}": v for k, v in derive(row).items()}}
+            for row in rows
+        ]
+        if params:
+            conn.execute(stmt, params)
+
+def apply_deltas(conn: Connection, deltas: Dict[str, dict]):
+    """
+    Fold counter deltas into case_summary atomically and refresh derived columns.
+    """
+    if not deltas:
+        return
+    accounts = list(deltas)
+    dialect = conn.dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        # No portable upsert: recompute the touched accounts instead
+        recompute_accounts(conn, accounts)
+        return
+
+    now = datetime.utcnow()
+    stmt = _upsert_statement(dialect)
+    for chunk in _chunks(accounts):
+        params = []
+        for account in chunk:
+            row = {"account_number": account, "updated_at": now, **deltas[account]}
+            # Defaults for a first insert; refresh_derived sets the real values
+            row.update(risk_rank=1, risk_rating="LOW", occupation=None, expected_turnover=0.0)
+            params.append(row)
+        conn.execute(stmt, params)
+    refresh_derived(conn, accounts)
+
+def apply_transactions(conn: Connection, rows: Iterable[dict]):
+    apply_deltas(conn, transaction_deltas(rows))
+
+def apply_alerts(conn: Connection, rows: Iterable[dict]):
+    apply_deltas(conn, alert_deltas(rows))
+
+@event.listens_for(Session, "after_flush")
+def _maintain_case_summary(session: Session, flush_context):
+    new_txs = [o for o in session.new if isinstance(o, Transaction)]
+    new_alerts = [o for o in session.new if isinstance(o, Alert)]
+    if not new_txs and not new_alerts:
+        return
+
+    deltas = transaction_deltas({
+        "transaction_id": t.transaction_id, "amount": t.amount, "timestamp": t.timestamp,
+        "sender_account": t.sender_account, "receiver_account": t.receiver_account,
+        "description": t.description,
+    } for t in new_txs)
+    alert_deltas(({"account_number": a.account_number, "rule_name": a.rule_name} for a in new_alerts), deltas)
+    apply_deltas(session.connection(), deltas)
+
+# --- Recomputation from scratch ---------------------------------------------
+
+def aggregate_from_scratch(conn: Connection, accounts: Optional[List[str]] = None) -> Dict[str, dict]:
+    """
+    Counters computed directly from transactions/alerts with set-based SQL.
+    """
+    t = Transaction.__table__.c
+    out_side = select(
+        t.sender_account.label("account_number"), t.amount, t.description, t.timestamp,
+        t.transaction_id, literal(1).label("is_out"),
+        case((t.receiver_account == t.sender_account, 1), else_=0).label("is_in"),
+    ).where(t.sender_account.isnot(None))
+    in_side = select(
+        t.receiver_account.label("account_number"), t.amount, t.description, t.timestamp,
+        t.transaction_id, literal(0).label("is_out"), literal(1).label("is_in"),
+    ).where(t.receiver_account.isnot(None), or_(t.sender_account.is_(None), t.receiver_account != t.sender_account))
+    if accounts is not None:
+        out_side = out_side.where(t.sender_account.in_(accounts))
+        in_side = in_side.where(t.receiver_account.in_(accounts))
+    edges = union_all(out_side, in_side).subquery("edges")
+
+    desc = func.upper(func.coalesce(edges.c.description, ""))
+    is_salary = desc.like(f"%{SALARY_KEYWORD}%")
+    is_payroll = or_(is_salary, desc.like(f"%{PAYROLL_KEYWORD}%"))
+    totals = select(
+        edges.c.account_number,
+        func.count().label("tx_count"),
+        func.coalesce(func.sum(edges.c.amount), 0.0).label("total_amount"),
+        func.sum(case((edges.c.amount > HIGH_VALUE_THRESHOLD, 1), else_=0)).label("high_value_count"),
+        func.max(case((and_(edges.c.is_in == 1, is_payroll), 1), else_=0)).label("receives_salary"),
+        func.max(case((and_(edges.c.is_out == 1, is_payroll), 1), else_=0)).label("sends_salary"),
+        func.max(case((and_(edges.c.is_in == 1, is_salary), edges.c.amount), else_=0.0)).label("salary_in_max"),
+        func.sum(case((and_(edges.c.is_out == 1, is_salary), edges.c.amount), else_=0.0)).label("payroll_out_total"),
+    ).group_by(edges.c.account_number)
+
+    ranked = select(
+        edges.c.account_number, edges.c.timestamp, edges.c.transaction_id, edges.c.description,
+        func.row_number().over(
+            partition_by=edges.c.account_number,
+            # NULLs last on every backend (SQLite sorts them first)
+            order_by=(edges.c.timestamp.is_(None), edges.c.timestamp, edges.c.transaction_id),
+        ).label("rn"),
+    ).subquery("ranked")
+    firsts = select(ranked).where(ranked.c.rn == 1)
+
+    a = Alert.__table__.c
+    alerts = select(
+        a.account_number, func.count().label("alert_count"), func.min(a.rule_name).label("typology"),
+    ).where(a.account_number.isnot(None)).group_by(a.account_number)
+    if accounts is not None:
+        alerts = alerts.where(a.account_number.in_(accounts))
+
+    result: Dict[str, dict] = {}
+    for row in conn.execute(totals).mappings():
+        c = result.setdefault(row["account_number"], empty_counters())
+        c.update(
+            tx_count=row["tx_count"], total_amount=float(row["total_amount"]),
+            high_value_count=row["high_value_count"] or 0,
+            receives_salary=bool(row["receives_salary"]), sends_salary=bool(row["sends_salary"]),
+            salary_in_max=float(row["salary_in_max"] or 0.0),
+            payroll_out_total=float(row["payroll_out_total"] or 0.0),
+        )
+    for row in conn.execute(firsts).mappings():
+        result[row["account_number"]].update(
+            first_tx_at=row["timestamp"], first_tx_id=row["transaction_id"], first_description=row["description"],
+        )
+    for row in conn.execute(alerts).mappings():
+        c = result.setdefault(row["account_number"], empty_counters())
+        c.update(alert_count=row["alert_count"], typology=row["typology"])
+    return result
+
+def _insert_rows(conn: Connection, counters: Dict[str, dict]):
+    now = datetime.utcnow()
+    rows = [
+        {"account_number": account, "updated_at": now, **c, **derive(c)}
+        for account, c in counters.items()
+    ]
+    for chunk in _chunks(rows):
+        conn.execute(insert(CaseSummary), chunk)
+
+def recompute_accounts(conn: Connection, accounts: List[str]):
+    for chunk in _chunks(accounts):
+        counters = aggregate_from_scratch(conn, chunk)
+        conn.execute(delete(CaseSummary).where(summary.account_number.in_(chunk)))
+        _insert_rows(conn, counters)
+
+def rebuild(conn: Connection) -> int:
+    """
+    Full backfill: replace case_summary with a recomputation.
+    """
+    counters = aggregate_from_scratch(conn)
+    conn.execute(delete(CaseSummary))
+    _insert_rows(conn, counters)
+    return len(counters)
+
+def drifted_accounts(conn: Connection, counts: Dict[str, int]) -> List[str]:
+    """
+    Accounts whose transaction count in case_summary differs from `counts`,
+    the per-account row counts of a derived copy (transaction store, account
+    graph). case_summary is updated in the same database transaction as every
+    insert, so this catches every committed row, including back-dated ones,
+    rows sharing a timestamp and rows without one.
+    """
+    drifted, seen = [], set()
+    result = conn.execution_options(yield_per=CHUNK_SIZE * 20).execute(
+        select(summary.account_number, summary.tx_count).where(summary.tx_count > 0)
+    )
+    for account, tx_count in result:
+        seen.add(account)
+        if counts.get(account, 0) != tx_count:
+            drifted.append(account)
+    drifted.extend(account for account, count in counts.items() if count and account not in seen)
+    return drifted
+
+def _same(expected, actual) -> bool:
+    if isinstance(expected, float) or isinstance(actual, float):
+        return math.isclose(expected or 0.0, actual or 0.0, rel_tol=1e-9, abs_tol=1e-6)
+    if isinstance(expected, bool) or isinstance(actual, bool):
+        return bool(expected) == bool(actual)
+    return expected == actual
+
+def check_consistency(conn: Connection) -> dict:
+    """
+    Compare case_summary with a from-scratch recomputation.
+    """
+    expected = aggregate_from_scratch(conn)
+    actual = {row["account_number"]: row for row in conn.execute(select(CaseSummary.__table__)).mappings()}
+
+    mismatches = []
+    for account in sorted(set(expected) | set(actual)):
+        if account not in actual:
+            mismatches.append({"account_number": account, "problem": "missing"})
+            continue
+        if account not in expected:
+            mismatches.append({"account_number": account, "problem": "unexpected"})
+            continue
+        want = {**expected[account], **derive(expected[account])}
+        fields = {
+            field: {"expected": want[field], "actual": actual[account][field]}
+            for field in COUNTER_FIELDS + DERIVED_FIELDS
+            if not _same(want[field], actual[account][field])
+        }
+        if fields:
+            mismatches.append({"account_number": account, "problem": "drift", "fields": fields})
+
+    return {"checked": len(expected), "consistent": not mismatches, "mismatches": mismatches}
+
+async def _main(command: str):
+    from app.db.base import engine
+
+    async with engine.begin() as conn:
+        if command == "rebuild":
+            count = await conn.run_sync(rebuild)
+            print(f"case_summary rebuilt: {count} accounts")
+            report = None
+        else:
+            report = await conn.run_sync(check_consistency)
+            print(f"Checked {report['checked']} accounts: {'consistent' if report['consistent'] else 'DRIFT DETECTED'}")
+            for mismatch in report["mismatches"]:
+                print(f"  {mismatch}")
+    await engine.dispose()
+    return report
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    if command not in ("rebuild", "check"):
+        print("Usage: python -m app.services.case_summary [rebuild|check]")
+        sys.exit(1)
+    report = asyncio.run(_main(command))
+    if report is not None and not report["consistent"]:
+        sys.exit(2)
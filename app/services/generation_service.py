@@ -1,31 +1,49 @@
 import asyncio
 import random
+from collections import Counter
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
 from app.schemas.requests import GenerateRequest
 from app.schemas.responses import SARResponse
 from datetime import datetime
 import uuid
 
+from app.core.config import settings
 from app.core.llm import llm_engine
 from app.services.analysis_engine import analysis_engine
-from app.core.region_config import RegionFactory
+from app.services.case_profile import HIGH_VALUE_THRESHOLD, CaseProfile
+from app.services.narrative_cache import narrative_cache
+from app.core.region_config import RegionConfig, RegionFactory
 from app.services.template_engine import template_engine
 from app.db.base import AsyncSessionLocal
 from app.models.sql import SAR
+from app.services.prompt_builder import estimate_tokens, prompt_builder
+from app.services.transaction_frame import TransactionFrame
+
+from app.utils.privacy_guard import NarrativeStitcher, RedactionIndex, StreamingMasker, StreamingStitcher
 
-from app.utils.privacy_guard import NarrativeStitcher, PrivacyGuard
+# Finding reasons quoted per triggered rule; the rest are only counted
+MAX_INDICATOR_EXAMPLES = 3
 
 class GenerationService:
     def _prepare_anonymized_data(self, request: GenerateRequest) -> dict:
         """
         Creates a version of the data where PII is replaced by placeholders.
         """
+        account = request.customer.account_number
+        counterparties = {account: "SELF"} # Real account numbers -> CP1, CP2, ... in order of appearance
         anonymized_tx = []
         for tx in request.transactions:
+            outgoing = tx.sender_account == account
+            other = tx.receiver_account if outgoing else tx.sender_account
             anonymized_tx.append({
                 "amount": tx.amount,
                 "currency": tx.currency,
-                "timestamp": tx.timestamp.strftime("%Y-%m-%d"),
+                "timestamp": tx.timestamp.strftime("%Y-%m-%d %H:%M"),
                 "type": tx.transaction_type,
+                "direction": "out" if outgoing else "in",
+                "counterparty": counterparties.setdefault(other, f"CP{len(counterparties)}"),
                 "desc": "Standard Transaction" # Masking specific merchants/names
             })
             
@@ -40,9 +58,160 @@ class GenerationService:
             "alerts": [a.rule_name for a in request.alerts]
         }
 
-    async def generate_sar(self, request: GenerateRequest) -> SARResponse:
-        # 1. Prepare anonymized context
-        anon_data = self._prepare_anonymized_data(request)
+    def _analyze_activity(self, request: GenerateRequest) -> dict:
+        """
+        Rule findings and a statistical summary of all transactions. Only
+        reasons, counts and amounts are kept: no ids or account numbers.
+        `flagged` marks the transactions cited by any finding.
+        """
+        frame = TransactionFrame.from_transactions(request.transactions)
+        account = request.customer.account_number
+        findings = analysis_engine.analyze(frame, region=request.region, account_number=account)
+        indicators = [
+            {
+                "type": hits[0]["type"],
+                "count": len(hits),
+                "examples": list(dict.fromkeys(hit["reason"] for hit in hits))[:MAX_INDICATOR_EXAMPLES],
+            }
+            for hits in findings.values() if isinstance(hits, list) and hits
+        ]
+        cited = {
+            tx_id
+            for hits in findings.values() if isinstance(hits, list)
+            for hit in hits
+            for tx_id in [hit.get("transaction_id")] + hit.get("ids", []) + hit.get("transaction_ids", []) + hit.get("returned_via", [])
+            if tx_id is not None
+        }
+        # One pass for the case_profile counters and the type mix
+        profile = CaseProfile(account)
+        types = Counter()
+        for tx in request.transactions:
+            profile.add_transaction(tx.amount, tx.description, tx.sender_account, tx.receiver_account,
+                                    tx.timestamp, tx.transaction_id)
+            types[tx.transaction_type] += 1
+        for alert in request.alerts:
+            profile.add_alert(alert.rule_name)
+        return {
+            "indicators": indicators,
+            "flagged": np.fromiter((tx_id in cited for tx_id in frame.transaction_ids), dtype=bool, count=len(frame)),
+            "statistics": analysis_engine.summarize(frame, account),
+            "types": types.most_common(5),
+            "profile": {**profile.ratings(), "high_value_count": profile.counters["high_value_count"]},
+        }
+
+    def _format_activity(self, activity: dict, region_config: RegionConfig) -> str:
+        """
+        Renders the analysis as prompt lines; the size depends on the rules
+        that fired, not on the number of transactions.
+        """
+        def money(amount: float) -> str:
+            # No thousands separators: each group would cost two tokens
+            return f"{region_config.currency_symbol}{amount:.0f}"
+
+        stats = activity["statistics"]
+        if not stats["txn_count"]:
+            return "- Transactions: none"
+        types = ", ".join(f"{name} x{count}" for name, count in activity["types"])
+        # Repeated dates and amounts, and empty directions, are written once or left out
+        period = stats["first"] if stats["first"] == stats["last"] else f"{stats['first']} to {stats['last']}"
+        if stats["amount_min"] == stats["amount_max"]:
+            amounts = f"- Amounts: all {money(stats['amount_min'])}"
+        else:
+            amounts = (f"- Amounts: min {money(stats['amount_min'])} / median {money(stats['amount_median'])} / "
+                       f"p95 {money(stats['amount_p95'])} / max {money(stats['amount_max'])}")
+        lines = [
+            f"- Transactions: {stats['txn_count']} ({types}), {money(stats['total_volume'])} total, {period}",
+            amounts,
+        ]
+        if "in_count" in stats:
+            sides = []
+            if stats["in_count"]:
+                sides.append(f"in {stats['in_count']} ({money(stats['in_total'])}) from {stats['senders']} senders")
+            if stats["out_count"]:
+                sides.append(f"out {stats['out_count']} ({money(stats['out_total'])}) to {stats['receivers']} receivers")
+            lines.append("- Subject account: " + ("; ".join(sides) or "no transfers"))
+        profile = activity["profile"]
+        lines.append(
+            f"- Activity profile: {profile['occupation']}, expected turnover {money(profile['expected_turnover'])}, "
+            f"activity risk {profile['risk_rating']} ({profile['high_value_count']} transactions over "
+            f"{money(HIGH_VALUE_THRESHOLD)})"
+        )
+        if not activity["indicators"]:
+            lines.append("- Rule indicators: none triggered")
+        for indicator in activity["indicators"]:
+            lines.append(f"- {indicator['type']} ({indicator['count']} findings): " + " ".join(indicator["examples"]))
+        return "\n        ".join(lines)
+
+    def _build_user_prompt(self, request: GenerateRequest, anon_data: dict, activity: dict) -> str:
+        """
+        With PROMPT_TRANSACTION_TABLE on, the transaction table gets
+        whatever is left of the token budget once the rest of the prompt is
+        laid out; otherwise the summary above stands for the transactions.
+        """
+        region_config = RegionFactory.get(request.region)
+        head = f"""
+        INVESTIGATION FOR CASE {{{{CASE_ID}}}}
+        
+        SUBJECT PROFILE:
+        - Name: {{{{CUSTOMER_NAME}}}}
+        - Occupation: {anon_data['customer']['occupation']}
+        - Risk Rating: {anon_data['customer']['risk_rating']}
+        
+        ACTIVITY SUMMARY:
+        - Alerts: {anon_data['alerts']}
+        {self._format_activity(activity, region_config)}
+        """
+        tail = """
+        
+        TASK:
+        Draft a concise the Suspicious Activity Report (SAR) narrative. Ground your reasoning 
+        strictly in the triggered rules and indicators. Ensure placeholders are used accurately.
+        """
+        if not settings.PROMPT_TRANSACTION_TABLE:
+            return head + tail
+        head += """
+        TRANSACTIONS:
+        """
+        budget = prompt_builder.token_budget - estimate_tokens(head + tail)
+        table = prompt_builder.transaction_section(
+            anon_data["transactions"], activity["flagged"], budget, region_config.currency_code
+        )
+        return head + "\n        ".join(table or ["none"]) + tail
+
+    async def _stream_narrative(self, user_prompt: str, system_prompt: str, pii_map: dict,
+                                redaction_index: RedactionIndex,
+                                on_chunk: Callable[[str], Awaitable[None]]) -> str:
+        """
+        Streams the LLM output, handing masked and stitched chunks to
+        `on_chunk` as they arrive, so the preview never shows a value the
+        saved SAR hides. Returns the full raw (placeholder) narrative.
+        """
+        masker = StreamingMasker(redaction_index)
+        stitcher = StreamingStitcher(pii_map)
+        raw_parts = []
+        async for token in llm_engine.stream(prompt=user_prompt, system_prompt=system_prompt):
+            raw_parts.append(token)
+            piece = stitcher.feed(masker.feed(token))
+            if piece:
+                await on_chunk(piece)
+        tail = stitcher.feed(masker.flush()) + stitcher.flush()
+        if tail:
+            await on_chunk(tail)
+        return "".join(raw_parts)
+
+    async def generate_sar(self, request: GenerateRequest,
+                           on_chunk: Optional[Callable[[str], Awaitable[None]]] = None) -> SARResponse:
+        """
+        Runs the full generation pipeline. When `on_chunk` is given the LLM is
+        streamed and stitched narrative chunks are passed to it as they arrive.
+        """
+        # 1. Prepare anonymized context while the rules run over all transactions;
+        #    every PII value of the request is indexed once for the leak checks
+        anon_data, activity, redaction_index = await asyncio.gather(
+            asyncio.to_thread(self._prepare_anonymized_data, request),
+            asyncio.to_thread(self._analyze_activity, request),
+            asyncio.to_thread(RedactionIndex.from_request, request),
+        )
         
         # 2. Extract real PII for post-processing
         pii_map = {
@@ -61,38 +230,47 @@ class GenerationService:
             "If no suspicious alerts are present, output: 'No suspicious activity identified for {{CUSTOMER_NAME}} during the review period.'"
         )
         
-        user_prompt = f"""
-        INVESTIGATION FOR CASE {{{{CASE_ID}}}}
-        
-        SUBJECT PROFILE:
-        - Name: {{{{CUSTOMER_NAME}}}}
-        - Occupation: {anon_data['customer']['occupation']}
-        - Risk Rating: {anon_data['customer']['risk_rating']}
-        
-        ACTIVITY SUMMARY:
-        - Alerts: {anon_data['alerts']}
-        - Transactions: {anon_data['transactions'][:10]} (Sample size: {len(anon_data['transactions'])})
-        
-        TASK:
-        Draft a concise the Suspicious Activity Report (SAR) narrative. Ground your reasoning 
-        strictly in the triggered rules and indicators. Ensure placeholders are used accurately.
-        """
+        user_prompt = self._build_user_prompt(request, anon_data, activity)
+        prompt_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        print(f"Prompt for {len(request.transactions)} transactions: ~{prompt_tokens} tokens", flush=True)
         
-        # 4. Generate Anonymized Narrative via LLM
+        # 4. Reuse a cached narrative for an identical anonymized prompt
+        use_cache = settings.NARRATIVE_CACHE_ENABLED and not request.bypass_cache
+        cache_key = narrative_cache.make_key(llm_engine.model, system_prompt, user_prompt, llm_engine.options)
+        raw_narrative = narrative_cache.get(cache_key) if use_cache else None
+        if request.bypass_cache:
+            narrative_cache.record_bypass()
+        from_cache = raw_narrative is not None
+
+        # 5. Otherwise generate Anonymized Narrative via LLM
         # Using a timeout safety checked llama3:latest
-        raw_narrative = await llm_engine.generate(
-            prompt=user_prompt,
-            system_prompt=system_prompt
-        )
+        if from_cache:
+            pass  # Sent to on_chunk below, once the leak check has run
+        elif on_chunk:
+            raw_narrative = await self._stream_narrative(user_prompt, system_prompt, pii_map, redaction_index,
+                                                         on_chunk)
+        else:
+            raw_narrative = await llm_engine.generate(
+                prompt=user_prompt,
+                system_prompt=system_prompt
+            )
         
-        # 5. Post-Processing: PII Injection & Leakage Check
-        if PrivacyGuard.check_leakage(raw_narrative, [request.customer.name, request.customer.customer_id]):
+        # 6. Post-Processing: PII Injection & Leakage Check
+        leaks = redaction_index.find(raw_narrative)
+        if leaks:
             # Emergency fix: force re-anonymization if model slipped
-            raw_narrative = raw_narrative.replace(request.customer.name, "{{CUSTOMER_NAME}}")
+            labels = sorted({redaction_index.replacements[value] for _, _, value in leaks})
+            print(f"PII Leakage Detected: {len(leaks)} matches ({', '.join(labels)}), masking", flush=True)
+            raw_narrative = redaction_index.mask(raw_narrative)
+        elif use_cache and not from_cache:
+            # Only clean placeholder narratives are cached
+            narrative_cache.set(cache_key, raw_narrative)
         
         final_narrative = NarrativeStitcher.stitch(raw_narrative, pii_map)
+        if from_cache and on_chunk:
+            await on_chunk(final_narrative)
         
-        # 6. Persist to Database
+        # 7. Persist to Database
         sar_id = pii_map["case_id"]
         async with AsyncSessionLocal() as session:
             db_sar = SAR(
@@ -109,7 +287,9 @@ class GenerationService:
             content=final_narrative,
             sections={
                 "narrative": final_narrative,
-                "anonymized_query": user_prompt
+                "anonymized_query": user_prompt,
+                "prompt_tokens": prompt_tokens,
+                "from_cache": from_cache
             },
             generated_at=datetime.utcnow(),
             status="GENERATED"
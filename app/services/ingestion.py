@@ -0,0 +1,297 @@
+"""
+Bulk ingestion of connector batches into `transactions` and `alerts`.
+
+Each DataFrame from a connector's stream_batches is mapped onto the table
+columns and validated with vectorized pandas operations, then written with
+one bulk statement: COPY into a temporary staging table followed by
+INSERT ... SELECT on PostgreSQL (asyncpg), executemany elsewhere. Rows whose
+key is already stored are skipped (ON CONFLICT DO NOTHING), so reloading a
+file never duplicates it.
+
+case_summary is folded in from the rows actually inserted, and the job's
+checkpoint is written in the same transaction as the batch: a job that is
+interrupted resumes after its last committed batch.
+
+Usage: see scripts/ingest.py
+"""
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Table, insert, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.connectors.base import DEFAULT_BATCH_SIZE
+from app.connectors.registry import connector_registry
+from app.db.base import engine
+from app.models.sql import Alert, IngestCheckpoint, Transaction
+from app.services.case_summary import CHUNK_SIZE, apply_alerts, apply_transactions
+
+@dataclass(frozen=True)
+class IngestTarget:
+    table: Table
+    key: str
+    # Columns the loader accepts, in insert order (others are dropped)
+    columns: Tuple[str, ...]
+    # Rows missing any of these are rejected
+    required: Tuple[str, ...]
+    # Filled in for missing or null values
+    defaults: Dict[str, object] = field(default_factory=dict)
+    numeric: Tuple[str, ...] = ()
+    datetimes: Tuple[str, ...] = ()
+    json: Tuple[str, ...] = ()
+    # Columns of inserted rows that case_summary needs, and the fold to apply
+    summary_columns: Tuple[str, ...] = ()
+    apply_summary: Optional[Callable] = None
+
+TARGETS = {
+    "transactions": IngestTarget(
+        table=Transaction.__table__,
+        key="transaction_id",
+        columns=("transaction_id", "amount", "currency", "timestamp", "sender_account",
+                 "receiver_account", "description", "transaction_type"),
+        required=("transaction_id", "amount"),
+        defaults={"currency": "USD", "transaction_type": "WIRE"},
+        numeric=("amount",),
+        datetimes=("timestamp",),
+        summary_columns=("transaction_id", "amount", "timestamp", "sender_account", "receiver_account", "description"),
+        apply_summary=apply_transactions,
+    ),
+    "alerts": IngestTarget(
+        table=Alert.__table__,
+        key="alert_id",
+        columns=("alert_id", "rule_name", "severity", "timestamp", "details", "account_number"),
+        required=("alert_id",),
+        datetimes=("timestamp",),
+        json=("details",),
+        summary_columns=("account_number", "rule_name"),
+        apply_summary=apply_alerts,
+    ),
+}
+
+def _parse_json(value):
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return np.nan
+
+def prepare_batch(df: pd.DataFrame, target: IngestTarget, column_map: Optional[Dict[str, str]] = None,
+                  loaded_at: Optional[datetime] = None) -> Tuple[pd.DataFrame, int, int]:
+    """
+    Map and validate one source batch.
+
+    Returns (rows, rejected, duplicates): rows has the target's columns,
+    object dtype with None for nulls; rejected rows miss a required value
+    or hold an unparsable number/timestamp/JSON; duplicates repeat a key
+    later in the same batch (the last occurrence wins).
+    """
+    if column_map:
+        df = df.rename(columns=column_map)
+    loaded_at = pd.Timestamp(loaded_at or datetime.utcnow())
+    valid = np.ones(len(df), dtype=bool)
+    columns = {}
+    for name in target.columns:
+        if name not in df.columns:
+            if name in target.required:
+                raise ValueError(f"Source has no column for {target.table.name}.{name}")
+            if name in target.defaults:
+                columns[name] = pd.Series(target.defaults[name], index=df.index, dtype=object)
+            elif name in target.datetimes:
+                # Same as the model default: the load time
+                columns[name] = pd.Series(loaded_at, index=df.index)
+            continue
+
+        col = df[name]
+        present = col.notna().to_numpy()
+        if name in target.numeric:
+            col = pd.to_numeric(col, errors="coerce")
+            parsed = np.isfinite(col.to_numpy(dtype=np.float64, na_value=np.nan))
+            valid &= parsed | ~present
+        elif name in target.datetimes:
+            # Stored as naive UTC, like the ORM's datetime.utcnow defaults
+            col = pd.to_datetime(col, utc=True, errors="coerce", format="ISO8601").dt.tz_localize(None)
+            valid &= col.notna().to_numpy() | ~present
+            col = col.fillna(loaded_at)
+        elif name in target.json:
+            col = col.map(_parse_json, na_action="ignore")
+            valid &= col.notna().to_numpy() | ~present
+        elif not pd.api.types.is_string_dtype(col):
+            # Numeric ids and codes are stored as text
+            col = col.map(str, na_action="ignore")
+        if name in target.defaults:
+            col = col.fillna(target.defaults[name])
+        if name in target.required:
+            valid &= present
+        columns[name] = col
+
+    frame = pd.DataFrame(columns, index=df.index)[list(columns)]
+    rejected = int(len(frame) - valid.sum())
+    frame = frame[valid]
+    keep = ~frame.duplicated(target.key, keep="last").to_numpy()
+    duplicates = int(len(frame) - keep.sum())
+    frame = frame[keep]
+    return frame.astype(object).where(frame.notna(), None), rejected, duplicates
+
+class IngestionService:
+    def __init__(self, db_engine: Optional[AsyncEngine] = None):
+        self.engine = db_engine or engine
+
+    # --- Bulk writes ------------------------------------------------------
+
+    @staticmethod
+    async def _copy_insert(conn: AsyncConnection, target: IngestTarget, rows: pd.DataFrame) -> List[dict]:
+        # COPY streams the batch in binary; the staging table then lets
+        # PostgreSQL skip existing keys in one set-based INSERT
+        table, staging = target.table.name, f"ingest_{target.table.name}"
+        columns = list(rows.columns)
+        await conn.execute(text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        ))
+        for name in target.json:
+            if name in rows:
+                rows = rows.assign(**{name: rows[name].map(json.dumps, na_action="ignore")})
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            staging, records=list(rows.itertuples(index=False, name=None)), columns=columns,
+        )
+        column_list = ", ".join(columns)
+        result = await conn.execute(text(
+            f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} "
+            f"ON CONFLICT ({target.key}) DO NOTHING RETURNING {', '.join(target.summary_columns)}"
+        ))
+        return [dict(row) for row in result.mappings()]
+
+    @staticmethod
+    async def _executemany_insert(conn: AsyncConnection, target: IngestTarget, rows: pd.DataFrame) -> List[dict]:
+        records = rows.to_dict("records")
+        dialect = conn.dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            stmt = (pg_insert if dialect == "postgresql" else sqlite_insert)(target.table)
+            stmt = stmt.on_conflict_do_nothing(index_elements=[target.key]).returning(
+                *(target.table.c[name] for name in target.summary_columns)
+            )
+            result = await conn.execute(stmt, records)
+            return [dict(row) for row in result.mappings()]
+
+        # No portable upsert: drop keys that are already stored, then insert
+        key = target.table.c[target.key]
+        existing = set()
+        for i in range(0, len(records), CHUNK_SIZE):
+            chunk = [record[target.key] for record in records[i:i + CHUNK_SIZE]]
+            existing.update((await conn.execute(select(key).where(key.in_(chunk)))).scalars())
+        records = [record for record in records if record[target.key] not in existing]
+        if records:
+            await conn.execute(insert(target.table), records)
+        return [{name: record.get(name) for name in target.summary_columns} for record in records]
+
+    async def _insert(self, conn: AsyncConnection, target: IngestTarget, rows: pd.DataFrame) -> List[dict]:
+        """Insert new rows; returns the summary columns of the ones actually inserted."""
+        if conn.dialect.name == "postgresql" and conn.dialect.driver == "asyncpg":
+            return await self._copy_insert(conn, target, rows)
+        return await self._executemany_insert(conn, target, rows)
+
+    # --- Checkpoints ------------------------------------------------------
+
+    @staticmethod
+    async def _load_checkpoint(conn: AsyncConnection, job_id: str) -> Optional[dict]:
+        result = await conn.execute(
+            select(IngestCheckpoint.__table__).where(IngestCheckpoint.job_id == job_id)
+        )
+        row = result.mappings().first()
+        return dict(row) if row else None
+
+    @staticmethod
+    async def _save_checkpoint(conn: AsyncConnection, progress: dict):
+        values = {**progress, "updated_at": datetime.utcnow()}
+        result = await conn.execute(
+            update(IngestCheckpoint).where(IngestCheckpoint.job_id == progress["job_id"]).values(**values)
+        )
+        if result.rowcount == 0:
+            await conn.execute(insert(IngestCheckpoint).values(**values))
+
+    # --- Jobs -------------------------------------------------------------
+
+    async def ingest(self, batches: AsyncIterator[pd.DataFrame], target: str = "transactions",
+                     job_id: Optional[str] = None, column_map: Optional[Dict[str, str]] = None,
+                     restart: bool = False) -> dict:
+        """
+        Load every batch into `target` ("transactions" or "alerts").
+
+        With the job_id of an interrupted job, the source rows it already
+        committed are skipped; `restart` starts the job over (rows already
+        loaded are still skipped as duplicates). Returns the job's progress.
+        """
+        spec = TARGETS.get(target)
+        if spec is None:
+            raise ValueError(f"Unknown ingestion target: {target}")
+        job_id = job_id or str(uuid.uuid4())
+
+        async with self.engine.begin() as conn:
+            checkpoint = await self._load_checkpoint(conn, job_id)
+        if checkpoint and checkpoint["target"] != target:
+            raise ValueError(f"Job {job_id} loads {checkpoint['target']}, not {target}")
+        if checkpoint and checkpoint["completed"] and not restart:
+            print(f"Ingestion job {job_id} already completed", flush=True)
+            return checkpoint
+
+        progress = {
+            "job_id": job_id, "target": target, "batches_done": 0, "rows_read": 0, "rows_inserted": 0,
+            "rows_duplicate": 0, "rows_rejected": 0, "completed": False,
+        }
+        if checkpoint and not restart:
+            progress.update({name: checkpoint[name] for name in progress})
+            print(f"Resuming ingestion job {job_id} after {progress['rows_read']} rows", flush=True)
+        skip = progress["rows_read"]
+
+        start = time.perf_counter()
+        rows_this_run = 0
+        async for batch in batches:
+            if skip >= len(batch):
+                skip -= len(batch)
+                continue
+            if skip:
+                batch, skip = batch.iloc[skip:], 0
+
+            # Validation is CPU work; keep it off the event loop
+            rows, rejected, duplicates = await asyncio.to_thread(prepare_batch, batch, spec, column_map)
+            async with self.engine.begin() as conn:
+                inserted = await self._insert(conn, spec, rows) if len(rows) else []
+                if inserted:
+                    await conn.run_sync(spec.apply_summary, inserted)
+                progress["batches_done"] += 1
+                progress["rows_read"] += len(batch)
+                progress["rows_inserted"] += len(inserted)
+                progress["rows_duplicate"] += duplicates + len(rows) - len(inserted)
+                progress["rows_rejected"] += rejected
+                await self._save_checkpoint(conn, progress)
+
+            rows_this_run += len(batch)
+            elapsed = time.perf_counter() - start
+            print(f"Ingestion job {job_id}: batch {progress['batches_done']}, {progress['rows_read']} rows read, "
+                  f"{len(inserted)} inserted ({rows_this_run / elapsed * 60:,.0f} rows/min)", flush=True)
+
+        progress["completed"] = True
+        async with self.engine.begin() as conn:
+            await self._save_checkpoint(conn, progress)
+        elapsed = time.perf_counter() - start
+        return {**progress, "elapsed_seconds": elapsed,
+                "rows_per_minute": rows_this_run / elapsed * 60 if elapsed else 0.0}
+
+    async def ingest_source(self, connector_type: str, config: dict, query: Optional[str] = None,
+                            batch_size: int = DEFAULT_BATCH_SIZE, **kwargs) -> dict:
+        """Stream a connector's source into the database (see ingest for kwargs)."""
+        async with connector_registry.acquire(connector_type, config) as connector:
+            batches = connector.stream_batches(query=query, batch_size=batch_size)
+            return await self.ingest(batches, **kwargs)
+
+ingestion_service = IngestionService()
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import redis
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "narrative_cache:"
+STATS_KEY = "narrative_cache:stats"
+
+class NarrativeCache:
+    """
+    Two-tier, content-addressed cache of raw (placeholder) LLM narratives.
+
+    Keys hash everything the LLM sees, which is already anonymized, and values
+    are stored before NarrativeStitcher.stitch, so no PII is ever cached.
+    Tier 1 is an in-process LRU with TTL; tier 2 is Redis, where entries
+    carry a TTL and are therefore also subject to `volatile-lru` eviction.
+    The cache is best-effort: Redis failures count as misses.
+    """
+
+    def __init__(self, client=redis_client, ttl_seconds: int = None, local_size: int = None):
+        self.client = client
+        self.ttl_seconds = ttl_seconds or settings.NARRATIVE_CACHE_TTL_SECONDS
+        self.local_size = local_size or settings.NARRATIVE_CACHE_LOCAL_SIZE
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "stores": 0, "bypassed": 0, "errors": 0}
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, user_prompt: str, options: dict = None) -> str:
+        material = json.dumps(
+            {"model": model, "system": system_prompt, "prompt": user_prompt, "options": options or {}},
+            sort_keys=True
+        )
+        return CACHE_PREFIX + hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _count(self, field: str):
+        self.stats[field] += 1
+        try:
+            # Shared across API and workers so the stats endpoint sees every process
+            self.client.hincrby(STATS_KEY, field, 1)
+        except redis.RedisError:
+            pass
+
+    def _get_local(self, key: str) -> Optional[str]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, narrative = entry
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return narrative
+
+    def _set_local(self, key: str, narrative: str):
+        self._local[key] = (time.monotonic() + self.ttl_seconds, narrative)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        narrative = self._get_local(key)
+        if narrative is not None:
+            self._count("local_hits")
+            return narrative
+
+        try:
+            narrative = self.client.get(key)
+        except redis.RedisError as e:
+            logger.warning(f"Narrative cache read failed: {e}")
+            self._count("errors")
+            narrative = None
+
+        if narrative is not None:
+            self._set_local(key, narrative)
+            self._count("redis_hits")
+            return narrative
+
+        self._count("misses")
+        return None
+
+    def set(self, key: str, narrative: str):
+        if not narrative:
+            return
+        self._set_local(key, narrative)
+        try:
+            self.client.set(key, narrative, ex=self.ttl_seconds)
+        except redis.RedisError as e:
+            logger.warning(f"Narrative cache write failed: {e}")
+            self._count("errors")
+            return
+        self._count("stores")
+
+    def record_bypass(self):
+        self._count("bypassed")
+
+    def get_stats(self) -> dict:
+        """
+        Cluster-wide counters from Redis plus this process's local view.
+        """
+        try:
+            shared = self.client.hgetall(STATS_KEY)
+        except redis.RedisError:
+            shared = {}
+        return self._format_stats(shared)
+
+    async def get_stats_async(self, client) -> dict:
+        """
+        get_stats for the API event loop, reading through an asyncio client.
+        """
+        try:
+            shared = await client.hgetall(STATS_KEY)
+        except redis.RedisError:
+            shared = {}
+        return self._format_stats(shared)
+
+    def _format_stats(self, shared: dict) -> dict:
+        shared = {k: int(v) for k, v in shared.items()}
+        hits = shared.get("local_hits", 0) + shared.get("redis_hits", 0)
+        lookups = hits + shared.get("misses", 0)
+        return {
+            "shared": shared,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "process": dict(self.stats, local_entries=len(self._local)),
+        }
+
+narrative_cache = NarrativeCache()
@@ -0,0 +1,80 @@
+import json
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from app.core.redis_client import redis_client, async_redis
+
+# Partial narratives are kept for late subscribers, then expire
+STREAM_TTL_SECONDS = 3600
+
+TERMINAL_EVENTS = ("done", "error")
+
+def stream_channel(job_id: str) -> str:
+    return f"sar_stream:{job_id}"
+
+def stream_buffer_key(job_id: str) -> str:
+    return f"sar_stream:{job_id}:buffer"
+
+class NarrativeStreamPublisher:
+    """
+    Worker side: publishes stitched narrative chunks for one job.
+    Every event is both published on the job channel (live subscribers) and
+    appended to a buffer list (subscribers that connect mid-generation).
+    """
+
+    def __init__(self, job_id: str, client=redis_client):
+        self.client = client
+        self.channel = stream_channel(job_id)
+        self.buffer_key = stream_buffer_key(job_id)
+        self.seq = 0
+
+    def publish(self, event_type: str, text: str = ""):
+        self.seq += 1
+        message = json.dumps({"seq": self.seq, "type": event_type, "text": text})
+        pipe = self.client.pipeline(transaction=False)
+        pipe.rpush(self.buffer_key, message)
+        pipe.expire(self.buffer_key, STREAM_TTL_SECONDS)
+        pipe.publish(self.channel, message)
+        pipe.execute()
+
+async def iter_stream_events(
+    job_id: str,
+    is_finished: Optional[Callable[[], Awaitable[bool]]] = None,
+    idle_timeout: float = 15.0,
+) -> AsyncIterator[dict]:
+    """
+    API side: yields stream events for a job until a terminal event.
+    Subscribes before replaying the buffer so nothing published in between is
+    lost; duplicates are dropped by sequence number. When the channel is idle,
+    `is_finished` is awaited so jobs that never stream still terminate.
+    """
+    client = async_redis.client
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(stream_channel(job_id))
+
+        last_seq = 0
+        for raw in await client.lrange(stream_buffer_key(job_id), 0, -1):
+            event = json.loads(raw)
+            last_seq = event["seq"]
+            yield event
+            if event["type"] in TERMINAL_EVENTS:
+                return
+
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=idle_timeout)
+            if message is None:
+                if is_finished and await is_finished():
+                    yield {"seq": last_seq + 1, "type": "done", "text": ""}
+                    return
+                continue
+
+            event = json.loads(message["data"])
+            if event["seq"] <= last_seq:
+                continue
+            last_seq = event["seq"]
+            yield event
+            if event["type"] in TERMINAL_EVENTS:
+                return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
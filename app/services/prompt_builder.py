@@ -0,0 +1,104 @@
+"""
+Token-budgeted transaction table for the SAR prompt.
+
+Anonymized transactions are packed as pipe-separated rows: the flagged
+ones (cited by a rule finding), then up to PROMPT_CONTEXT_ROWS of the most
+anomalous amounts for context, until the budget is spent. Everything left
+out is summarized per transaction type and per counterparty, so the
+section stays small whatever the number of transactions.
+"""
+import re
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+
+# Words plus punctuation marks: close enough to BPE counts to budget with
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+TABLE_COLUMNS = "time|type|dir|amount|counterparty|flag"
+# Largest groups listed per aggregate; smaller ones are merged into "other"
+MAX_AGGREGATE_GROUPS = 5
+
+def estimate_tokens(text: str) -> int:
+    return len(TOKEN_RE.findall(text))
+
+class PromptBuilder:
+    def __init__(self, token_budget: Optional[int] = None, context_rows: Optional[int] = None):
+        self.token_budget = token_budget or settings.PROMPT_TOKEN_BUDGET
+        self.context_rows = settings.PROMPT_CONTEXT_ROWS if context_rows is None else context_rows
+
+    @staticmethod
+    def _row(tx: dict, flagged: bool, currency: str) -> str:
+        # Amounts are in the section currency unless marked otherwise
+        amount = f"{tx['amount']:.0f}" if tx["currency"] == currency else f"{tx['amount']:.0f} {tx['currency']}"
+        return f"{tx['timestamp']}|{tx['type']}|{tx['direction']}|{amount}|{tx['counterparty']}|{'*' if flagged else ''}"
+
+    @staticmethod
+    def _priority(amount: np.ndarray, flagged: np.ndarray) -> np.ndarray:
+        # Flagged first, then by distance from the median amount on a log scale
+        scale = np.log1p(np.abs(amount))
+        anomaly = np.abs(scale - np.median(scale))
+        return np.lexsort((-anomaly, ~flagged))
+
+    @staticmethod
+    def _aggregate(label: str, keys: List[str], amount: np.ndarray, currency: str) -> str:
+        codes, names = pd.factorize(np.array(keys, dtype=object))
+        counts = np.bincount(codes, minlength=len(names))
+        totals = np.bincount(codes, weights=amount, minlength=len(names))
+        order = np.argsort(-totals, kind="stable")
+        parts = [f"{names[i]} x{counts[i]} {totals[i]:.0f}" for i in order[:MAX_AGGREGATE_GROUPS]]
+        rest = order[MAX_AGGREGATE_GROUPS:]
+        if len(rest):
+            parts.append(f"other x{counts[rest].sum()} {totals[rest].sum():.0f}")
+        return f"- By {label} ({currency}): " + ", ".join(parts)
+
+    def _summary(self, transactions: List[dict], amount: np.ndarray, omitted: np.ndarray, currency: str) -> List[str]:
+        if not len(omitted):
+            return []
+        rows = [transactions[i] for i in omitted.tolist()]
+        return [
+            f"{len(omitted)} more transactions, aggregated:",
+            self._aggregate("type", [f"{tx['type']}/{tx['direction']}" for tx in rows], amount[omitted], currency),
+            self._aggregate("counterparty", [tx["counterparty"] for tx in rows], amount[omitted], currency),
+        ]
+
+    def transaction_section(self, transactions: List[dict], flagged: np.ndarray, budget: int,
+                            currency: str) -> List[str]:
+        """
+        Lines of the transaction section, estimated at no more than `budget`
+        tokens (the header and aggregates are always kept). `flagged` marks
+        transactions cited by rule findings; at most `context_rows` others
+        are listed.
+        """
+        if not transactions:
+            return []
+        header = f"{TABLE_COLUMNS} (amounts in {currency}, * = cited by a rule)"
+        amount = np.fromiter((tx["amount"] for tx in transactions), dtype=np.float64, count=len(transactions))
+        order = self._priority(amount, flagged)
+
+        # Reserve room for the aggregates as if every transaction were left out
+        remaining = budget - estimate_tokens(header) - sum(
+            estimate_tokens(line) for line in self._summary(transactions, amount, order, currency)
+        )
+        chosen = []
+        context = 0
+        for i in order.tolist():
+            if not flagged[i]:
+                if context >= self.context_rows:
+                    break
+                context += 1
+            row = self._row(transactions[i], flagged[i], currency)
+            cost = estimate_tokens(row)
+            if cost > remaining:
+                break
+            chosen.append((i, row))
+            remaining -= cost
+
+        # Kept rows read chronologically
+        rows = [row for _, row in sorted(chosen, key=lambda item: transactions[item[0]]["timestamp"])]
+        return [header] + rows + self._summary(transactions, amount, order[len(chosen):], currency)
+
+prompt_builder = PromptBuilder()
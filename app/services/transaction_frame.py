@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from app.schemas.models import Transaction
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+def epoch_us(ts: datetime) -> int:
+    # Exact integer microseconds; naive timestamps keep wall-clock differences
+    return (ts - (_EPOCH if ts.tzinfo is None else _EPOCH_UTC)) // _MICROSECOND
+
+def from_epoch_us(ts_us: int) -> datetime:
+    # Naive; UTC when the source timestamps were timezone-aware
+    return _EPOCH + timedelta(microseconds=int(ts_us))
+
+HOUR_US = 3600 * 1_000_000
+
+class TransactionFrame:
+    """
+    Columnar view of a transaction list, built once per analysis.
+
+    `amount` (float64) and `ts_us` (int64 epoch microseconds) drive the
+    rules; `sender` / `receiver` are integer codes into `accounts`, so
+    counterparty logic compares ints instead of strings.
+    """
+
+    def __init__(self, transaction_ids: np.ndarray, amount: np.ndarray, ts_us: np.ndarray,
+                 sender: np.ndarray, receiver: np.ndarray, accounts: np.ndarray):
+        self.transaction_ids = transaction_ids
+        self.amount = amount
+        self.ts_us = ts_us
+        self.sender = sender
+        self.receiver = receiver
+        self.accounts = accounts
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    @classmethod
+    def from_transactions(cls, transactions: List[Transaction]) -> "TransactionFrame":
+        n = len(transactions)
+        codes, accounts = pd.factorize(np.array(
+            [t.sender_account for t in transactions] + [t.receiver_account for t in transactions], dtype=object
+        ))
+        return cls(
+            transaction_ids=np.array([t.transaction_id for t in transactions], dtype=object),
+            amount=np.fromiter((t.amount for t in transactions), dtype=np.float64, count=n),
+            ts_us=np.fromiter((epoch_us(t.timestamp) for t in transactions), dtype=np.int64, count=n),
+            sender=codes[:n],
+            receiver=codes[n:],
+            accounts=np.asarray(accounts, dtype=object),
+        )
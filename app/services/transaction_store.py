@@ -0,0 +1,379 @@
+"""
+Columnar, memory-mapped copy of the transactions table for case analytics.
+
+Every transaction is stored once per account it touches (the sender's copy
+and the receiver's; self-transfers once), in TRANSACTION_STORE_PARTITIONS
+partitions chosen by a CRC32 of the account. Inside a partition rows are
+sorted by (account, timestamp, transaction_id) and `indptr` gives each
+account's row range, so an account's history is a zero-copy slice of every
+column. Numeric columns are plain .npy arrays; string columns are an
+offsets array plus a UTF-8 byte heap, decoded only for the rows a response
+actually returns.
+
+A refresh compares the store's per-account row counts with case_summary,
+which every insert path maintains, and reloads the accounts that differ
+(only their partitions are rewritten). It therefore picks up every
+committed row, whatever its timestamp. Readers check the same counts and
+fall back to the database for an account the store is behind on.
+
+Usage:
+    python -m app.services.transaction_store build             # full build
+    python -m app.services.transaction_store refresh           # reload accounts with new transactions
+    python -m app.services.transaction_store show <account>    # analytics for one account
+"""
+import asyncio
+import json
+import os
+import shutil
+import sys
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.models.sql import Transaction
+from app.services.case_summary import CHUNK_SIZE, drifted_accounts
+from app.services.case_profile import (
+    HIGH_VALUE_THRESHOLD, PAYROLL, PAYROLL_KEYWORD, SALARY, SALARY_KEYWORD, derive, is_anomaly,
+)
+from app.services.transaction_frame import from_epoch_us
+
+STRING_COLUMNS = ("transaction_id", "currency", "sender_account", "receiver_account", "description", "transaction_type")
+# direction bits, relative to the account the row is stored under
+OUT, IN = 1, 2
+STREAM_CHUNK_ROWS = 100_000
+# Missing timestamps are stored as the smallest int64 (datetime64 NaT)
+NAT_US = np.iinfo(np.int64).min
+
+def partition_of(accounts: np.ndarray, partitions: int) -> np.ndarray:
+    # CRC32 rather than hash(): stable across processes and restarts
+    codes, uniques = pd.factorize(accounts)
+    crc = np.fromiter((zlib.crc32(a.encode("utf-8")) for a in uniques), dtype=np.int64, count=len(uniques))
+    return (crc % partitions)[codes]
+
+def account_rows(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Transaction rows (Transaction columns) as per-account rows: `account`,
+    the direction bits and the salary flags added.
+    """
+    sender, receiver = frame["sender_account"], frame["receiver_account"]
+    self_transfer = (sender == receiver).to_numpy()
+    # Empty account numbers are skipped, as in case_summary
+    has_sender = (sender.fillna("") != "").to_numpy()
+    has_receiver = (receiver.fillna("") != "").to_numpy()
+    sent = frame[has_sender].assign(account=sender, direction=np.where(self_transfer, OUT | IN, OUT)[has_sender])
+    received = frame[has_receiver & ~self_transfer].assign(account=receiver, direction=IN)
+    rows = pd.concat([sent, received], ignore_index=True)
+
+    # Vectorised case_profile.description_flags
+    desc = rows["description"].fillna("").astype(str)
+    is_salary = desc.str.contains(SALARY_KEYWORD, case=False, regex=False).to_numpy()
+    is_payroll = is_salary | desc.str.contains(PAYROLL_KEYWORD, case=False, regex=False).to_numpy()
+    rows["flags"] = np.where(is_salary, SALARY, 0) | np.where(is_payroll, PAYROLL, 0)
+    # Missing timestamps sort first, like datetime.min in case_summary
+    rows["timestamp_us"] = pd.to_datetime(rows["timestamp"]).to_numpy(dtype="datetime64[us]").astype(np.int64)
+    return rows
+
+def _pack_strings(values: pd.Series):
+    # Offsets into one UTF-8 heap; nulls are empty strings flagged in a mask
+    nulls = values.isna().to_numpy()
+    encoded = [v.encode("utf-8") for v in values.fillna("").astype(str)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8), nulls
+
+def _write_partition(directory: str, rows: pd.DataFrame):
+    rows = rows.sort_values(["account", "timestamp_us", "transaction_id"], kind="stable")
+    accounts = np.char.encode(rows["account"].to_numpy(dtype=str), "utf-8")
+    names, starts = np.unique(accounts, return_index=True)
+    os.makedirs(directory)
+    arrays = {
+        "accounts": names,
+        "indptr": np.append(starts, len(rows)).astype(np.int64),
+        "amount": rows["amount"].to_numpy(dtype=np.float64),
+        "timestamp_us": rows["timestamp_us"].to_numpy(dtype=np.int64),
+        "direction": rows["direction"].to_numpy(dtype=np.uint8),
+        "flags": rows["flags"].to_numpy(dtype=np.uint8),
+    }
+    for name in STRING_COLUMNS:
+        arrays[f"{name}_offsets"], arrays[f"{name}_heap"], arrays[f"{name}_nulls"] = _pack_strings(rows[name])
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+
+def _swap_in(tmp: str, path: str):
+    # Readers that mapped the old files keep them until they reopen
+    old = f"{path}.old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old)
+    os.rename(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+class AccountView:
+    """One account's rows: zero-copy slices of the partition's columns."""
+
+    def __init__(self, account: str, partition: Dict[str, np.ndarray], lo: int, hi: int):
+        self.account = account
+        self._partition = partition
+        self._lo, self._hi = lo, hi
+        self.amount = partition["amount"][lo:hi]
+        self.timestamp_us = partition["timestamp_us"][lo:hi]
+        self.direction = partition["direction"][lo:hi]
+        self.flags = partition["flags"][lo:hi]
+
+    def __len__(self) -> int:
+        return self._hi - self._lo
+
+    def time_range(self, start_us: Optional[int] = None, end_us: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Positions [start, stop) of the rows with start_us <= timestamp < end_us.
+        Rows are sorted by timestamp; with either bound, rows without one are
+        excluded, as the SQL comparison would.
+        """
+        if start_us is None and end_us is None:
+            return 0, len(self)
+        ts = self.timestamp_us
+        start = int(np.searchsorted(ts, NAT_US if start_us is None else start_us, side="right" if start_us is None else "left"))
+        stop = len(self) if end_us is None else int(np.searchsorted(ts, end_us, side="left"))
+        return start, max(start, stop)
+
+    def strings(self, name: str, start: int = 0, stop: Optional[int] = None) -> List[Optional[str]]:
+        lo, hi = self._lo + start, self._lo + (len(self) if stop is None else min(stop, len(self)))
+        offsets = self._partition[f"{name}_offsets"][lo:hi + 1]
+        heap = self._partition[f"{name}_heap"][offsets[0]:offsets[-1]].tobytes()
+        nulls = self._partition[f"{name}_nulls"][lo:hi]
+        bounds = (offsets - offsets[0]).tolist()
+        return [
+            None if null else heap[bounds[i]:bounds[i + 1]].decode("utf-8")
+            for i, null in enumerate(nulls.tolist())
+        ]
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> List[dict]:
+        """Rows [start, stop) as Transaction-shaped dicts."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return []
+        columns = {name: self.strings(name, start, stop) for name in STRING_COLUMNS}
+        columns["amount"] = self.amount[start:stop].tolist()
+        columns["timestamp"] = [None if ts == NAT_US else from_epoch_us(ts)
+                                for ts in self.timestamp_us[start:stop].tolist()]
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+def case_analytics(view: AccountView, alert_count: int = 0, typology: Optional[str] = None) -> dict:
+    """
+    Case-detail analytics over the account's slices: average amount, per-row
+    anomaly flags and the case_profile ratings (risk, occupation, expected
+    turnover).
+    """
+    amount = view.amount
+    avg_amount = float(amount.mean()) if len(amount) else 0.0
+    incoming = (view.direction & IN) != 0
+    outgoing = (view.direction & OUT) != 0
+    salary = (view.flags & SALARY) != 0
+    payroll = (view.flags & PAYROLL) != 0
+    salary_in = amount[incoming & salary]
+    counters = {
+        "tx_count": len(amount),
+        "total_amount": float(amount.sum()),
+        "high_value_count": int((amount > HIGH_VALUE_THRESHOLD).sum()),
+        "receives_salary": bool((incoming & payroll).any()),
+        "sends_salary": bool((outgoing & payroll).any()),
+        "salary_in_max": float(salary_in.max()) if len(salary_in) else 0.0,
+        "payroll_out_total": float(amount[outgoing & salary].sum()),
+        "alert_count": alert_count,
+        "typology": typology,
+    }
+    return {
+        **counters,
+        **derive(counters),
+        "avg_amount": avg_amount,
+        "is_anomaly": is_anomaly(amount, avg_amount),
+    }
+
+class TransactionStore:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.partitions = meta["partitions"]
+        self.rows = meta.get("rows", 0)
+        self._loaded: Dict[int, Dict[str, np.ndarray]] = {}
+
+    def _partition(self, p: int) -> Optional[Dict[str, np.ndarray]]:
+        if p not in self._loaded:
+            directory = os.path.join(self.path, f"p{p:04d}")
+            if not os.path.isdir(directory):
+                return None
+            self._loaded[p] = {
+                name[:-4]: np.load(os.path.join(directory, name), mmap_mode="r")
+                for name in os.listdir(directory)
+            }
+        return self._loaded[p]
+
+    def account(self, account: str) -> Optional[AccountView]:
+        """The account's rows, or None when the store has none."""
+        partition = self._partition(int(partition_of(np.array([account], dtype=object), self.partitions)[0]))
+        if partition is None:
+            return None
+        key = account.encode("utf-8")
+        i = int(np.searchsorted(partition["accounts"], key))
+        if i >= len(partition["accounts"]) or partition["accounts"][i] != key:
+            return None
+        return AccountView(account, partition, int(partition["indptr"][i]), int(partition["indptr"][i + 1]))
+
+    def account_counts(self) -> Dict[str, int]:
+        """Rows per account across all partitions: its transaction count."""
+        counts = {}
+        for p in range(self.partitions):
+            partition = self._partition(p)
+            if partition is not None:
+                accounts = np.char.decode(partition["accounts"], "utf-8").tolist()
+                counts.update(zip(accounts, np.diff(partition["indptr"]).tolist()))
+        return counts
+
+    def _partition_rows(self, p: int) -> pd.DataFrame:
+        # A partition back as per-account rows, to merge new rows into
+        partition = self._partition(p)
+        if partition is None:
+            return pd.DataFrame()
+        counts = np.diff(partition["indptr"])
+        view = AccountView("", partition, 0, int(partition["indptr"][-1]))
+        return pd.DataFrame({
+            **{name: view.strings(name) for name in STRING_COLUMNS},
+            "account": np.repeat(np.char.decode(partition["accounts"], "utf-8"), counts),
+            "amount": np.asarray(view.amount), "timestamp_us": np.asarray(view.timestamp_us),
+            "direction": np.asarray(view.direction), "flags": np.asarray(view.flags),
+        })
+
+    # --- Building -----------------------------------------------------------
+
+    @staticmethod
+    async def _stream_rows(conn: AsyncConnection, accounts: Optional[List[str]] = None):
+        """Per-account rows of every transaction, or only the given accounts' rows."""
+        t = Transaction.__table__.c
+        query = select(*(t[name] for name in STRING_COLUMNS + ("amount", "timestamp")))
+        for chunk in ([None] if accounts is None else
+                      (accounts[i:i + CHUNK_SIZE] for i in range(0, len(accounts), CHUNK_SIZE))):
+            chunk_query = query if chunk is None else query.where(
+                or_(t.sender_account.in_(chunk), t.receiver_account.in_(chunk))
+            )
+            result = await conn.stream(chunk_query)
+            async for rows in result.partitions(STREAM_CHUNK_ROWS):
+                frame = account_rows(pd.DataFrame(rows, columns=list(STRING_COLUMNS) + ["amount", "timestamp"]))
+                # The counterparty's copy of a row belongs to its own account
+                yield frame if chunk is None else frame[frame["account"].isin(chunk)]
+
+    @staticmethod
+    def _write_meta(directory: str, partitions: int, rows: int):
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"partitions": partitions, "rows": rows, "saved_at": datetime.utcnow().isoformat()}, f)
+
+    @classmethod
+    async def build(cls, conn: AsyncConnection, path: str, partitions: Optional[int] = None) -> "TransactionStore":
+        """Full build from the transactions table, spooled to disk partition by partition."""
+        partitions = partitions or settings.TRANSACTION_STORE_PARTITIONS
+        tmp = f"{path}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        spool = os.path.join(tmp, "spool")
+        os.makedirs(spool)
+
+        total, chunk_no = 0, 0
+        async for rows in cls._stream_rows(conn):
+            if rows.empty:
+                continue
+            total += len(rows)
+            for p, part in rows.groupby(partition_of(rows["account"].to_numpy(dtype=object), partitions)):
+                part.to_pickle(os.path.join(spool, f"{p}-{chunk_no}.pkl"))
+            chunk_no += 1
+
+        for p in range(partitions):
+            parts = [pd.read_pickle(os.path.join(spool, f"{p}-{i}.pkl")) for i in range(chunk_no)
+                     if os.path.exists(os.path.join(spool, f"{p}-{i}.pkl"))]
+            if parts:
+                _write_partition(os.path.join(tmp, f"p{p:04d}"), pd.concat(parts, ignore_index=True))
+        shutil.rmtree(spool)
+        cls._write_meta(tmp, partitions, total)
+        _swap_in(tmp, path)
+        return cls(path)
+
+    async def refresh(self, conn: AsyncConnection) -> "TransactionStore":
+        """
+        Reload the accounts whose row count differs from case_summary,
+        rewriting only the partitions they live in.
+        """
+        stale = await conn.run_sync(drifted_accounts, self.account_counts())
+        if not stale:
+            return self
+        new = [rows async for rows in self._stream_rows(conn, stale) if not rows.empty]
+        rows = pd.concat(new, ignore_index=True) if new else None
+        stale_partitions = partition_of(np.array(stale, dtype=object), self.partitions)
+        row_partitions = partition_of(rows["account"].to_numpy(dtype=object), self.partitions) if new else None
+
+        total = self.rows
+        for p in np.unique(stale_partitions).tolist():
+            directory = os.path.join(self.path, f"p{p:04d}")
+            kept = self._partition_rows(p)
+            if not kept.empty:
+                total -= len(kept)
+                kept = kept[~kept["account"].isin(np.array(stale, dtype=object)[stale_partitions == p])]
+            merged = pd.concat([kept] + ([rows[row_partitions == p]] if new else []), ignore_index=True)
+            total += len(merged)
+            if merged.empty:
+                shutil.rmtree(directory, ignore_errors=True)
+                continue
+            _write_partition(f"{directory}.tmp", merged)
+            _swap_in(f"{directory}.tmp", directory)
+        self._write_meta(self.path, self.partitions, total)
+        return TransactionStore(self.path)
+
+_cached = {"mtime": None, "store": None}
+
+def get_transaction_store(path: Optional[str] = None) -> Optional[TransactionStore]:
+    """
+    Store at TRANSACTION_STORE_PATH, reopened when it is rebuilt or
+    refreshed. None when it hasn't been built.
+    """
+    path = path or settings.TRANSACTION_STORE_PATH
+    try:
+        mtime = os.stat(os.path.join(path, "meta.json")).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _cached["mtime"] != mtime:
+        _cached["store"], _cached["mtime"] = TransactionStore(path), mtime
+    return _cached["store"]
+
+async def _main(command: str, account: Optional[str] = None):
+    from app.db.base import engine
+
+    path = settings.TRANSACTION_STORE_PATH
+    if command == "show":
+        store = get_transaction_store(path)
+        view = store.account(account) if store else None
+        if view is None:
+            print(f"No rows for {account} in the transaction store at {path}")
+            return
+        analytics = case_analytics(view)
+        analytics["is_anomaly"] = int(analytics.pop("is_anomaly").sum())
+        print(json.dumps(analytics, indent=2, default=str))
+        return
+
+    async with engine.connect() as conn:
+        current = get_transaction_store(path) if command == "refresh" else None
+        if current is not None:
+            store = await current.refresh(conn)
+        else:
+            store = await TransactionStore.build(conn, path)
+    await engine.dispose()
+    print(f"Transaction store at {path}: {store.rows:,} rows")
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command not in ("build", "refresh", "show") or (command == "show" and len(sys.argv) < 3):
+        print("Usage: python -m app.services.transaction_store [build|refresh|show <account>]")
+        sys.exit(1)
+    asyncio.run(_main(command, sys.argv[2] if command == "show" else None))
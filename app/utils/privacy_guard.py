@@ -1,61 +1,414 @@
 import re
 import logging
+from bisect import bisect_right
+from functools import cached_property, lru_cache
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from app.schemas.requests import GenerateRequest
 
 logger = logging.getLogger(__name__)
 
+_WHITESPACE = re.compile(r"\s+")
+# Whitespace that normalize() changes: runs, tabs, newlines, ...
+_IRREGULAR_WHITESPACE = re.compile(r"\s{2,}|[^\S ]")
+
+# Descriptions shorter than this are generic labels ("Salary", "Rent")
+MIN_DESCRIPTION_LENGTH = 12
+
+# A value must not start or end inside a token: "Ali" is not in "legality",
+# "ACC-1234" is not in "ACC-12345". Edges that are not word characters
+# (e.g. "@" or ".") need no boundary.
+_TOKEN_START = r"(?:(?<!\w)(?=\w)|(?!\w))"
+_TOKEN_END = r"(?:(?<=\w)(?!\w)|(?<!\w))"
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """
+    Regex alternation of `words` shaped as a prefix trie, so matching at a
+    position walks one path instead of trying every word in turn. Longer
+    words win over their prefixes.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def render(node: dict) -> str:
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) > 1:
+            body = "(?:" + "|".join(branches) + ")"
+            return body + "?" if "" in node else body
+        return f"(?:{branches[0]})?" if "" in node else branches[0]
+
+    return render(trie)
+
+def _is_word(ch: str) -> bool:
+    # Same test as \w for str patterns
+    return ch.isalnum() or ch == "_"
+
+class TokenPattern:
+    """
+    A trie_pattern that only matches whole tokens. The scan runs the bare
+    trie, which keeps the regex engine's literal-prefix search; the rare
+    candidates that start or end inside a token are re-matched with the
+    anchored pattern (a shorter value may still fit) or skipped.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self._trie = trie_pattern(words)
+        self._scan = re.compile(self._trie)
+
+    @cached_property
+    def _anchored(self):
+        return re.compile(f"{_TOKEN_START}(?:{self._trie}){_TOKEN_END}")
+
+    def finditer(self, text: str) -> Iterator[re.Match]:
+        pos = 0
+        while True:
+            m = self._scan.search(text, pos)
+            if m is None:
+                return
+            start, end = m.span()
+            if not (start > 0 and _is_word(text[start - 1]) and _is_word(text[start])):
+                if end < len(text) and _is_word(text[end - 1]) and _is_word(text[end]):
+                    m = self._anchored.match(text, start)
+                if m is not None:
+                    yield m
+                    pos = m.end()
+                    continue
+            # Another value may still start inside the rejected candidate
+            pos = start + 1
+
 class NarrativeStitcher:
     """
     Handles re-injection of PII into AI-generated SAR narratives
     using standardized placeholders.
     """
     
+    # Placeholder -> (pii_data key, value used when it is missing)
     PLACEHOLDERS = {
-        "CUSTOMER_NAME": r"\{\{CUSTOMER_NAME\}\}",
-        "ACCOUNT_NUMBER": r"\{\{ACCOUNT_NUMBER\}\}",
-        "CUSTOMER_ID": r"\{\{CUSTOMER_ID\}\}",
-        "COUNTRY": r"\{\{COUNTRY\}\}",
-        "CASE_ID": r"\{\{CASE_ID\}\}"
+        "CUSTOMER_NAME": ("name", "[NAME MISSING]"),
+        "ACCOUNT_NUMBER": ("account", "[ACCOUNT MISSING]"),
+        "CUSTOMER_ID": ("customer_id", "[ID MISSING]"),
+        "COUNTRY": ("country", "[COUNTRY MISSING]"),
+        "CASE_ID": ("case_id", "[CASE_ID MISSING]")
     }
 
-    @staticmethod
-    def stitch(narrative: str, pii_data: dict) -> str:
+    # {{KEY}} or, as a fallback, {KEY}; the double-brace form wins where both match
+    _KEYS = "|".join(PLACEHOLDERS)
+    PATTERN = re.compile(rf"\{{\{{({_KEYS})\}}\}}|\{{({_KEYS})\}}")
+
+    @classmethod
+    def stitch(cls, narrative: str, pii_data: dict) -> str:
         """
         Replaces placeholders in the narrative with actual PII values.
         Supports both {{PLACEHOLDER}} and {PLACEHOLDER} for robustness.
+        One regex pass, so injected values are never re-scanned.
         """
-        stitched = narrative
-        
         mapping = {
-            "CUSTOMER_NAME": pii_data.get("name", "[NAME MISSING]"),
-            "ACCOUNT_NUMBER": pii_data.get("account", "[ACCOUNT MISSING]"),
-            "CUSTOMER_ID": pii_data.get("customer_id", "[ID MISSING]"),
-            "COUNTRY": pii_data.get("country", "[COUNTRY MISSING]"),
-            "CASE_ID": pii_data.get("case_id", "[CASE_ID MISSING]")
+            key: str(pii_data.get(field, missing))
+            for key, (field, missing) in cls.PLACEHOLDERS.items()
         }
-        
-        for key, value in mapping.items():
-            # Replace double braces
-            stitched = stitched.replace(f"{{{{{key}}}}}", str(value))
-            # Replace single braces (fallback)
-            stitched = stitched.replace(f"{{{key}}}", str(value))
-            
-        return stitched
+        return cls.PATTERN.sub(lambda m: mapping[m.group(1) or m.group(2)], narrative)
+
+class StreamingStitcher:
+    """
+    Incremental NarrativeStitcher for token streams.
+    Holds back any tail that could still grow into a placeholder, so a
+    placeholder split across chunk boundaries is stitched exactly once.
+    """
+
+    _VARIANTS = [f"{{{{{key}}}}}" for key in NarrativeStitcher.PLACEHOLDERS] + \
+                [f"{{{key}}}" for key in NarrativeStitcher.PLACEHOLDERS]
+    _MAX_LEN = max(len(v) for v in _VARIANTS)
+
+    def __init__(self, pii_data: dict):
+        self.pii_data = pii_data
+        self._pending = ""
+
+    def _holdback_start(self, text: str) -> int:
+        """
+        Index of the earliest '{' whose suffix is an incomplete placeholder.
+        """
+        start = max(0, len(text) - self._MAX_LEN)
+        idx = text.find("{", start)
+        while idx != -1:
+            tail = text[idx:]
+            if any(v.startswith(tail) and v != tail for v in self._VARIANTS):
+                return idx
+            idx = text.find("{", idx + 1)
+        return len(text)
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add a raw chunk; returns the stitched text that is safe to emit now.
+        """
+        text = self._pending + chunk
+        cut = self._holdback_start(text)
+        self._pending = text[cut:]
+        return NarrativeStitcher.stitch(text[:cut], self.pii_data)
+
+    def flush(self) -> str:
+        """
+        Emit whatever is still held back at the end of the stream.
+        """
+        text, self._pending = self._pending, ""
+        return NarrativeStitcher.stitch(text, self.pii_data)
+
+class LeakScanner:
+    """
+    Finds any of many sensitive values in a text with one regex pass over
+    its case-folded copy, as whole tokens only. The values are compiled once into a prefix-trie
+    pattern, so scanning stays linear in the text length (times the
+    longest value) however many values there are.
+    """
+
+    def __init__(self, sensitive_values: Iterable):
+        self.values = {}
+        for val in sensitive_values:
+            if val is not None and str(val):
+                self.values.setdefault(str(val).casefold(), str(val))
+        self.pattern = TokenPattern(self.values) if self.values else None
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        (start, end, value) for every non-overlapping match, longest value
+        first at each position. Offsets index the case-folded text, which
+        matches the original unless folding changed its length (e.g. "ß").
+        """
+        if self.pattern is None:
+            return []
+        return [(m.start(), m.end(), self.values[m.group()]) for m in self.pattern.finditer(text.casefold())]
+
+@lru_cache(maxsize=64)
+def _scanner(sensitive_values: Tuple[str, ...]) -> LeakScanner:
+    return LeakScanner(sensitive_values)
+
+def normalize(text: str) -> str:
+    """
+    Case-folded, with whitespace runs collapsed to one space and trimmed.
+    """
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+class RedactionIndex:
+    """
+    Every PII value of one request, compiled once into two prefix-trie
+    patterns: exact (verbatim) and fuzzy (case/whitespace-normalized).
+    Matching and masking are a single pass over the narrative however many
+    values are protected, so one index serves every check of the request.
+    """
+
+    def __init__(self, replacements: Dict[str, str]):
+        # Protected value -> text it is masked with
+        self.replacements = {value: label for value, label in replacements.items() if value.strip()}
+        self._by_normal = {}
+        for value in self.replacements:
+            self._by_normal.setdefault(normalize(value), value)
+
+    @staticmethod
+    def _is_account_id(value: str) -> bool:
+        # Skip pseudo-accounts that are plain words ("CASH", "EXTERNAL")
+        return len(value) >= 4 and not value.isalpha()
+
+    @classmethod
+    def from_request(cls, request: GenerateRequest) -> "RedactionIndex":
+        customer = request.customer
+        replacements = {}
+        for tx in request.transactions:
+            for account in (tx.sender_account, tx.receiver_account):
+                if cls._is_account_id(account):
+                    replacements.setdefault(account, "[REDACTED ACCOUNT]")
+            if tx.description and len(tx.description.strip()) >= MIN_DESCRIPTION_LENGTH:
+                replacements.setdefault(tx.description, "[REDACTED]")
+        # Name and id map back to the placeholders NarrativeStitcher fills in;
+        # {{ACCOUNT_NUMBER}} is stitched with a mock, so the account is redacted
+        replacements.update({
+            customer.account_number: "[REDACTED ACCOUNT]",
+            customer.customer_id: "{{CUSTOMER_ID}}",
+            customer.name: "{{CUSTOMER_NAME}}",
+        })
+        if customer.email:
+            replacements[customer.email] = "[REDACTED EMAIL]"
+        return cls(replacements)
+
+    def __len__(self) -> int:
+        return len(self.replacements)
+
+    @cached_property
+    def _exact(self):
+        return TokenPattern(self.replacements) if self.replacements else None
+
+    @cached_property
+    def _fuzzy(self):
+        return TokenPattern(self._by_normal) if self._by_normal else None
+
+    @staticmethod
+    def _normalize_with_offsets(text: str):
+        """
+        normalize()d text (without trimming) plus a mapping back to `text`:
+        sorted segment starts in the normalized text, and per segment its
+        (start, end) in `text` and whether offsets inside map one-to-one.
+        """
+        folded = text.casefold()
+        if len(folded) == len(text) and not _IRREGULAR_WHITESPACE.search(text):
+            return folded, None
+        norm_starts, spans, parts = [], [], []
+        length = 0
+
+        def add(start: int, end: int, piece: str):
+            nonlocal length
+            if start == end:
+                return
+            norm_starts.append(length)
+            spans.append((start, end, len(piece) == end - start))
+            parts.append(piece)
+            length += len(piece)
+
+        def add_text(start: int, end: int):
+            # Regular text folds in one piece unless folding changes its length;
+            # then word by word, so only that word maps back coarsely
+            piece = text[start:end].casefold()
+            if len(piece) == end - start:
+                return add(start, end, piece)
+            pos = start
+            for m in re.finditer(" ", text[start:end]):
+                add(pos, start + m.start(), text[pos:start + m.start()].casefold())
+                add(start + m.start(), start + m.end(), " ")
+                pos = start + m.end()
+            add(pos, end, text[pos:end].casefold())
+
+        pos = 0
+        for m in _IRREGULAR_WHITESPACE.finditer(text):
+            if pos < m.start():
+                add_text(pos, m.start())
+            add(m.start(), m.end(), " ")
+            pos = m.end()
+        if pos < len(text):
+            add_text(pos, len(text))
+        return "".join(parts), (norm_starts, spans)
+
+    @staticmethod
+    def _to_original(mapping, offset: int, end: bool) -> int:
+        norm_starts, spans = mapping
+        k = bisect_right(norm_starts, offset - 1 if end else offset) - 1
+        start, stop, exact = spans[k]
+        if exact:
+            return start + offset - norm_starts[k]
+        return stop if end else start
+
+    def find(self, text: str, fuzzy: bool = True) -> List[Tuple[int, int, str]]:
+        """
+        (start, end, protected value) of every non-overlapping match in
+        `text`, longest value first at each position, never inside a
+        longer token. Exact matching is
+        verbatim; fuzzy ignores case and differences in whitespace.
+        """
+        if not fuzzy:
+            if self._exact is None:
+                return []
+            return [(m.start(), m.end(), m.group()) for m in self._exact.finditer(text)]
+        if self._fuzzy is None:
+            return []
+        normalized, mapping = self._normalize_with_offsets(text)
+        matches = []
+        for m in self._fuzzy.finditer(normalized):
+            start, end = m.span()
+            if mapping is not None:
+                start, end = self._to_original(mapping, start, False), self._to_original(mapping, end, True)
+            matches.append((start, end, self._by_normal[m.group()]))
+        return matches
+
+    @cached_property
+    def max_length(self) -> int:
+        """Length of the longest protected value, normalized."""
+        return max((len(value) for value in self._by_normal), default=0)
+
+    def _replace(self, text: str, matches: List[Tuple[int, int, str]]) -> str:
+        parts, pos = [], 0
+        for start, end, value in matches:
+            parts.append(text[pos:start])
+            parts.append(self.replacements[value])
+            pos = end
+        parts.append(text[pos:])
+        return "".join(parts)
+
+    def mask(self, text: str, fuzzy: bool = True) -> str:
+        """
+        `text` with every match replaced by its value's replacement.
+        """
+        return self._replace(text, self.find(text, fuzzy))
+
+class StreamingMasker:
+    """
+    Incremental RedactionIndex.mask (fuzzy) for token streams. Only the
+    tail a protected value could still match into is held back: the last
+    max_length + 1 normalized characters (the extra one decides the token
+    boundary), widened to any match crossing it and to the start of the
+    token it falls in. Everything before is final, so the masked stream
+    equals masking the whole text.
+    """
+
+    def __init__(self, index: RedactionIndex):
+        self.index = index
+        self._pending = ""
+
+    def _cut(self, text: str, matches: List[Tuple[int, int, str]]) -> int:
+        normalized, mapping = RedactionIndex._normalize_with_offsets(text)
+        keep = len(normalized) - self.index.max_length - 1
+        if keep <= 0:
+            return 0
+        cut = keep if mapping is None else RedactionIndex._to_original(mapping, keep, False)
+        moved = True
+        while moved:
+            moved = False
+            for start, end, _ in matches:
+                if start < cut < end:
+                    cut, moved = start, True
+            while cut > 0 and _is_word(text[cut - 1]) and _is_word(text[cut]):
+                cut, moved = cut - 1, True
+        return cut
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add a raw chunk; returns the masked text that is safe to emit now.
+        """
+        text = self._pending + chunk
+        matches = self.index.find(text)
+        cut = self._cut(text, matches)
+        self._pending = text[cut:]
+        return self.index._replace(text[:cut], [m for m in matches if m[1] <= cut])
+
+    def flush(self) -> str:
+        """
+        Mask and emit whatever is still held back at the end of the stream.
+        """
+        text, self._pending = self._pending, ""
+        return self.index.mask(text)
 
 class PrivacyGuard:
     """
     Validates AI output for potential PII leakage or formatting errors.
     """
-    
+
+    @staticmethod
+    def find_leaks(text: str, sensitive_values: list) -> List[Tuple[int, int, str]]:
+        """
+        Positions of every sensitive value found in the text (case-insensitive).
+        """
+        return _scanner(tuple(str(val) for val in sensitive_values if val)).find(text)
+
     @staticmethod
     def check_leakage(text: str, sensitive_values: list) -> bool:
         """
         Returns True if any sensitive value is found in the text.
         """
-        for val in sensitive_values:
-            if val and str(val).lower() in text.lower():
-                logger.warning(f"PII Leakage Detected: Value '{val}' found in AI output.")
-                return True
-        return False
+        leaks = PrivacyGuard.find_leaks(text, sensitive_values)
+        for val in dict.fromkeys(val for _, _, val in leaks):
+            logger.warning(f"PII Leakage Detected: Value '{val}' found in AI output.")
+        return bool(leaks)
 
     @staticmethod
     def validate_placeholders(text: str) -> bool:
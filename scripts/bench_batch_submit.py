@@ -0,0 +1,70 @@
+"""
+Benchmark: latency of POST /batch/generate for large batches.
+
+Compares the old submission path (one generate_sar_task.delay per request,
+each serialized and published from the event loop) with the current
+submit_batch, which queues a single dispatch message and returns. Queued
+messages are deleted after each run, so no worker needs to be running,
+but the broker and Redis must be reachable.
+
+Usage: python scripts/bench_batch_submit.py [sizes...]   (default: 1000 10000)
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.api.endpoints.batch import submit_batch
+from app.core.celery_app import celery_app
+from app.core.redis_client import async_redis
+from app.schemas.requests import BatchRequest, GenerateRequest
+from workers.tasks import generate_sar_task
+
+def build_batch(size: int) -> BatchRequest:
+    with open("data/sample_request.json") as f:
+        sample = GenerateRequest(**json.load(f))
+    return BatchRequest(requests=[sample] * size, priority="LOW")
+
+async def legacy_submit(request: BatchRequest):
+    job_ids = []
+    for req in request.requests:
+        job_ids.append(generate_sar_task.delay(req.model_dump_json()).id)
+    batch_id = str(uuid.uuid4())
+    client = async_redis.client
+    await client.set(f"batch:{batch_id}:total", len(job_ids), ex=86400)
+    await client.rpush(f"batch:{batch_id}:jobs", *job_ids)
+    await client.expire(f"batch:{batch_id}:jobs", 86400)
+    return batch_id
+
+def purge_broker():
+    with celery_app.connection_for_write() as conn:
+        for queue in ("celery", "sar_high", "sar_low"):
+            conn.default_channel.queue_purge(queue)
+
+async def timed(label: str, size: int, submit, request: BatchRequest):
+    start = time.perf_counter()
+    await submit(request)
+    elapsed = (time.perf_counter() - start) * 1000
+    purge_broker()
+    print(f"{label:<26} {size:>6} jobs: {elapsed:9.1f} ms  ({elapsed / size * 1000:7.1f} µs/job)")
+    return elapsed
+
+async def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000]
+    purge_broker()
+    try:
+        for size in sizes:
+            request = build_batch(size)
+            legacy = await timed("per-item delay()", size, legacy_submit, request)
+            current = await timed("single dispatch message", size, submit_batch, request)
+            print(f"✅ {size} jobs: {legacy / current:.1f}x faster to return a batch handle")
+    finally:
+        await async_redis.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
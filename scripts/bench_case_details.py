@@ -0,0 +1,100 @@
+"""
+Benchmark: case details for a heavy account, ORM rows vs the columnar store.
+
+Loads `rows` transactions for one account (plus light background traffic)
+into a scratch SQLite database through the ingestion service, builds the
+transaction store, then calls get_case_details both ways and reports the
+time and the peak Python memory (tracemalloc) of each. The two responses
+are checked to be identical.
+
+Usage: python scripts/bench_case_details.py [rows] [page]   (default: 200000 100)
+"""
+import asyncio
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import orjson
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+DB_PATH = "/tmp/bench_case_details.db"
+STORE_PATH = "/tmp/bench_case_details_store"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+os.environ["TRANSACTION_STORE_PATH"] = STORE_PATH
+
+from app.api.endpoints.cases import get_case_details
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal, Base, engine
+from app.services.ingestion import ingestion_service
+from app.services.transaction_store import TransactionStore
+
+ACCOUNT = "IN-HEAVY-001"
+
+def make_batches(rows: int, batch_size: int = 50_000):
+    rng = np.random.default_rng(11)
+    start = pd.Timestamp("2024-01-01")
+    for offset in range(0, rows, batch_size):
+        n = min(batch_size, rows - offset)
+        incoming = rng.random(n) < 0.5
+        counterparties = np.array([f"CP-{i:05d}" for i in rng.integers(0, 20_000, n)], dtype=object)
+        yield pd.DataFrame({
+            "transaction_id": [f"H-{offset + i}" for i in range(n)],
+            "amount": np.round(rng.lognormal(9, 1.2, n), 2),
+            "currency": "INR",
+            "timestamp": start + pd.to_timedelta(rng.integers(0, 365 * 86400, n), unit="s"),
+            "sender_account": np.where(incoming, counterparties, ACCOUNT),
+            "receiver_account": np.where(incoming, ACCOUNT, counterparties),
+            "description": np.where(rng.random(n) < 0.02, "SALARY CREDIT", "Payment"),
+            "transaction_type": "NEFT",
+        })
+
+async def batches(rows: int):
+    for batch in make_batches(rows):
+        yield batch
+
+async def measure(label: str, page):
+    async with AsyncSessionLocal() as db:
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = await get_case_details(ACCOUNT, tx_offset=0, tx_limit=page, start=None, end=None, db=db)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    body = orjson.loads(response.body)
+    print(f"{label:<22} {len(body['transactions']):>7} txns | {elapsed * 1000:8.1f} ms | "
+          f"peak {peak / 2**20:7.1f} MB", flush=True)
+    return body
+
+async def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    page = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    print(f"🚀 loading {rows:,} transactions for {ACCOUNT}")
+    await ingestion_service.ingest(batches(rows), job_id="bench-case-details")
+    async with engine.connect() as conn:
+        await TransactionStore.build(conn, STORE_PATH)
+
+    for limit in (None, page):
+        suffix = "all" if limit is None else f"page of {limit}"
+        settings.TRANSACTION_STORE_ENABLED = False
+        orm = await measure(f"ORM ({suffix})", limit)
+        settings.TRANSACTION_STORE_ENABLED = True
+        columnar = await measure(f"store ({suffix})", limit)
+        assert orm == columnar, "store and ORM responses differ"
+    print("✅ responses identical")
+
+    await engine.dispose()
+    os.remove(DB_PATH)
+    shutil.rmtree(STORE_PATH)
+
+if __name__ == "__main__":
+    asyncio.run(main())
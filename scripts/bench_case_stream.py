@@ -0,0 +1,150 @@
+"""
+Benchmark: serving a large account's transactions, buffered vs streamed.
+
+Loads `rows` transactions for one account into a scratch SQLite database,
+builds the transaction store, then times each mode in its own process so
+the peak RSS (VmHWM; ru_maxrss would carry over the loader's peak across
+exec) is that mode's alone:
+
+  legacy        pre-orjson path: ORM __dict__ copies, jsonable_encoder, json
+  details       GET /cases/{account} (orjson, whole payload buffered)
+  stream        GET /cases/{account}/transactions (NDJSON chunks)
+  details-store / stream-store   the same with TRANSACTION_STORE_ENABLED
+
+Requests go straight to the ASGI app; streamed chunks are counted and
+dropped as a client would. Reports p50/p99 latency over `runs` requests.
+
+Usage: python scripts/bench_case_stream.py [rows] [runs]   (default: 200000 20)
+"""
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+DB_PATH = "/tmp/bench_case_stream.db"
+STORE_PATH = "/tmp/bench_case_stream_store"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+os.environ["TRANSACTION_STORE_PATH"] = STORE_PATH
+
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal, Base, engine
+
+# Same account as make_batches in bench_case_details
+ACCOUNT = "IN-HEAVY-001"
+MODES = ("legacy", "details", "stream", "details-store", "stream-store")
+
+async def load(rows: int):
+    from app.services.ingestion import ingestion_service
+    from app.services.transaction_store import TransactionStore
+    from scripts.bench_case_details import make_batches
+
+    async def batches():
+        for batch in make_batches(rows):
+            yield batch
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    await ingestion_service.ingest(batches(), job_id="bench-case-stream")
+    async with engine.connect() as conn:
+        await TransactionStore.build(conn, STORE_PATH)
+
+async def legacy_request() -> int:
+    # The response path before orjson: copied __dict__s through FastAPI's default encoder
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from app.models.sql import CaseSummary
+    from app.services.case_queries import account_transactions_query
+
+    async with AsyncSessionLocal() as db:
+        summary = await db.get(CaseSummary, ACCOUNT)
+        avg_amt = summary.total_amount / summary.tx_count
+        transactions = []
+        for t in (await db.execute(account_transactions_query(ACCOUNT))).scalars().all():
+            d = t.__dict__.copy()
+            d.pop('_sa_instance_state', None)
+            d['is_anomaly'] = t.amount > 100000 or t.amount > avg_amt * 2
+            transactions.append(d)
+        return len(JSONResponse(jsonable_encoder({"transactions": transactions})).body)
+
+async def asgi_request(path: str) -> int:
+    from app.main import app
+
+    received = 0
+    requested = asyncio.Event()
+    async def receive():
+        # The request body once, then no disconnect until the response is done
+        if requested.is_set():
+            await asyncio.Event().wait()
+        requested.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        nonlocal received
+        if message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"x-api-key", settings.API_KEY.encode()), (b"host", b"bench")],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    await app(scope, receive, send)
+    return received
+
+def peak_rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+
+async def run_mode(mode: str, runs: int):
+    settings.TRANSACTION_STORE_ENABLED = mode.endswith("-store")
+    if mode == "legacy":
+        request = legacy_request
+    elif mode.startswith("stream"):
+        request = lambda: asgi_request(f"/api/v1/cases/{ACCOUNT}/transactions")
+    else:
+        request = lambda: asgi_request(f"/api/v1/cases/{ACCOUNT}")
+
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        size = await request()
+        latencies.append(time.perf_counter() - start)
+    await engine.dispose()
+    latencies.sort()
+    print(json.dumps({
+        "mode": mode,
+        "bytes": size,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "peak_rss_mb": peak_rss_kb() / 1024,
+    }), flush=True)
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    print(f"🚀 loading {rows:,} transactions for {ACCOUNT}")
+    asyncio.run(load(rows))
+
+    print(f"{'mode':<14} {'MB sent':>8} {'p50 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12}")
+    for mode in MODES:
+        out = subprocess.run([sys.executable, __file__, "--run", mode, str(runs)],
+                             capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:<14} {result['bytes'] / 2**20:8.1f} {result['p50_ms']:9.1f} {result['p99_ms']:9.1f} "
+              f"{result['peak_rss_mb']:12.1f}", flush=True)
+
+    os.remove(DB_PATH)
+    shutil.rmtree(STORE_PATH)
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        asyncio.run(run_mode(sys.argv[2], int(sys.argv[3])))
+    else:
+        main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: peak memory of reading a month of transactions through a connector.
+
+Writes a synthetic core-banking CSV (one month, `rows` transactions) and
+totals its amounts twice, each in a fresh process so peak RSS is
+comparable: once with CSVConnector.fetch_data (whole DataFrame) and once
+with CSVConnector.stream_batches (one batch at a time).
+
+Usage: python scripts/bench_connector_memory.py [rows] [batch_size]   (default: 2000000 50000)
+"""
+import asyncio
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+CSV_PATH = "/tmp/bench_connector_month.csv"
+
+def write_month(path: str, rows: int):
+    rng = random.Random(7)
+    start = datetime(2024, 1, 1)
+    with open(path, "w") as f:
+        f.write("transaction_id,amount,currency,timestamp,sender_account,receiver_account,description,transaction_type\n")
+        for i in range(rows):
+            ts = start + timedelta(seconds=rng.randrange(31 * 86400))
+            f.write(f"TXN-{i},{rng.uniform(10, 50000):.2f},INR,{ts.isoformat()}Z,"
+                    f"ACC-{rng.randrange(100000):06d},ACC-{rng.randrange(100000):06d},"
+                    f"Payment {i % 97},{rng.choice(['NEFT', 'RTGS', 'UPI', 'IMPS'])}\n")
+
+async def run(mode: str, batch_size: int):
+    from app.connectors.csv import CSVConnector
+    connector = CSVConnector({"file_path": CSV_PATH})
+    start = time.perf_counter()
+    total, rows = 0.0, 0
+    if mode == "fetch":
+        df = await connector.fetch_data()
+        total, rows = df["amount"].sum(), len(df)
+    else:
+        async for batch in connector.stream_batches(batch_size=batch_size):
+            total += batch["amount"].sum()
+            rows += len(batch)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:<7} {rows:>9,} rows | total {total:,.2f} | {elapsed:6.2f} s | peak RSS {peak_mb:7.1f} MB", flush=True)
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ("fetch", "stream"):
+        asyncio.run(run(sys.argv[1], int(sys.argv[2])))
+        return
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    print(f"🚀 writing {rows:,} transactions to {CSV_PATH}")
+    write_month(CSV_PATH, rows)
+    print(f"   {os.path.getsize(CSV_PATH) / 2**20:.0f} MB on disk")
+    try:
+        for mode in ("fetch", "stream"):
+            subprocess.run([sys.executable, __file__, mode, str(batch_size)], check=True)
+    finally:
+        os.remove(CSV_PATH)
+
+if __name__ == "__main__":
+    main()
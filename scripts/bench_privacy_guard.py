@@ -0,0 +1,134 @@
+"""
+Microbenchmark: placeholder stitching, PII leakage scanning and masking.
+
+The "legacy" functions reproduce the original implementations (ten
+str.replace passes; one lower() of the whole text per sensitive value)
+and serve as the reference for the outputs. Narratives are synthetic
+SAR-like prose with placeholders sprinkled in; sensitive values mimic a
+large case (counterparty names and account numbers), none of which occur
+in the text, so every scan has to cover it all. The RedactionIndex runs
+are built from a synthetic request with that many transactions and time
+fuzzy find + mask on a narrative with line breaks and double spaces.
+
+Usage: python scripts/bench_privacy_guard.py [narrative_kb...]   (default: 10 200)
+"""
+import os
+import random
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from datetime import datetime
+
+from app.schemas.models import Customer, Transaction
+from app.schemas.requests import GenerateRequest
+from app.utils.privacy_guard import LeakScanner, NarrativeStitcher, PrivacyGuard, RedactionIndex
+
+PII = {"name": "Wayne Enterprises Ltd", "account": "ACC-9928-1123", "customer_id": "CUST-88392",
+       "country": "India", "case_id": "CASE-1A2B3C"}
+WORDS = ("the subject account received multiple transfers from unrelated counterparties "
+         "which were moved onward within hours to offshore beneficiaries").split()
+PLACEHOLDER_TEXT = ["{{CUSTOMER_NAME}}", "{{ACCOUNT_NUMBER}}", "{CUSTOMER_ID}", "{{COUNTRY}}", "{{CASE_ID}}"]
+
+def legacy_stitch(narrative: str, pii_data: dict) -> str:
+    stitched = narrative
+    mapping = {
+        "CUSTOMER_NAME": pii_data.get("name", "[NAME MISSING]"),
+        "ACCOUNT_NUMBER": pii_data.get("account", "[ACCOUNT MISSING]"),
+        "CUSTOMER_ID": pii_data.get("customer_id", "[ID MISSING]"),
+        "COUNTRY": pii_data.get("country", "[COUNTRY MISSING]"),
+        "CASE_ID": pii_data.get("case_id", "[CASE_ID MISSING]")
+    }
+    for key, value in mapping.items():
+        stitched = stitched.replace(f"{{{{{key}}}}}", str(value))
+        stitched = stitched.replace(f"{{{key}}}", str(value))
+    return stitched
+
+def legacy_check_leakage(text: str, sensitive_values: list) -> bool:
+    for val in sensitive_values:
+        if val and str(val).lower() in text.lower():
+            return True
+    return False
+
+def narrative(kb: int, rng: random.Random) -> str:
+    parts, size = [], 0
+    while size < kb * 1024:
+        word = rng.choice(PLACEHOLDER_TEXT) if rng.random() < 0.02 else rng.choice(WORDS)
+        parts.append(word)
+        size += len(word) + 1
+    return " ".join(parts)
+
+def sensitive_values(n: int, rng: random.Random) -> list:
+    values = []
+    for i in range(n):
+        if i % 2:
+            values.append(f"ACC-{rng.randrange(10**4):04d}-{rng.randrange(10**4):04d}")
+        else:
+            values.append(f"Counterparty {rng.choice(['Holdings', 'Traders', 'Exports'])} {i} Pvt Ltd")
+    return values
+
+def synthetic_request(n: int, rng: random.Random) -> GenerateRequest:
+    customer = Customer(customer_id=PII["customer_id"], name=PII["name"], email="finance@wayne.com",
+                        account_number=PII["account"])
+    values = sensitive_values(2 * n, rng)
+    transactions = [
+        Transaction.model_construct(
+            transaction_id=f"TXN-{i}", amount=1000.0, currency="USD", timestamp=datetime(2024, 1, 1),
+            sender_account=PII["account"], receiver_account=values[2 * i + 1],
+            description=f"Invoice {values[2 * i]}", transaction_type="WIRE",
+        )
+        for i in range(n)
+    ]
+    return GenerateRequest.model_construct(customer=customer, transactions=transactions, alerts=[])
+
+def timed(fn, repeat: int = 3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 200]
+    rng = random.Random(7)
+    for kb in sizes:
+        text = narrative(kb, rng)
+        legacy, legacy_ms = timed(lambda: legacy_stitch(text, PII))
+        current, current_ms = timed(lambda: NarrativeStitcher.stitch(text, PII))
+        mark = "✅" if legacy == current else "❌ MISMATCH"
+        print(f"🚀 stitch {kb:>4} KB | legacy {legacy_ms:8.2f} ms | single pass {current_ms:8.2f} ms "
+              f"({legacy_ms / current_ms:5.1f}x) {mark}")
+
+        for n in (10, 1000, 10000):
+            values = sensitive_values(n, rng)
+            leaked, legacy_ms = timed(lambda: legacy_check_leakage(text, values), repeat=1 if n * kb > 10**5 else 3)
+            _, build_ms = timed(lambda: LeakScanner(values))
+            scanner = LeakScanner(values)
+            found, scan_ms = timed(lambda: scanner.find(text))
+            mark = "✅" if leaked == bool(found) else "❌ MISMATCH"
+            print(f"🚀 leaks  {kb:>4} KB x {n:>5} values | legacy {legacy_ms:9.1f} ms | "
+                  f"compile {build_ms:7.1f} ms + scan {scan_ms:7.1f} ms ({legacy_ms / (build_ms + scan_ms):6.1f}x) {mark}")
+
+        # A leak near the end, found with its position
+        values = sensitive_values(1000, rng)
+        leaky = text + " " + values[-1].upper()
+        positions = PrivacyGuard.find_leaks(leaky, values)
+        assert positions and positions[-1][2] == values[-1], positions
+        print(f"✅ leak at offset {positions[-1][0]} of {len(leaky)} found")
+
+        messy = text.replace(" the ", "  the\n", 50) + " wayne  enterprises\nLTD"
+        for n in (10, 1000, 10000):
+            index, build_ms = timed(lambda: RedactionIndex.from_request(synthetic_request(n, random.Random(n))), repeat=1)
+            _, compile_ms = timed(lambda: index._fuzzy, repeat=1)
+            leaks, find_ms = timed(lambda: index.find(messy))
+            masked, mask_ms = timed(lambda: index.mask(messy))
+            ok = [value for _, _, value in leaks] == [PII["name"]] and masked.endswith("{{CUSTOMER_NAME}}")
+            print(f"🚀 index  {kb:>4} KB x {len(index):>5} values | build {build_ms:7.1f} ms + compile {compile_ms:7.1f} ms"
+                  f" | find {find_ms:6.1f} ms | mask {mask_ms:6.1f} ms {'✅' if ok else '❌ MISMATCH'}")
+
+if __name__ == "__main__":
+    main()
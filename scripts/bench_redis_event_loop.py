@@ -0,0 +1,107 @@
+"""
+Load test: event-loop latency while the API talks to Redis.
+
+Drives an in-process ASGI app with concurrent requests that do what the
+batch endpoints do on every call: the rate-limit counter plus a batch
+status read. The "sync" mode reproduces the old handlers (blocking
+redis.Redis calls, INCR then EXPIRE); the "async" mode uses the shared
+async pool with the pipelined RateLimiter. A ticker coroutine measures how
+late the loop wakes it up, which is the delay every other request sees.
+
+Requires a running Redis (settings.REDIS_HOST/REDIS_PORT).
+Usage: python scripts/bench_redis_event_loop.py [requests] [concurrency]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import httpx
+from fastapi import FastAPI
+
+from app.core.redis_client import redis_client, async_redis
+from app.core.security import RateLimiter
+from app.services.batch_progress import batch_progress, batch_key
+
+BATCH_ID = "bench-redis-event-loop"
+API_KEY = "bench-key"
+TICK_SECONDS = 0.001
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    limiter = RateLimiter(times=10**9, seconds=60)
+
+    @app.get("/sync")
+    async def sync_handler():
+        key = f"rate_limit:{API_KEY}:sync"
+        current = redis_client.incr(key)
+        if current == 1:
+            redis_client.expire(key, 60)
+        return {"total": redis_client.hget(batch_key(BATCH_ID), "total")}
+
+    @app.get("/async")
+    async def async_handler():
+        await limiter(API_KEY)
+        return await batch_progress.get(BATCH_ID)
+
+    return app
+
+async def monitor_loop(samples: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        samples.append((time.perf_counter() - start - TICK_SECONDS) * 1000)
+
+async def run_mode(app: FastAPI, path: str, n: int, concurrency: int) -> dict:
+    lag, latencies = [], []
+    stop = asyncio.Event()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        monitor = asyncio.create_task(monitor_loop(lag, stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await monitor
+
+    return {"lag": sorted(lag), "latency": sorted(latencies), "rps": n / elapsed}
+
+def pct(samples: list, q: float) -> float:
+    return samples[min(int(len(samples) * q), len(samples) - 1)] if samples else 0.0
+
+def report(label: str, result: dict):
+    lag, latency = result["lag"], result["latency"]
+    print(
+        f"{label:<6} {result['rps']:8.0f} req/s | request p50={pct(latency, 0.5):6.2f} p99={pct(latency, 0.99):6.2f} ms"
+        f" | loop lag mean={statistics.mean(lag) if lag else 0:6.2f} p99={pct(lag, 0.99):6.2f} max={lag[-1] if lag else 0:6.2f} ms"
+    )
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    print(f"🚀 {n} requests per mode, {concurrency} concurrent")
+
+    await batch_progress.create(BATCH_ID, ["job"])
+    app = build_app()
+    try:
+        report("sync", await run_mode(app, "/sync", n, concurrency))
+        report("async", await run_mode(app, "/async", n, concurrency))
+    finally:
+        await async_redis.client.delete(batch_key(BATCH_ID), f"{batch_key(BATCH_ID)}:jobs",
+                                        f"rate_limit:{API_KEY}", f"rate_limit:{API_KEY}:sync")
+        await async_redis.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+Benchmark: per-task overhead of asyncio.run() vs the persistent worker loop.
+
+Each simulated task does what generate_sar_task does around the LLM call:
+one HTTP round trip (against a local stub instead of Ollama) and one DB
+query. The "asyncio.run" mode reproduces the old worker behaviour: a fresh
+event loop and a fresh httpx.AsyncClient per task. The "persistent" mode
+submits the same work to WorkerEventLoop with the pooled LLM client.
+
+Usage: python scripts/bench_worker_loop.py [tasks]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import httpx
+from sqlalchemy import text
+
+from app.core.llm import llm_engine
+from app.db.base import engine
+from workers.event_loop import WorkerEventLoop
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Buffer header + body into one write; unbuffered writes trip delayed ACKs on keep-alive
+    wbufsize = -1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"response": "ok"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_stub_server() -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/api/generate"
+
+async def db_roundtrip():
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+async def legacy_task(url: str):
+    async with httpx.AsyncClient(timeout=600.0) as client:
+        response = await client.post(url, json={"prompt": "x"})
+        response.raise_for_status()
+    await db_roundtrip()
+
+async def pooled_task(url: str):
+    await llm_engine._post(url, {"prompt": "x"})
+    await db_roundtrip()
+
+def timed(fn, n: int) -> list:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def report(label: str, samples: list):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<22} mean={statistics.mean(samples):7.2f} ms  p50={statistics.median(samples):7.2f} ms  p95={p95:7.2f} ms")
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    url = start_stub_server()
+    print(f"🚀 {n} simulated tasks per mode (stub LLM at {url})")
+
+    legacy = timed(lambda: asyncio.run(legacy_task(url)), n)
+    # asyncio.run leaves pooled DB connections bound to dead loops
+    engine.sync_engine.dispose(close=False)
+
+    loop = WorkerEventLoop()
+    loop.start()
+    persistent = timed(lambda: loop.run(pooled_task(url)), n)
+    loop.stop()
+
+    report("asyncio.run per task", legacy)
+    report("persistent loop", persistent)
+    saved = statistics.mean(legacy) - statistics.mean(persistent)
+    print(f"✅ Per-task overhead saved: {saved:.2f} ms ({saved / statistics.mean(legacy) * 100:.0f}%)")
+
+if __name__ == "__main__":
+    main()
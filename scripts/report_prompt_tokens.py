@@ -0,0 +1,121 @@
+"""
+Report: size of the generation prompt, raw transaction sample vs current.
+
+For every case in the data/ datasets, builds the user prompt the way
+generate_sar used to (the repr of the first 10 anonymized transactions)
+and the way it does now (rule indicators and a statistical summary), and
+compares their token counts; the "+table" figures turn on the opt-in
+PROMPT_TRANSACTION_TABLE. The largest case is then replicated to show
+how each prompt grows with the number of transactions and how many rows
+the budget keeps.
+
+Tokens are estimated with prompt_builder.estimate_tokens (words plus
+punctuation marks), which tracks BPE tokenizers closely enough for a
+relative comparison.
+
+Usage: python scripts/report_prompt_tokens.py [datasets...]
+       (default: data/Synthetic_dataset.json data/Augmented_dataset.json)
+"""
+import json
+import os
+import statistics
+import sys
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.core.config import settings
+from app.schemas.requests import GenerateRequest
+from app.services.generation_service import generation_service
+from app.services.prompt_builder import estimate_tokens, prompt_builder
+
+def legacy_user_prompt(anon_data: dict) -> str:
+    # The old anonymized rows: date only, no direction or counterparty
+    transactions = [
+        {"amount": tx["amount"], "currency": tx["currency"], "timestamp": tx["timestamp"][:10],
+         "type": tx["type"], "desc": tx["desc"]}
+        for tx in anon_data["transactions"][:10]
+    ]
+    return f"""
+        INVESTIGATION FOR CASE {{{{CASE_ID}}}}
+
+        SUBJECT PROFILE:
+        - Name: {{{{CUSTOMER_NAME}}}}
+        - Occupation: {anon_data['customer']['occupation']}
+        - Risk Rating: {anon_data['customer']['risk_rating']}
+
+        ACTIVITY SUMMARY:
+        - Alerts: {anon_data['alerts']}
+        - Transactions: {transactions} (Sample size: {len(anon_data['transactions'])})
+
+        TASK:
+        Draft a concise the Suspicious Activity Report (SAR) narrative. Ground your reasoning
+        strictly in the triggered rules and indicators. Ensure placeholders are used accurately.
+        """
+
+def to_request(case: dict) -> GenerateRequest:
+    # Dataset records are sparser than the API schema: fill what the prompt doesn't show
+    customer = {"customer_id": "UNKNOWN", "account_number": "UNKNOWN", **case["customer"]}
+    # Transactions without accounts are treated as credits to the customer
+    transactions = [
+        {"sender_account": "EXTERNAL", "receiver_account": customer["account_number"], **tx}
+        for tx in case["transactions"]
+    ]
+    alerts = [{"timestamp": datetime(2024, 1, 1), "details": {}, **alert} for alert in case["alerts"]]
+    region = "IN" if customer.get("country") == "India" else "US"
+    return GenerateRequest(customer=customer, transactions=transactions, alerts=alerts, region=region)
+
+def prompt_tokens(request: GenerateRequest):
+    anon_data = generation_service._prepare_anonymized_data(request)
+    activity = generation_service._analyze_activity(request)
+    settings.PROMPT_TRANSACTION_TABLE = False
+    current = generation_service._build_user_prompt(request, anon_data, activity)
+    settings.PROMPT_TRANSACTION_TABLE = True
+    with_table = generation_service._build_user_prompt(request, anon_data, activity)
+    rows = sum(1 for line in with_table.splitlines() if line.count("|") == 5) - 1
+    return (estimate_tokens(legacy_user_prompt(anon_data)), estimate_tokens(current),
+            estimate_tokens(with_table), rows)
+
+def replicate(request: GenerateRequest, n: int) -> GenerateRequest:
+    # Repeat the case's transactions day by day until there are n of them
+    base = request.transactions
+    transactions = [
+        base[i % len(base)].model_copy(update={
+            "transaction_id": f"TXN-R{i}",
+            "timestamp": base[i % len(base)].timestamp + timedelta(days=i // len(base)),
+        })
+        for i in range(n)
+    ]
+    return request.model_copy(update={"transactions": transactions})
+
+def main():
+    paths = sys.argv[1:] or ["data/Synthetic_dataset.json", "data/Augmented_dataset.json"]
+    largest = None
+    for path in paths:
+        with open(path) as f:
+            cases = json.load(f)
+        legacy, current, tabled = [], [], []
+        for case in cases:
+            request = to_request(case)
+            old, new, table, _ = prompt_tokens(request)
+            legacy.append(old)
+            current.append(new)
+            tabled.append(table)
+            if largest is None or len(request.transactions) > len(largest.transactions):
+                largest = request
+        change = sum(current) / sum(legacy) - 1
+        table_change = sum(tabled) / sum(legacy) - 1
+        print(f"📊 {path}: {len(cases)} cases | legacy mean {statistics.mean(legacy):6.1f} tokens (max {max(legacy)}) "
+              f"| current mean {statistics.mean(current):6.1f} tokens (max {max(current)}) | {change:+.1%} "
+              f"| +table mean {statistics.mean(tabled):6.1f} tokens | {table_change:+.1%}")
+
+    print(f"📈 scaling the largest case ({len(largest.transactions)} transactions), "
+          f"table budget {prompt_builder.token_budget} tokens:")
+    for n in (10, 100, 1000, 10000, 100000):
+        old, new, table, rows = prompt_tokens(replicate(largest, n))
+        print(f"   {n:>6} txns | legacy {old:5} tokens, {min(n, 10):3} rows | current {new:5} tokens "
+              f"| +table {table:5} tokens, {rows:3} rows")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Account graph queries against brute-force versions over the raw rows, and
+refresh against a full build.
+
+The refresh rows are the ones a timestamp watermark misses: back-dated,
+tied with the latest timestamp, and without a timestamp.
+"""
+import asyncio
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.db.base import Base
+from app.models.sql import Transaction
+from app.services.account_graph import ARRAYS, AccountGraph, encode_transactions
+from app.services.ingestion import IngestionService
+
+ACCOUNTS = [f"IN-{i:03d}" for i in range(40)]
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = np.random.default_rng(7)
+    n = 600
+    sender = rng.choice(ACCOUNTS, n)
+    # Mostly short-range transfers, so there are cycles; some self-transfers and missing accounts
+    receiver = np.array([ACCOUNTS[(ACCOUNTS.index(s) + int(rng.integers(-3, 4))) % len(ACCOUNTS)] for s in sender],
+                        dtype=object)
+    sender = sender.astype(object)
+    sender[rng.random(n) < 0.03] = None
+    receiver[rng.random(n) < 0.03] = ""
+    return pd.DataFrame({
+        "sender_account": sender, "receiver_account": receiver,
+        "amount": rng.integers(100, 100_000, n).astype(float),
+        "timestamp": [datetime(2024, 1, 1) + timedelta(hours=int(h)) for h in rng.integers(0, 2000, n)],
+    })
+
+@pytest.fixture(scope="module")
+def graph(frame):
+    return AccountGraph.empty()._merge_encoded([encode_transactions(frame)])
+
+def edge_totals(frame):
+    totals = defaultdict(float)
+    for s, r, amount in zip(frame["sender_account"], frame["receiver_account"], frame["amount"]):
+        if s and r:
+            totals[(s, r)] += amount
+    return totals
+
+def brute_neighbourhood(totals, account, hops, direction):
+    adjacent = defaultdict(set)
+    for s, r in totals:
+        if direction in ("out", "both"):
+            adjacent[s].add(r)
+        if direction in ("in", "both"):
+            adjacent[r].add(s)
+    distances, frontier = {account: 0}, {account}
+    for hop in range(1, hops + 1):
+        frontier = {n for a in frontier for n in adjacent[a]} - distances.keys()
+        distances.update(dict.fromkeys(frontier, hop))
+    distances.pop(account)
+    return distances
+
+def brute_cycles(totals, account, max_length):
+    found = set()
+
+    def walk(path, amounts):
+        for (s, r), amount in totals.items():
+            if s != path[-1]:
+                continue
+            if r == account and len(path) > 1:
+                found.add((tuple(path + [account]), min(amounts + [amount])))
+            elif r != account and r not in path and len(path) < max_length:
+                walk(path + [r], amounts + [amount])
+
+    walk([account], [])
+    return found
+
+@pytest.mark.parametrize("direction", ["out", "in", "both"])
+def test_neighbourhood_matches_brute_force(frame, graph, direction):
+    totals = edge_totals(frame)
+    for account in ACCOUNTS[::7]:
+        for hops in (1, 2, 3):
+            assert graph.neighbourhood(account, hops, direction) == brute_neighbourhood(totals, account, hops, direction)
+
+def test_cycles_match_brute_force(frame, graph):
+    totals = edge_totals(frame)
+    for account in ACCOUNTS[::5]:
+        for max_length in (2, 3, 4):
+            cycles = graph.cycles(account, max_length, limit=100_000)
+            got = {(tuple(c["accounts"]), c["amount"]) for c in cycles}
+            assert len(got) == len(cycles)
+            assert got == brute_cycles(totals, account, max_length)
+
+def test_flow_through_matches_brute_force(frame, graph):
+    totals = edge_totals(frame)
+    for account in ACCOUNTS + ["IN-NONE"]:
+        inflow = sum(amount for (s, r), amount in totals.items() if r == account)
+        outflow = sum(amount for (s, r), amount in totals.items() if s == account)
+        flow = graph.flow_through(account)
+        assert flow["inflow"] == pytest.approx(inflow) and flow["outflow"] == pytest.approx(outflow)
+        assert flow["senders"] == sum(r == account for _, r in totals)
+        assert flow["receivers"] == sum(s == account for s, _ in totals)
+        larger = max(inflow, outflow)
+        assert flow["ratio"] == pytest.approx(min(inflow, outflow) / larger if larger else 0.0)
+
+def test_counts_follow_case_summary(frame, graph):
+    expected = defaultdict(int)
+    for s, r in zip(frame["sender_account"], frame["receiver_account"]):
+        if s:
+            expected[s] += 1
+        if r and r != s:
+            expected[r] += 1
+    assert graph.account_counts() == dict(expected)
+
+def test_refresh_matches_full_build(tmp_path, frame):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'graph.db'}")
+    service = IngestionService(engine)
+
+    async def ingest(rows: pd.DataFrame, job_id: str):
+        rows = rows.assign(transaction_id=[f"{job_id}-{i}" for i in range(len(rows))], currency="INR",
+                           description="Transfer", transaction_type="NEFT")
+        async def batches():
+            yield rows
+        await service.ingest(batches(), job_id=job_id)
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await ingest(frame, "initial")
+        async with engine.connect() as conn:
+            graph = await AccountGraph.build(conn)
+        latest = frame["timestamp"].max()
+        await ingest(pd.DataFrame({
+            "sender_account": ["IN-001", "IN-002", "IN-NEW"], "receiver_account": ["IN-030", "IN-001", "IN-002"],
+            "amount": [500000.0, 700.0, 900.0], "timestamp": [datetime(2020, 1, 1), latest, latest],
+        }), "late")
+        async with AsyncSession(engine) as db:
+            db.add(Transaction(transaction_id="null-ts", amount=800.0, currency="INR", timestamp=None,
+                               sender_account="IN-030", receiver_account="IN-031", transaction_type="NEFT"))
+            await db.commit()
+
+        async with engine.connect() as conn:
+            refreshed = await graph.refresh(conn)
+            rebuilt = await AccountGraph.build(conn)
+            assert await refreshed.refresh(conn) is refreshed
+        await engine.dispose()
+        return graph, refreshed, rebuilt
+
+    graph, refreshed, rebuilt = asyncio.run(scenario())
+    assert refreshed.flow_through("IN-030")["inflow"] == graph.flow_through("IN-030")["inflow"] + 500000.0
+    assert refreshed.neighbourhood("IN-NEW", 1) == {"IN-002": 1}
+    for name in ARRAYS:
+        assert np.array_equal(getattr(refreshed, name), getattr(rebuilt, name)), name
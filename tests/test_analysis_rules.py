@@ -0,0 +1,68 @@
+"""
+RoundTripRule: only money that comes back from the outflow's recipient,
+directly or through accounts it paid on, counts as returned.
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.schemas.models import Transaction
+from app.services.analysis_engine import analysis_engine
+
+SUBJECT = "IN-SUBJECT"
+START = datetime(2024, 1, 1)
+
+def tx(tx_id, sender, receiver, amount, hours):
+    return Transaction(transaction_id=tx_id, amount=amount, currency="INR", timestamp=START + timedelta(hours=hours),
+                       sender_account=sender, receiver_account=receiver)
+
+def round_trips(transactions, account_number=SUBJECT):
+    return analysis_engine.analyze(transactions, region="IN", account_number=account_number)["round_tripping"]
+
+def test_recurring_salary_and_rent_is_not_round_tripping():
+    transactions = []
+    for month in range(6):
+        day = month * 30 * 24
+        transactions.append(tx(f"SAL-{month}", "EMPLOYER", SUBJECT, 60000.0, day))
+        transactions.append(tx(f"RENT-{month}", SUBJECT, "LANDLORD", 20000.0, day + 48))
+    assert round_trips(transactions) == []
+    assert round_trips(transactions, account_number=None) == []
+
+def test_direct_return_from_the_recipient():
+    transactions = [
+        tx("OUT", SUBJECT, "SHELL-A", 500000.0, 0),
+        tx("SAL", "EMPLOYER", SUBJECT, 600000.0, 10),
+        tx("BACK", "SHELL-A", SUBJECT, 480000.0, 200),
+    ]
+    [finding] = round_trips(transactions)
+    assert finding["transaction_id"] == "OUT" and finding["counterparty"] == "SHELL-A"
+    assert finding["amount_returned"] == 480000.0
+    assert finding["returned_via"] == ["BACK"]
+
+def test_return_through_accounts_the_recipient_paid():
+    transactions = [
+        tx("OUT", SUBJECT, "SHELL-A", 500000.0, 0),
+        tx("HOP-1", "SHELL-A", "SHELL-B", 495000.0, 5),
+        tx("HOP-2", "SHELL-B", "SHELL-C", 490000.0, 9),
+        tx("BACK", "SHELL-C", SUBJECT, 470000.0, 20),
+    ]
+    [finding] = round_trips(transactions)
+    assert finding["returned_via"] == ["BACK"]
+
+def test_path_must_follow_time_and_length():
+    early = [
+        tx("BACK", "SHELL-B", SUBJECT, 480000.0, 1),
+        tx("OUT", SUBJECT, "SHELL-A", 500000.0, 2),
+        # SHELL-B is only paid after it already sent the money back
+        tx("HOP", "SHELL-A", "SHELL-B", 495000.0, 3),
+    ]
+    assert round_trips(early) == []
+
+    long_path = [tx("OUT", SUBJECT, "S-0", 500000.0, 0)]
+    long_path += [tx(f"HOP-{i}", f"S-{i}", f"S-{i + 1}", 495000.0, 1 + i) for i in range(3)]
+    long_path.append(tx("BACK", "S-3", SUBJECT, 480000.0, 10))
+    # Five transfers in all, one more than round_trip_max_length
+    assert round_trips(long_path) == []
@@ -0,0 +1,119 @@
+"""
+Batch counters and request parking in app/services/batch_progress.py,
+against fakeredis (which runs the Lua scripts): progress only moves
+forward, a redelivered FINISH counts once, a REPORT after FINISH is
+ignored, and the dispatcher keeps the requests until its jobs are out.
+"""
+import asyncio
+import json
+import os
+import sys
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import app.services.batch_progress as batch_progress_module
+import workers.tasks as tasks
+from app.services.batch_progress import BatchProgress, batch_requests_key
+
+BATCH = "batch-1"
+JOBS = ["job-a", "job-b", "job-c"]
+
+@pytest.fixture
+def progress(monkeypatch):
+    server = fakeredis.FakeServer()
+
+    class AsyncClient:
+        # Like AsyncRedis, a client per event loop; each asyncio.run has its own
+        @property
+        def client(self):
+            return fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+
+    monkeypatch.setattr(batch_progress_module, "async_redis", AsyncClient())
+    progress = BatchProgress(fakeredis.FakeRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(tasks, "batch_progress", progress)
+    return progress
+
+def create(progress, job_ids=JOBS, requests=None):
+    requests_json = None if requests is None else json.dumps(requests)
+    asyncio.run(progress.create(BATCH, job_ids, requests_json))
+
+class FakeGroup:
+    published = []
+
+    def __init__(self, signatures, fail=False):
+        self.signatures, self.fail = list(signatures), fail
+
+    def apply_async(self):
+        if self.fail:
+            raise ConnectionError("broker unavailable")
+        FakeGroup.published.extend(sig.id for sig in self.signatures)
+
+def status(progress):
+    return asyncio.run(progress.get(BATCH))
+
+def job_fields(progress):
+    return {k: v for k, v in progress.client.hgetall(f"batch:{BATCH}").items() if k.startswith(("job:", "done:"))}
+
+def test_report_keeps_progress_sum(progress):
+    create(progress)
+    progress.report(BATCH, "job-a", 30)
+    progress.report(BATCH, "job-b", 50)
+    progress.report(BATCH, "job-a", 60)
+    # Progress only moves forward
+    progress.report(BATCH, "job-a", 40)
+    assert status(progress) == {"total": 3, "completed": 0, "failed": 0, "progress_sum": 110}
+
+def test_finish_counts_each_job_once(progress):
+    create(progress)
+    progress.report(BATCH, "job-a", 70)
+    progress.finish(BATCH, "job-a", succeeded=True)
+    # A redelivered task finishes again, possibly with the other outcome
+    progress.finish(BATCH, "job-a", succeeded=True)
+    progress.finish(BATCH, "job-a", succeeded=False)
+    progress.finish(BATCH, "job-b", succeeded=False)
+    assert status(progress) == {"total": 3, "completed": 1, "failed": 1, "progress_sum": 200}
+    assert job_fields(progress) == {"done:job-a": "completed", "done:job-b": "failed"}
+
+def test_report_after_finish_is_ignored(progress):
+    create(progress)
+    progress.finish(BATCH, "job-a", succeeded=True)
+    progress.report(BATCH, "job-a", 50)
+    progress.report(BATCH, "job-b", 20)
+    assert status(progress)["progress_sum"] == 120
+    assert "job:job-a" not in job_fields(progress)
+
+    # Every job done: the sum is exactly 100 per job, whatever the interleaving
+    progress.finish(BATCH, "job-b", succeeded=True)
+    progress.report(BATCH, "job-c", 90)
+    progress.finish(BATCH, "job-c", succeeded=False)
+    progress.report(BATCH, "job-c", 95)
+    assert status(progress) == {"total": 3, "completed": 2, "failed": 1, "progress_sum": 300}
+
+def test_unknown_or_expired_batch_is_not_recreated(progress):
+    progress.report(BATCH, "job-a", 50)
+    progress.finish(BATCH, "job-a", succeeded=True)
+    assert status(progress) is None
+    assert not progress.client.exists(f"batch:{BATCH}")
+
+def test_failed_publish_keeps_requests_parked(progress, monkeypatch):
+    create(progress, requests=[{"n": i} for i in range(len(JOBS))])
+    monkeypatch.setattr(tasks, "group", lambda sigs: FakeGroup(sigs, fail=True))
+    with pytest.raises(ConnectionError):
+        tasks.dispatch_batch_task(BATCH, "sar")
+    assert progress.client.exists(batch_requests_key(BATCH))
+
+    # The redelivered dispatch publishes every job, then drops the requests
+    FakeGroup.published = []
+    monkeypatch.setattr(tasks, "group", FakeGroup)
+    tasks.dispatch_batch_task(BATCH, "sar")
+    assert FakeGroup.published == JOBS
+    assert not progress.client.exists(batch_requests_key(BATCH))
+    assert progress.get_requests(BATCH) == (JOBS, None)
+
+def test_dispatch_task_acks_late():
+    assert tasks.dispatch_batch_task.acks_late
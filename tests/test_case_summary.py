@@ -0,0 +1,157 @@
+"""
+Incremental case_summary maintenance against aggregate_from_scratch.
+
+Transactions and alerts arrive through ORM flushes and ingestion jobs,
+interleaved, with duplicates, self-transfers, missing counterparties,
+missing timestamps, tied first transactions and salary/payroll wording.
+After each step check_consistency must find no drift. Undated
+transactions count as first only when an account has no dated one.
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.db.base import Base
+from app.models.sql import Alert, CaseSummary, Transaction
+from app.services.case_summary import apply_transactions, check_consistency, rebuild
+from app.services.ingestion import IngestionService
+
+ACCOUNTS = [f"IN-{i:02d}" for i in range(12)]
+DESCRIPTIONS = ["Payment", "SALARY CREDIT", "Monthly payroll", "salary/payroll adj", None]
+RULES = ["Structuring", "Rapid Movement", "High Value"]
+START = datetime(2024, 1, 1)
+
+def transactions(rng, prefix: str, n: int) -> pd.DataFrame:
+    sender = rng.choice(ACCOUNTS, n).astype(object)
+    receiver = rng.choice(ACCOUNTS, n).astype(object)
+    receiver[rng.random(n) < 0.1] = None
+    return pd.DataFrame({
+        "transaction_id": [f"{prefix}-{i}" for i in range(n)],
+        "amount": np.round(rng.lognormal(9, 1.5, n), 2),
+        "currency": "INR",
+        # Coarse timestamps so first transactions tie and fall back to the id
+        "timestamp": [START + timedelta(days=int(d)) for d in rng.integers(0, 5, n)],
+        "sender_account": sender,
+        "receiver_account": receiver,
+        "description": rng.choice(np.array(DESCRIPTIONS, dtype=object), n),
+        "transaction_type": "NEFT",
+    })
+
+async def ingest(service, frame: pd.DataFrame, job_id: str, target: str = "transactions"):
+    async def batches():
+        for start in range(0, len(frame), 40):
+            yield frame.iloc[start:start + 40]
+    return await service.ingest(batches(), target=target, job_id=job_id)
+
+def test_incremental_matches_from_scratch(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'summary.db'}")
+    service = IngestionService(engine)
+    rng = np.random.default_rng(3)
+
+    async def consistent():
+        async with engine.connect() as conn:
+            report = await conn.run_sync(check_consistency)
+        assert report["consistent"], report["mismatches"][:5]
+        return report
+
+    async def orm_flushes(prefix: str, frame: pd.DataFrame):
+        # Several flushes per session, so deltas build on rows flushed earlier
+        async with AsyncSession(engine) as db:
+            for start in range(0, len(frame), 25):
+                for row in frame.iloc[start:start + 25].to_dict("records"):
+                    db.add(Transaction(**{k: (None if pd.isna(v) else v) for k, v in row.items()}))
+                await db.flush()
+            db.add(Transaction(transaction_id=f"{prefix}-self", amount=250000.0, sender_account="IN-01",
+                               receiver_account="IN-01", description="SALARY"))
+            db.add(Transaction(transaction_id=f"{prefix}-nots", amount=50.0, timestamp=None,
+                               sender_account="IN-02", receiver_account="IN-03"))
+            db.add(Transaction(transaction_id=f"{prefix}-default", amount=75.0, sender_account="IN-04"))
+            db.add_all(Alert(alert_id=f"{prefix}-A{i}", rule_name=RULES[i % 3], severity="HIGH",
+                             account_number=ACCOUNTS[i % 5]) for i in range(7))
+            await db.commit()
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        await ingest(service, transactions(rng, "ING1", 200), "ing-1")
+        await consistent()
+        await orm_flushes("ORM1", transactions(rng, "ORM1", 100))
+        await consistent()
+
+        # Half the keys are already stored and must not be counted twice
+        again = pd.concat([transactions(rng, "ING1", 100), transactions(rng, "ING2", 150)], ignore_index=True)
+        job = await ingest(service, again, "ing-2")
+        assert job["rows_duplicate"] == 100
+        alerts = pd.DataFrame({"alert_id": [f"ING-A{i}" for i in range(20)],
+                               "rule_name": [RULES[i % 3] for i in range(20)],
+                               "severity": "LOW", "account_number": [ACCOUNTS[i % 12] for i in range(20)]})
+        await ingest(service, alerts, "ing-alerts", target="alerts")
+        await orm_flushes("ORM2", transactions(rng, "ORM2", 60))
+        report = await consistent()
+        assert report["checked"] == len(ACCOUNTS)
+
+        async with AsyncSession(engine) as db:
+            incremental = {row.account_number: row for row in (await db.execute(select(CaseSummary))).scalars()}
+            db.expunge_all()
+        async with engine.begin() as conn:
+            assert await conn.run_sync(rebuild) == len(ACCOUNTS)
+        async with AsyncSession(engine) as db:
+            rebuilt = {row.account_number: row for row in (await db.execute(select(CaseSummary))).scalars()}
+        await engine.dispose()
+        return incremental, rebuilt
+
+    incremental, rebuilt = asyncio.run(scenario())
+    fields = [column.name for column in CaseSummary.__table__.columns if column.name != "updated_at"]
+    for account in ACCOUNTS:
+        for name in fields:
+            want, got = getattr(rebuilt[account], name), getattr(incremental[account], name)
+            if isinstance(want, float):
+                assert abs(want - got) <= 1e-6 * max(1.0, abs(want)), (account, name)
+            else:
+                assert want == got, (account, name)
+
+def test_undated_transactions_sort_last(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'nulls.db'}")
+
+    def load(conn, *rows):
+        # A bulk loader writing NULL timestamps (the ORM would fill in its default)
+        rows = [{"amount": 10.0, "receiver_account": None, "description": None, **row} for row in rows]
+        conn.execute(insert(Transaction), rows)
+        apply_transactions(conn, rows)
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        steps = [
+            # IN-N1: undated first, then a dated one and an undated one with a smaller id
+            [{"transaction_id": "U-1", "timestamp": None, "sender_account": "IN-N1"}],
+            [{"transaction_id": "D-1", "timestamp": START, "sender_account": "IN-N1"},
+             {"transaction_id": "U-0", "timestamp": None, "sender_account": "IN-N1"}],
+            # IN-N2: only undated ones, so the smallest id wins
+            [{"transaction_id": "U-5", "timestamp": None, "sender_account": "IN-N2"}],
+            [{"transaction_id": "U-3", "timestamp": None, "sender_account": "IN-N2"}],
+        ]
+        for rows in steps:
+            async with engine.begin() as conn:
+                await conn.run_sync(load, *rows)
+        async with engine.connect() as conn:
+            report = await conn.run_sync(check_consistency)
+        async with AsyncSession(engine) as db:
+            firsts = {row.account_number: (row.first_tx_at, row.first_tx_id)
+                      for row in (await db.execute(select(CaseSummary))).scalars()}
+        await engine.dispose()
+        return report, firsts
+
+    report, firsts = asyncio.run(scenario())
+    assert report["consistent"], report["mismatches"]
+    assert firsts == {"IN-N1": (START, "D-1"), "IN-N2": (None, "U-3")}
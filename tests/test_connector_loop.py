@@ -0,0 +1,126 @@
+"""
+Event-loop responsiveness while connectors load large files.
+
+A CSV of CONNECTOR_TEST_CSV_MB megabytes (default 64; set 1024 for the
+1 GB check) is loaded with CSVConnector.fetch_data while a ticker
+coroutine measures how late the loop wakes it up. Parsing runs in the
+connector executor, so the loop must keep ticking. A second test cancels
+a load and checks the worker thread is released at the next chunk. The
+CSV and S3 readers must also be opened off the loop thread.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import app.connectors.base as connector_base
+from app.connectors.csv import CSVConnector
+from app.connectors.s3_conn import S3Connector
+from app.connectors.executor import ConnectorExecutor
+
+CSV_MB = int(os.getenv("CONNECTOR_TEST_CSV_MB", "64"))
+# Worst wake-up delay tolerated on the loop while the file loads
+MAX_LOOP_LAG_SECONDS = float(os.getenv("CONNECTOR_TEST_MAX_LAG", "0.25"))
+TICK_SECONDS = 0.01
+
+@pytest.fixture(scope="module")
+def large_csv(tmp_path_factory):
+    path = tmp_path_factory.mktemp("connector") / "transactions.csv"
+    rows = "".join(
+        f"TXN-{i},{1000 + i % 5000}.50,INR,2024-01-{1 + i % 28:02d}T10:00:00Z,ACC-{i % 9973:06d},ACC-{i % 7919:06d},NEFT\n"
+        for i in range(10_000)
+    )
+    with open(path, "w") as f:
+        f.write("transaction_id,amount,currency,timestamp,sender_account,receiver_account,transaction_type\n")
+        while f.tell() < CSV_MB * 2**20:
+            f.write(rows)
+    return str(path)
+
+async def max_lag_while(coro) -> tuple:
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append(time.perf_counter() - start - TICK_SECONDS)
+
+    monitor = asyncio.create_task(ticker())
+    try:
+        result = await coro
+    finally:
+        done.set()
+        await monitor
+    return result, max(lags) if lags else float("inf"), len(lags)
+
+def test_loop_stays_responsive_during_csv_load(large_csv):
+    connector = CSVConnector({"file_path": large_csv})
+    df, max_lag, ticks = asyncio.run(max_lag_while(connector.fetch_data()))
+
+    assert len(df) > 0 and list(df.columns)[0] == "transaction_id"
+    assert ticks > 10, "load finished too quickly to measure the loop"
+    assert max_lag < MAX_LOOP_LAG_SECONDS, f"event loop stalled for {max_lag:.3f}s during a {CSV_MB} MB load"
+
+def test_cancelled_load_releases_worker(large_csv, monkeypatch):
+    # A single worker: the follow-up call can only run once the load stops
+    executor = ConnectorExecutor(max_workers=1)
+    monkeypatch.setattr(connector_base, "connector_executor", executor)
+    connector = CSVConnector({"file_path": large_csv})
+
+    async def scenario():
+        load = asyncio.create_task(connector.fetch_data())
+        await asyncio.sleep(0.2)
+        load.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await load
+        start = time.perf_counter()
+        assert await executor.run(lambda: "free") == "free"
+        return time.perf_counter() - start
+
+    try:
+        waited = asyncio.run(scenario())
+    finally:
+        executor.shutdown(wait=True)
+    assert waited < 2.0, f"worker still busy {waited:.2f}s after cancellation"
+
+class FakeS3:
+    def __init__(self, path):
+        self.path = path
+
+    def get_object(self, Bucket, Key):
+        return {"Body": open(self.path, "rb")}
+
+@pytest.mark.parametrize("source", ["csv", "s3"])
+def test_readers_are_opened_off_the_loop(large_csv, source, monkeypatch):
+    read_threads = []
+    real_read_csv = pd.read_csv
+
+    def read_csv(*args, **kwargs):
+        read_threads.append(threading.current_thread())
+        return real_read_csv(*args, **kwargs)
+
+    monkeypatch.setattr(pd, "read_csv", read_csv)
+    if source == "csv":
+        connector = CSVConnector({"file_path": large_csv})
+    else:
+        connector = S3Connector({"bucket": "bucket", "key": "transactions.csv"})
+        connector.s3_client = FakeS3(large_csv)
+
+    async def scenario():
+        batches = connector.stream_batches(batch_size=1000)
+        first = await batches.__anext__()
+        await batches.aclose()
+        whole = await connector.fetch_data()
+        return first, whole
+
+    first, whole = asyncio.run(scenario())
+    assert len(first) == 1000 and len(whole) > 1000
+    assert read_threads and threading.main_thread() not in read_threads
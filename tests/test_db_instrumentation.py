@@ -0,0 +1,88 @@
+"""
+DB instrumentation: statement normalisation, slow-query accounting and
+per-endpoint query counts.
+
+The endpoint test serves a deliberate N+1 route through
+QueryCountMiddleware and checks the regression shows in the snapshot as
+queries per request, with the route template (not the raw path) as key.
+"""
+import os
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.db.instrumentation import QueryCountMiddleware, QueryStats, instrument_engine, normalize_statement
+
+ITEMS = 12
+
+@pytest.fixture
+def stats():
+    return QueryStats(slow_query_ms=1e9, sample_rate=1.0, max_statements=100, queries_per_request_warn=1000)
+
+@pytest.fixture
+def engine(stats):
+    # One shared in-memory database, also for the threadpool the sync route runs in
+    engine = instrument_engine(
+        create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}), stats
+    )
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, owner TEXT)"))
+        conn.execute(text("INSERT INTO items (id, owner) VALUES (:id, :owner)"),
+                     [{"id": i, "owner": f"IN-{i}"} for i in range(ITEMS)])
+    stats.reset()
+    yield engine
+    engine.dispose()
+
+def test_normalize_statement_collapses_lists():
+    assert normalize_statement("SELECT *\n  FROM t WHERE a IN (?, ?, ?)") == "SELECT * FROM t WHERE a IN (...)"
+    assert normalize_statement("INSERT INTO t (a, b) VALUES ($1, $2), ($3, $4), ($5, $6)") == \
+        "INSERT INTO t (a, b) VALUES (...), ..."
+    assert normalize_statement("SELECT count(a), (b) FROM t") == "SELECT count(a), (b) FROM t"
+
+def test_statements_are_timed_without_parameters(engine, stats):
+    stats.slow_query_ms = 0
+    with engine.connect() as conn:
+        for i in range(3):
+            conn.execute(text("SELECT owner FROM items WHERE id = :id"), {"id": i})
+    snapshot = stats.snapshot()
+    assert snapshot["statements_total"] == 3
+    assert snapshot["slow_total"] == 3
+    [entry] = snapshot["statements"]
+    assert entry["statement"] == "SELECT owner FROM items WHERE id = ?"
+    assert entry["count"] == 3 and sum(entry["histogram"].values()) == 3
+    assert "IN-" not in str(snapshot)
+
+def test_sampling_keeps_totals(engine, stats):
+    stats.sample_rate = 0.0
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    snapshot = stats.snapshot()
+    assert snapshot["statements_total"] == 1
+    assert snapshot["statements"] == []
+
+def test_n_plus_one_shows_in_endpoint_counts(engine, stats):
+    app = FastAPI()
+    app.add_middleware(QueryCountMiddleware, stats=stats)
+
+    @app.get("/owners/{prefix}")
+    def owners(prefix: str):
+        with engine.connect() as conn:
+            ids = [row.id for row in conn.execute(text("SELECT id FROM items"))]
+            return [conn.execute(text("SELECT owner FROM items WHERE id = :id"), {"id": i}).scalar() for i in ids]
+
+    client = TestClient(app)
+    for _ in range(2):
+        assert len(client.get("/owners/IN").json()) == ITEMS
+
+    endpoint = stats.snapshot()["endpoints"]["GET /owners/{prefix}"]
+    assert endpoint["requests"] == 2
+    assert endpoint["max_queries"] == ITEMS + 1
+    assert endpoint["avg_queries"] == ITEMS + 1
+    assert endpoint["histogram"] == {"le_20": 2}
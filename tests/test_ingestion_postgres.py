@@ -0,0 +1,129 @@
+"""
+The PostgreSQL COPY path of the ingestion service.
+
+Runs when TEST_POSTGRES_URL points at a scratch database (sync URL, e.g.
+postgresql://user:pw@host/db; the tests connect through asyncpg). Batches
+with in-batch duplicates, keys already stored, rejected rows and
+self-transfers go through IngestionService._copy_insert, mixed with ORM
+inserts, and case_summary must match a from-scratch recomputation. A second
+test measures throughput against INGEST_MIN_ROWS_PER_MINUTE.
+"""
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.db.base import Base
+from app.models.sql import Alert, Transaction
+from app.services.case_summary import check_consistency
+from app.services.ingestion import IngestionService
+from scripts.bench_case_details import make_batches
+
+BENCH_ROWS = int(os.getenv("INGEST_BENCH_ROWS", "1000000"))
+MIN_ROWS_PER_MINUTE = float(os.getenv("INGEST_MIN_ROWS_PER_MINUTE", "1000000"))
+
+@pytest.fixture
+def postgres_engine():
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL not set")
+    pytest.importorskip("asyncpg")
+    engine = create_async_engine(url.replace("postgresql://", "postgresql+asyncpg://", 1))
+
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(reset())
+    yield engine
+
+    async def teardown():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+    asyncio.run(teardown())
+
+def spy_on_copy(monkeypatch) -> list:
+    calls = []
+    copy_insert = IngestionService._copy_insert
+
+    async def spy(conn, target, rows):
+        calls.append(len(rows))
+        return await copy_insert(conn, target, rows)
+
+    monkeypatch.setattr(IngestionService, "_copy_insert", staticmethod(spy))
+    return calls
+
+async def from_frames(frames):
+    for frame in frames:
+        yield frame
+
+def test_copy_ingest_keeps_case_summary_consistent(postgres_engine, monkeypatch):
+    calls = spy_on_copy(monkeypatch)
+    service = IngestionService(postgres_engine)
+    first = pd.DataFrame({
+        "transaction_id": ["T-1", "T-2", "T-3", "T-3", "T-4", "T-5"],
+        "amount": [1500.0, 250000.0, 90.0, 95.0, "not a number", 1200.0],
+        "currency": ["INR"] * 6,
+        "timestamp": ["2024-03-01T10:00:00Z", "2024-03-02T11:00:00+05:30", None, "2024-03-03", "2024-03-04",
+                      "2024-03-05"],
+        "sender_account": ["IN-1", "IN-1", "IN-2", "IN-2", "IN-3", "IN-4"],
+        "receiver_account": ["IN-2", "IN-3", "IN-2", "IN-2", "IN-1", None],
+        "description": ["SALARY CREDIT", "Transfer", None, "Self", "Bad", "Cash"],
+        "transaction_type": ["NEFT"] * 6,
+    })
+    # T-1 and T-2 are already stored by then and must be skipped
+    second = first.iloc[:2].assign(amount=[1.0, 2.0])
+    alerts = pd.DataFrame({
+        "alert_id": ["A-1", "A-2"], "rule_name": ["Structuring", "Rapid Movement"], "severity": ["HIGH", "LOW"],
+        "timestamp": ["2024-03-06", "2024-03-07"], "details": ['{"count": 3}', {"window": "24h"}],
+        "account_number": ["IN-1", "IN-2"],
+    })
+
+    async def scenario():
+        first_job = await service.ingest(from_frames([first]), job_id="pg-first")
+        async with AsyncSession(postgres_engine) as db:
+            db.add(Transaction(transaction_id="T-ORM", amount=700.0, currency="INR", sender_account="IN-4",
+                               receiver_account="IN-1", transaction_type="NEFT"))
+            await db.commit()
+        second_job = await service.ingest(from_frames([second]), job_id="pg-second")
+        alert_job = await service.ingest(from_frames([alerts]), target="alerts", job_id="pg-alerts")
+        async with postgres_engine.connect() as conn:
+            report = await conn.run_sync(check_consistency)
+            stored = (await conn.execute(select(Transaction.amount).where(Transaction.transaction_id == "T-1"))).scalar()
+            details = (await conn.execute(select(Alert.details).where(Alert.alert_id == "A-1"))).scalar()
+        return first_job, second_job, alert_job, report, stored, details
+
+    first_job, second_job, alert_job, report, stored, details = asyncio.run(scenario())
+    assert len(calls) == 3
+    assert (first_job["rows_inserted"], first_job["rows_duplicate"], first_job["rows_rejected"]) == (4, 1, 1)
+    assert (second_job["rows_inserted"], second_job["rows_duplicate"]) == (0, 2)
+    assert alert_job["rows_inserted"] == 2
+    assert stored == 1500.0 and details == {"count": 3}
+    assert report["consistent"], report["mismatches"]
+    assert report["checked"] == 4
+
+def test_copy_ingest_throughput(postgres_engine, monkeypatch):
+    calls = spy_on_copy(monkeypatch)
+    service = IngestionService(postgres_engine)
+
+    async def scenario():
+        job = await service.ingest(from_frames(make_batches(BENCH_ROWS)), job_id="pg-bench")
+        async with postgres_engine.connect() as conn:
+            count = (await conn.execute(select(func.count()).select_from(Transaction))).scalar()
+        return job, count
+
+    job, count = asyncio.run(scenario())
+    print(f"COPY ingestion: {BENCH_ROWS:,} rows at {job['rows_per_minute']:,.0f} rows/min", flush=True)
+    assert calls and count == BENCH_ROWS
+    assert job["rows_per_minute"] >= MIN_ROWS_PER_MINUTE
@@ -0,0 +1,67 @@
+"""
+Page-number pagination in JSONConnector.stream_batches.
+
+An API that ignores the page and page-size params answers every request
+with the same full page; the stream must stop at the first repeat instead
+of looping forever. max_pages bounds APIs that never run out of pages.
+"""
+import asyncio
+import os
+import sys
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.connectors.json_conn import JSONConnector
+
+def records(start, n):
+    return [{"transaction_id": f"TXN-{i}", "amount": 100.0 + i} for i in range(start, start + n)]
+
+async def collect(handler, **config):
+    app = web.Application()
+    app.router.add_get("/transactions", handler)
+    requests = []
+
+    @web.middleware
+    async def count(request, handler):
+        requests.append(dict(request.query))
+        return await handler(request)
+
+    app.middlewares.append(count)
+    async with TestServer(app) as server:
+        connector = JSONConnector({"url": str(server.make_url("/transactions")), **config})
+        try:
+            batches = [batch async for batch in connector.stream_batches(batch_size=5)]
+        finally:
+            await connector.disconnect()
+    return batches, requests
+
+def test_stops_when_server_ignores_page_params():
+    async def ignoring(request):
+        # Always the same full page, whatever page/page_size ask for
+        return web.json_response(records(0, 5))
+
+    batches, requests = asyncio.run(asyncio.wait_for(collect(ignoring), timeout=10))
+    assert len(batches) == 1 and list(batches[0]["transaction_id"]) == [f"TXN-{i}" for i in range(5)]
+    assert [query["page"] for query in requests] == ["1", "2"]
+
+def test_paginated_server_is_read_to_the_short_page():
+    async def paginated(request):
+        page, size = int(request.query["page"]), int(request.query["page_size"])
+        start = (page - 1) * size
+        return web.json_response(records(start, max(0, min(size, 12 - start))))
+
+    batches, requests = asyncio.run(asyncio.wait_for(collect(paginated), timeout=10))
+    assert [len(batch) for batch in batches] == [5, 5, 2]
+    assert len(requests) == 3
+
+def test_max_pages_bounds_an_endless_api():
+    async def endless(request):
+        page = int(request.query["page"])
+        return web.json_response(records(page * 5, 5))
+
+    batches, requests = asyncio.run(asyncio.wait_for(collect(endless, max_pages=4), timeout=10))
+    assert len(batches) == 4 and len(requests) == 4
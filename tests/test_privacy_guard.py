@@ -0,0 +1,134 @@
+"""
+PII masking and stitching in app/utils/privacy_guard.py.
+
+Protected values only match as whole tokens, so short names and ids that
+prefix other ids do not corrupt the narrative when it is masked.
+Placeholders split across streamed chunks are stitched exactly once, and
+values split across them are masked before anything is published.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from datetime import datetime
+
+from app.schemas.models import Customer, Transaction
+from app.schemas.requests import GenerateRequest
+from app.services import generation_service as generation_module
+from app.utils.privacy_guard import (LeakScanner, NarrativeStitcher, RedactionIndex, StreamingMasker,
+                                     StreamingStitcher)
+
+@pytest.fixture
+def index():
+    return RedactionIndex({
+        "Ali": "{{CUSTOMER_NAME}}",
+        "ACC-1234": "[REDACTED ACCOUNT]",
+        "CUST-1": "{{CUSTOMER_ID}}",
+        "ali@example.com": "[REDACTED EMAIL]",
+    })
+
+@pytest.mark.parametrize("fuzzy", [False, True])
+def test_values_inside_longer_tokens_are_kept(index, fuzzy):
+    text = "The legality of ACC-12345 and CUST-10 was reviewed by Alison."
+    assert index.find(text, fuzzy) == []
+    assert index.mask(text, fuzzy) == text
+
+@pytest.mark.parametrize("fuzzy", [False, True])
+def test_whole_tokens_are_masked(index, fuzzy):
+    text = "Ali's account ACC-1234, customer CUST-1 (mail ali@example.com)."
+    assert index.mask(text, fuzzy) == (
+        "{{CUSTOMER_NAME}}'s account [REDACTED ACCOUNT], customer {{CUSTOMER_ID}} (mail [REDACTED EMAIL])."
+    )
+
+def test_shorter_value_matches_when_longer_one_is_not_a_token():
+    index = RedactionIndex({"CUST-1": "{{CUSTOMER_ID}}", "CUST-10": "[REDACTED]"})
+    assert index.mask("CUST-10 and CUST-1 but not CUST-100") == "[REDACTED] and {{CUSTOMER_ID}} but not CUST-100"
+
+def test_fuzzy_ignores_case_and_whitespace():
+    index = RedactionIndex({"Ali Khan": "{{CUSTOMER_NAME}}"})
+    assert index.mask("Paid by ALI\n  khan today; not alikhan") == "Paid by {{CUSTOMER_NAME}} today; not alikhan"
+
+def test_leak_scanner_respects_tokens():
+    scanner = LeakScanner(["Ali", "ACC-1234"])
+    assert scanner.find("legality of ACC-12345") == []
+    assert [value for _, _, value in scanner.find("ali moved funds from acc-1234.")] == ["Ali", "ACC-1234"]
+
+def test_stitch_fills_both_placeholder_forms():
+    narrative = "{{CUSTOMER_NAME}} holds {ACCOUNT_NUMBER}; {{COUNTRY}} unknown."
+    pii = {"name": "Ali", "account": "ACC-1234"}
+    assert NarrativeStitcher.stitch(narrative, pii) == "Ali holds ACC-1234; [COUNTRY MISSING] unknown."
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 11])
+def test_streaming_stitch_matches_whole_text_for_any_split(size):
+    pii = {"name": "Ali", "account": "ACC-1234", "customer_id": "CUST-1"}
+    narrative = "Subject {{CUSTOMER_NAME}} ({CUSTOMER_ID}) moved funds from {{ACCOUNT_NUMBER}}. {not a key} {{"
+    stitcher = StreamingStitcher(pii)
+    streamed = "".join(stitcher.feed(narrative[i:i + size]) for i in range(0, len(narrative), size))
+    streamed += stitcher.flush()
+    assert streamed == NarrativeStitcher.stitch(narrative, pii)
+
+def test_streaming_stitch_holds_back_split_placeholder():
+    stitcher = StreamingStitcher({"name": "Ali"})
+    assert stitcher.feed("Subject {{CUSTO") == "Subject "
+    assert stitcher.feed("MER_NAME}} paid") == "Ali paid"
+    assert stitcher.flush() == ""
+
+def test_value_starting_inside_a_rejected_candidate_is_found():
+    index = RedactionIndex({"xx ali": "[REDACTED]", "ali": "{{CUSTOMER_NAME}}"})
+    assert index.mask("axx ali", fuzzy=False) == "axx {{CUSTOMER_NAME}}"
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 11])
+def test_streaming_mask_matches_whole_text_for_any_split(index, size):
+    text = ("ALI  paid acc-1234 to Alison; ACC-12345 and CUST-1, CUST-10 "
+            "(mail Ali@Example.com) for {{CUSTOMER_NAME}} Ali")
+    masker = StreamingMasker(index)
+    streamed = "".join(masker.feed(text[i:i + size]) for i in range(0, len(text), size))
+    streamed += masker.flush()
+    assert streamed == index.mask(text)
+
+def test_streaming_mask_holds_back_split_value(index):
+    masker = StreamingMasker(index)
+    emitted = masker.feed("Funds left account ACC-12")
+    assert "ACC-12" not in emitted
+    emitted += masker.feed("34 on the same day, reviewed at length.")
+    emitted += masker.flush()
+    assert emitted == "Funds left account [REDACTED ACCOUNT] on the same day, reviewed at length."
+
+def test_streamed_preview_never_shows_leaked_values(monkeypatch):
+    index = RedactionIndex({"Ravi Kumar": "{{CUSTOMER_NAME}}", "ACC-1234": "[REDACTED ACCOUNT]"})
+    tokens = ["{{CUSTOMER_NAME}} moved funds from AC", "C-12", "34 to {{COUNTRY}}."]
+
+    async def stream(prompt, system_prompt):
+        for token in tokens:
+            yield token
+
+    monkeypatch.setattr(generation_module.llm_engine, "stream", stream)
+    pii = {"name": "Ravi Kumar", "account": "ACC-XXXX-ab12", "country": "India"}
+    chunks = []
+
+    async def on_chunk(piece):
+        chunks.append(piece)
+
+    raw = asyncio.run(generation_module.GenerationService()._stream_narrative("", "", pii, index, on_chunk))
+    assert raw == "".join(tokens)
+    leaked = [chunk.replace("[REDACTED ACCOUNT]", "") for chunk in chunks]
+    assert not any("AC" in chunk or "12" in chunk or "34" in chunk for chunk in leaked)
+    assert "".join(chunks) == NarrativeStitcher.stitch(index.mask(raw), pii)
+    assert "".join(chunks) == "Ravi Kumar moved funds from [REDACTED ACCOUNT] to India."
+
+def test_customer_account_is_redacted_not_stitched():
+    customer = Customer(customer_id="CUST-77", name="Ravi Kumar", account_number="ACC-9001")
+    request = GenerateRequest(customer=customer, alerts=[], transactions=[
+        Transaction(transaction_id="T-1", amount=10.0, timestamp=datetime(2024, 1, 1),
+                    sender_account="ACC-9001", receiver_account="ACC-9002"),
+    ])
+    index = RedactionIndex.from_request(request)
+    assert index.replacements["ACC-9001"] == "[REDACTED ACCOUNT]"
+    assert index.mask("Ravi Kumar (CUST-77) used ACC-9001.") == (
+        "{{CUSTOMER_NAME}} ({{CUSTOMER_ID}}) used [REDACTED ACCOUNT]."
+    )
@@ -0,0 +1,76 @@
+"""
+The transaction table in the SAR prompt: rows cited by rules, a few
+context rows, and aggregates for the rest, within the token budget. The
+table is opt-in; by default the prompt only carries the summary.
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.core.config import settings
+from app.schemas.requests import GenerateRequest
+from app.services.generation_service import generation_service
+from app.services.prompt_builder import PromptBuilder, estimate_tokens
+
+def transactions(n):
+    return [
+        {"timestamp": f"2024-01-{1 + i % 28:02d} 10:{i % 60:02d}", "type": "NEFT", "direction": "in",
+         "amount": 1000.0 + i, "currency": "INR", "counterparty": f"CP{i % 7}"}
+        for i in range(n)
+    ]
+
+def table_rows(lines):
+    return [line for line in lines[1:] if line.count("|") == 5]
+
+def test_flagged_rows_plus_context_rows():
+    txs = transactions(500)
+    flagged = np.zeros(len(txs), dtype=bool)
+    flagged[[3, 250, 499]] = True
+    lines = PromptBuilder(token_budget=10_000, context_rows=4).transaction_section(txs, flagged, 10_000, "INR")
+    rows = table_rows(lines)
+    assert len(rows) == 7
+    assert sum(row.endswith("|*") for row in rows) == 3
+    assert lines[len(rows) + 1] == "493 more transactions, aggregated:"
+
+def test_budget_caps_flagged_rows():
+    txs = transactions(500)
+    flagged = np.ones(len(txs), dtype=bool)
+    lines = PromptBuilder(token_budget=300, context_rows=0).transaction_section(txs, flagged, 300, "INR")
+    assert sum(estimate_tokens(line) for line in lines) <= 300
+    assert 0 < len(table_rows(lines)) < len(txs)
+
+def test_small_cases_are_listed_in_full():
+    txs = transactions(4)
+    lines = PromptBuilder(context_rows=5).transaction_section(txs, np.zeros(4, dtype=bool), 500, "INR")
+    assert len(table_rows(lines)) == 4 and len(lines) == 5
+
+def user_prompt(n):
+    request = GenerateRequest(
+        customer={"customer_id": "C-1", "name": "Test", "account_number": "ACC-1"},
+        transactions=[
+            {"transaction_id": f"T-{i}", "amount": 1000.0 + i, "currency": "INR",
+             "timestamp": datetime(2024, 1, 1) + timedelta(hours=i), "sender_account": f"CP-{i % 7}",
+             "receiver_account": "ACC-1", "transaction_type": "NEFT"}
+            for i in range(n)
+        ],
+        alerts=[], region="IN",
+    )
+    anon_data = generation_service._prepare_anonymized_data(request)
+    activity = generation_service._analyze_activity(request)
+    return generation_service._build_user_prompt(request, anon_data, activity)
+
+def test_table_is_opt_in(monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_TRANSACTION_TABLE", False)
+    small, large = user_prompt(3), user_prompt(3000)
+    assert "TRANSACTIONS:" not in large
+    assert estimate_tokens(large) - estimate_tokens(small) < 20
+
+    monkeypatch.setattr(settings, "PROMPT_TRANSACTION_TABLE", True)
+    tabled = user_prompt(3000)
+    assert "TRANSACTIONS:" in tabled
+    assert estimate_tokens(large) < estimate_tokens(tabled) <= settings.PROMPT_TOKEN_BUDGET
@@ -0,0 +1,75 @@
+"""
+Query-plan regression tests for the case lookup paths.
+
+Each query from app/services/case_queries.py is EXPLAINed against a fresh
+schema and the test fails if the plan falls back to a sequential scan of
+the table it reads. SQLite always runs; Postgres runs when TEST_POSTGRES_URL
+points at a scratch database (sync URL, e.g. postgresql://user:pw@host/db).
+"""
+import os
+import re
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.db.base import Base
+import app.models.sql  # noqa: F401  (registers tables)
+from app.services.case_queries import (
+    case_listing_query, account_transactions_query, account_alerts_query, submitted_sars_query
+)
+
+CASE_QUERIES = {
+    "account_transactions": account_transactions_query("IN-1000"),
+    "account_transactions_window": account_transactions_query(
+        "IN-1000", start=datetime(2024, 1, 1), end=datetime(2024, 2, 1)
+    ),
+    "account_alerts": account_alerts_query("IN-1000"),
+    "submitted_sars": submitted_sars_query(),
+    "case_list_by_account": case_listing_query(limit=100),
+    "case_list_by_risk": case_listing_query(sort_by="risk", descending=True, after=(3, "IN-1000"), limit=100),
+    "case_list_by_alerts": case_listing_query(sort_by="alert_count", descending=True, limit=100),
+}
+
+def compile_sql(query, engine) -> str:
+    return str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+
+@pytest.fixture(scope="module")
+def sqlite_engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.mark.parametrize("name", CASE_QUERIES)
+def test_sqlite_plan_uses_indexes(sqlite_engine, name):
+    with sqlite_engine.connect() as conn:
+        plan = [row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + compile_sql(CASE_QUERIES[name], sqlite_engine)))]
+    # "SCAN t" is a full table scan; "SCAN t USING INDEX" is an ordered index walk
+    table_scans = [step for step in plan if re.match(r"SCAN \w+$", step)]
+    assert not table_scans, f"{name} falls back to a table scan: {plan}"
+
+@pytest.fixture(scope="module")
+def postgres_engine():
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL not set")
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+@pytest.mark.parametrize("name", CASE_QUERIES)
+def test_postgres_plan_uses_indexes(postgres_engine, name):
+    with postgres_engine.connect() as conn:
+        # Empty tables make a seq scan the cheapest plan; ask whether an index path exists at all
+        conn.execute(text("SET enable_seqscan = off"))
+        plan = [row[0] for row in conn.execute(text("EXPLAIN " + compile_sql(CASE_QUERIES[name], postgres_engine)))]
+    seq_scans = [step for step in plan if "Seq Scan" in step]
+    assert not seq_scans, f"{name} falls back to a sequential scan: {plan}"
@@ -0,0 +1,102 @@
+"""
+Freshness of the columnar transaction store.
+
+Rows the store has not seen yet (back-dated, sharing the latest timestamp,
+or without a timestamp) must never be hidden: case details fall back to the
+database while the store's count for the account differs from
+case_summary, and a refresh reloads exactly those accounts.
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+import orjson
+import pandas as pd
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.api.endpoints.cases import get_case_details
+from app.core.config import settings
+from app.db.base import Base
+from app.models.sql import CaseSummary, Transaction
+from app.services.ingestion import IngestionService
+from app.services.transaction_store import TransactionStore
+
+ACCOUNT = "IN-STORE-001"
+
+def transactions(rows):
+    return pd.DataFrame([
+        {"transaction_id": tx_id, "amount": amount, "currency": "INR", "timestamp": ts,
+         "sender_account": f"CP-{i % 3}", "receiver_account": ACCOUNT, "description": "Payment",
+         "transaction_type": "NEFT"}
+        for i, (tx_id, amount, ts) in enumerate(rows)
+    ])
+
+async def ingest(service: IngestionService, frame: pd.DataFrame, job_id: str):
+    async def batches():
+        yield frame
+    await service.ingest(batches(), job_id=job_id)
+
+async def case_details(engine, enabled: bool) -> dict:
+    settings.TRANSACTION_STORE_ENABLED = enabled
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        response = await get_case_details(ACCOUNT, tx_offset=0, tx_limit=None, start=None, end=None, db=db)
+    return orjson.loads(response.body)
+
+@pytest.fixture
+def store_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TRANSACTION_STORE_PATH", str(tmp_path / "store"))
+    monkeypatch.setattr(settings, "TRANSACTION_STORE_ENABLED", False)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'store.db'}")
+    yield engine, IngestionService(engine), str(tmp_path / "store")
+    asyncio.run(engine.dispose())
+
+def test_unseen_rows_are_served_and_refreshed(store_env):
+    engine, service, path = store_env
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        latest = datetime(2024, 6, 1, 12, 0)
+        await ingest(service, transactions(
+            [(f"T-{i}", 1000.0 + i, datetime(2024, 5, 1 + i)) for i in range(10)] + [("T-latest", 900.0, latest)]
+        ), "initial")
+        async with engine.connect() as conn:
+            store = await TransactionStore.build(conn, path, partitions=4)
+        assert len(store.account(ACCOUNT)) == 11
+
+        # Back-dated through the bulk loader, same timestamp as the newest row, and no timestamp at all
+        await ingest(service, transactions([("T-backdated", 500000.0, datetime(2023, 1, 1)),
+                                            ("T-tied", 950.0, latest)]), "late")
+        async with AsyncSession(engine) as db:
+            db.add(Transaction(transaction_id="T-null", amount=800.0, currency="INR", timestamp=None,
+                               sender_account=ACCOUNT, receiver_account="CP-9", transaction_type="NEFT"))
+            await db.commit()
+            summary = await db.get(CaseSummary, ACCOUNT)
+            assert summary.tx_count == 14 and summary.risk_rating == "MEDIUM"
+
+        # The stale store is bypassed: the high-value row behind MEDIUM is listed
+        orm = await case_details(engine, enabled=False)
+        stale = await case_details(engine, enabled=True)
+        assert stale == orm
+        assert {"T-backdated", "T-tied", "T-null"} <= {tx["transaction_id"] for tx in stale["transactions"]}
+        assert stale["customer"]["risk_rating"] == "MEDIUM"
+
+        async with engine.connect() as conn:
+            refreshed = await store.refresh(conn)
+        view = refreshed.account(ACCOUNT)
+        assert len(view) == 14
+        assert len(refreshed.account("CP-9")) == 1
+        assert refreshed.rows == sum(refreshed.account_counts().values())
+        fresh = await case_details(engine, enabled=True)
+        assert fresh == orm
+
+        # Nothing left to reload
+        async with engine.connect() as conn:
+            assert await refreshed.refresh(conn) is refreshed
+
+    asyncio.run(scenario())
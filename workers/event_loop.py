@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+from sqlalchemy import text
+
+from app.core.llm import llm_engine
+from app.db.base import engine
+
+class WorkerEventLoop:
+    """
+    One long-lived asyncio loop per worker process.
+
+    The loop runs in a daemon thread and Celery tasks submit coroutines to it,
+    so loop-bound resources (the async SQLAlchemy pool, the pooled httpx
+    client) are created once and stay warm across tasks instead of being
+    rebuilt by asyncio.run() for every job.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run_loop, name="worker-event-loop", daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+
+        try:
+            self.run(self._warm_up(), timeout=30)
+        except Exception as e:
+            # Warm-up is an optimization; tasks will connect lazily instead
+            print(f"Worker loop warm-up failed: {e}", flush=True)
+
+    def run(self, coro, timeout: float = None):
+        """
+        Run a coroutine on the worker loop and block until it finishes.
+        """
+        if not self.running:
+            self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # Celery time limits and worker shutdown land here; don't leave the
+            # coroutine running on the shared loop.
+            future.cancel()
+            raise
+
+    def stop(self):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None:
+                return
+            if loop.is_running():
+                try:
+                    asyncio.run_coroutine_threadsafe(self._close_resources(), loop).result(30)
+                except Exception as e:
+                    print(f"Worker loop shutdown error: {e}", flush=True)
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join(timeout=30)
+            loop.close()
+            self._loop = None
+            self._thread = None
+
+    async def _warm_up(self):
+        await llm_engine.startup()
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def _close_resources(self):
+        await llm_engine.shutdown()
+        await engine.dispose()
+
+worker_loop = WorkerEventLoop()
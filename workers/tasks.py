@@ -1,16 +1,68 @@
 from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.llm import llm_engine
+from app.db.base import engine
 from app.schemas.requests import GenerateRequest
 from app.services.generation_service import generation_service
+from app.services.narrative_stream import NarrativeStreamPublisher
+from app.services.batch_progress import batch_progress
+from workers.event_loop import worker_loop
+from celery import group
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
 import asyncio
 import json
 from datetime import datetime
 
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    # Forked pool children must not reuse connections opened by the parent.
+    llm_engine.reset()
+    engine.sync_engine.dispose(close=False)
+    if settings.WORKER_PERSISTENT_LOOP:
+        worker_loop.start()
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    print(f"LLM pool stats at shutdown: {llm_engine.pool_stats()}", flush=True)
+    if settings.WORKER_PERSISTENT_LOOP:
+        worker_loop.stop()
+    else:
+        asyncio.run(llm_engine.shutdown())
+
+def run_async(coro):
+    """
+    Run a coroutine from a task: on the persistent worker loop (started lazily
+    for pools that skip worker_process_init, e.g. solo), or via asyncio.run
+    when WORKER_PERSISTENT_LOOP is off.
+    """
+    if settings.WORKER_PERSISTENT_LOOP:
+        return worker_loop.run(coro)
+    return asyncio.run(coro)
+
 @celery_app.task(bind=True, acks_late=True)
-def generate_sar_task(self, request_json: str):
+def generate_sar_task(self, request_json: str, batch_id: str = None):
     """
     Celery task to generate SAR asynchronously.
+    Jobs submitted as part of a batch also update the batch counters.
     """
-    print(f"Task {self.request.id} received. Payload: {request_json[:100]}...", flush=True)
+    try:
+        result = _generate_sar(self, request_json, batch_id)
+    except Exception:
+        if batch_id:
+            batch_progress.finish(batch_id, self.request.id, succeeded=False)
+        raise
+    if batch_id:
+        batch_progress.finish(batch_id, self.request.id, succeeded=True)
+    return result
+
+def _generate_sar(task, request_json: str, batch_id: str = None):
+    def report(progress: int, message: str):
+        task.update_state(state='PROCESSING', meta={'progress': progress, 'message': message})
+        if batch_id:
+            batch_progress.report(batch_id, task.request.id, progress)
+
+    print(f"Task {task.request.id} received. Payload: {request_json[:100]}...", flush=True)
     # Parse request
     try:
         request_data = json.loads(request_json)
@@ -20,28 +72,63 @@ def generate_sar_task(self, request_json: str):
         raise e
     
     # Update state: PROCESSING
-    self.update_state(state='PROCESSING', meta={'progress': 10, 'message': 'Initializing generation...'})
+    report(10, 'Initializing generation...')
     
     # Simulate steps for progress tracking
-    self.update_state(state='PROCESSING', meta={'progress': 30, 'message': 'Analyzing transactions...'})
+    report(30, 'Analyzing transactions...')
     print(f"Starting SAR generation for customer: {request.customer.customer_id}", flush=True)
     
-    print("DEBUG: Calling generation_service.generate_sar via asyncio.run", flush=True)
+    print("DEBUG: Calling generation_service.generate_sar on the worker event loop", flush=True)
     start_time = datetime.now()
     
+    on_chunk = None
+    publisher = None
+    if request.stream:
+        publisher = NarrativeStreamPublisher(task.request.id)
+
+        async def on_chunk(text: str):
+            publisher.publish("token", text)
+
     try:
-        # asyncio.run is more robust for standalone tasks
-        result = asyncio.run(generation_service.generate_sar(request))
+        result = run_async(generation_service.generate_sar(request, on_chunk=on_chunk))
     except Exception as e:
         print(f"DEBUG: Exception during generation_service.generate_sar: {e}", flush=True)
         import traceback
         traceback.print_exc()
+        if publisher:
+            publisher.publish("error", str(e))
         raise e
+
+    if publisher:
+        publisher.publish("done")
     
     end_time = datetime.now()
     print(f"DEBUG: LLM Engine responded in { (end_time - start_time).total_seconds() } seconds", flush=True)
     
-    self.update_state(state='PROCESSING', meta={'progress': 90, 'message': 'Finalizing report...'})
+    report(90, 'Finalizing report...')
     
-    print(f"Task {self.request.id} completed successfully.", flush=True)
+    print(f"Task {task.request.id} completed successfully.", flush=True)
     return result.model_dump(mode='json')
+
+@celery_app.task(acks_late=True)
+def dispatch_batch_task(batch_id: str, queue: str):
+    """
+    Fan a submitted batch out into one generate_sar_task per request.
+    The API only parks the requests in Redis and publishes this small message;
+    the per-job publishes happen here as one group over a single producer
+    connection. The parked requests are dropped only after the publish and
+    the message is acked last, so a dispatcher lost mid-publish is redelivered
+    with the requests still parked. A redelivery republishes the same task
+    ids, which batch_progress counts once.
+    """
+    job_ids, requests = batch_progress.get_requests(batch_id)
+    if requests is None:
+        print(f"Batch {batch_id}: requests expired or already dispatched", flush=True)
+        return
+    jobs = group(
+        generate_sar_task.signature((json.dumps(req),), {"batch_id": batch_id}, task_id=job_id, queue=queue)
+        for req, job_id in zip(requests, job_ids)
+    )
+    jobs.apply_async()
+    batch_progress.discard_requests(batch_id)
+    print(f"Batch {batch_id}: dispatched {len(job_ids)} jobs to '{queue}'", flush=True)